@@ -1,14 +1,29 @@
 import math
-from typing import List, Dict
+from typing import List, Dict, Optional
 
-def analyze_footwork(detections: List[Dict], fps: int = 30) -> Dict:
+import numpy as np
+
+from analysis.trajectory import trajectory_array, step_distances, rally_lengths, sample_times
+
+# Court-based calibration
+# Standard badminton court width ≈ 6.1m shown in ~400 pixels
+# So 1 pixel ≈ 0.015 meters (more accurate calibration)
+PIXELS_TO_METERS = 0.015
+
+
+def analyze_footwork(detections: List[Dict], fps: int = 30, frame_step: Optional[int] = None) -> Dict:
     """
     Compute real physics-based metrics from shuttle detections.
     NOW INCLUDES STROKE CLASSIFICATION!
     
     Args:
-        detections: List of frame detections [{0: [x1, y1, x2, y2]}, ...]
+        detections: Trajectory, list of frame detections [{0: [x1, y1, x2, y2]}, ...]
+            or an (N, 4) box array with NaN rows for missing frames
         fps: Video frame rate (default 30)
+        frame_step: Source frames per nominal sample. Speeds are per nominal
+            sample, so a Trajectory sampled at a varying stride (adaptive
+            sampling) is measured on the same scale as a fixed-stride one.
+            Defaults to the trajectory's own finest stride.
     
     Returns:
         dict: Complete analysis with motion metrics AND stroke classification
@@ -17,72 +32,40 @@ def analyze_footwork(detections: List[Dict], fps: int = 30) -> Dict:
     # ============================================================
     # EXTRACT SHUTTLE CENTER POSITIONS
     # ============================================================
-    positions = []
-    for frame_det in detections:
-        if 0 in frame_det:
-            x1, y1, x2, y2 = frame_det[0]
-            cx = (x1 + x2) / 2
-            cy = (y1 + y2) / 2
-            positions.append((cx, cy))
-        else:
-            positions.append(None)
+    track = trajectory_array(detections)
+    detected = track[:, 2] > 0
 
     # ============================================================
     # 1️⃣ SHUTTLE SPEED (pixels/frame → km/h)
     # ============================================================
-    speeds_px_per_frame = []
-    speeds_km_h = []
-    
-    # Court-based calibration
-    # Standard badminton court width ≈ 6.1m shown in ~400 pixels
-    # So 1 pixel ≈ 0.015 meters (more accurate calibration)
-    PIXELS_TO_METERS = 0.015
-    
-    for i in range(1, len(positions)):
-        if positions[i] and positions[i-1]:
-            dx = positions[i][0] - positions[i-1][0]
-            dy = positions[i][1] - positions[i-1][1]
-            pixel_dist = math.sqrt(dx*dx + dy*dy)
-            speeds_px_per_frame.append(pixel_dist)
-            
-            # Convert to km/h
-            meters_per_frame = pixel_dist * PIXELS_TO_METERS
-            meters_per_second = meters_per_frame * fps
-            km_h = meters_per_second * 3.6
-            speeds_km_h.append(km_h)
+    steps = step_distances(track)
+    times = sample_times(detections, frame_step)
+    valid_steps = ~np.isnan(steps)
+    speeds_px_per_frame = steps[valid_steps] / np.diff(times)[valid_steps]
+
+    # Convert to km/h
+    speeds_km_h = speeds_px_per_frame * PIXELS_TO_METERS * fps * 3.6
 
     # ============================================================
     # 2️⃣ RALLY LENGTH (continuous detection segments)
     # ============================================================
-    rally_lengths = []
-    current_rally = 0
-    
-    for pos in positions:
-        if pos is not None:
-            current_rally += 1
-        else:
-            if current_rally > 0:
-                rally_lengths.append(current_rally)
-                current_rally = 0
-    
-    if current_rally > 0:
-        rally_lengths.append(current_rally)
-    
-    avg_rally_frames = sum(rally_lengths) / len(rally_lengths) if rally_lengths else 0
+    rallies = rally_lengths(detected, times)
+
+    avg_rally_frames = float(rallies.sum()) / len(rallies) if len(rallies) else 0
     avg_rally_seconds = avg_rally_frames / fps
 
     # ============================================================
     # 3️⃣ TOTAL DISTANCE (meters)
     # ============================================================
-    total_distance_pixels = sum(speeds_px_per_frame)
+    total_distance_pixels = float(steps[valid_steps].sum())
     total_distance_meters = total_distance_pixels * PIXELS_TO_METERS
 
     # ============================================================
     # 4️⃣ MOVEMENT SMOOTHNESS (inverse of speed variance)
     # ============================================================
     if len(speeds_km_h) > 1:
-        mean_speed = sum(speeds_km_h) / len(speeds_km_h)
-        variance = sum((s - mean_speed) ** 2 for s in speeds_km_h) / len(speeds_km_h)
+        mean_speed = float(speeds_km_h.sum()) / len(speeds_km_h)
+        variance = float(((speeds_km_h - mean_speed) ** 2).sum()) / len(speeds_km_h)
         # Normalize smoothness to 0-1 range (higher = smoother)
         smoothness = 1 / (1 + math.sqrt(variance) / 100)
     else:
@@ -92,8 +75,8 @@ def analyze_footwork(detections: List[Dict], fps: int = 30) -> Dict:
     # ============================================================
     # 5️⃣ DETECTION CONSISTENCY
     # ============================================================
-    detected_count = sum(1 for p in positions if p)
-    consistency_percent = round(100 * detected_count / len(detections), 1) if detections else 0
+    detected_count = int(detected.sum())
+    consistency_percent = round(100 * detected_count / len(detections), 1) if len(detections) else 0
 
     # ============================================================
     # 6️⃣ STROKE CLASSIFICATION (USING YOUR ADVANCED CLASSIFIER!)
@@ -103,8 +86,8 @@ def analyze_footwork(detections: List[Dict], fps: int = 30) -> Dict:
     # Initialize classifier with correct parameters
     classifier = StrokeClassifier(fps=fps, pixels_to_meters=PIXELS_TO_METERS)
     
-    # Analyze strokes
-    stroke_analysis = classifier.analyze_strokes(detections)
+    # Analyze strokes (reusing the positions and speeds computed above)
+    stroke_analysis = classifier.analyze_strokes(detections, track=track, steps=steps, times=times)
     
     print(f"🏸 Stroke analysis complete:")
     print(f"   Total strokes detected: {stroke_analysis.get('total_strokes', 0)}")
@@ -120,15 +103,15 @@ def analyze_footwork(detections: List[Dict], fps: int = 30) -> Dict:
         "consistency_percent": consistency_percent,
         
         # Speed metrics (km/h)
-        "avg_shuttle_speed_km_h": round(sum(speeds_km_h) / len(speeds_km_h), 2) if speeds_km_h else 0,
-        "max_shuttle_speed_km_h": round(max(speeds_km_h), 2) if speeds_km_h else 0,
-        "min_speed_km_h": round(min(speeds_km_h), 2) if speeds_km_h else 0,
+        "avg_shuttle_speed_km_h": round(float(speeds_km_h.sum()) / len(speeds_km_h), 2) if len(speeds_km_h) else 0,
+        "max_shuttle_speed_km_h": round(float(speeds_km_h.max()), 2) if len(speeds_km_h) else 0,
+        "min_speed_km_h": round(float(speeds_km_h.min()), 2) if len(speeds_km_h) else 0,
         "speed_variance": round(variance, 2),
         
         # Rally metrics
         "avg_rally_length_frames": round(avg_rally_frames, 1),
         "avg_rally_length_seconds": round(avg_rally_seconds, 2),
-        "total_rallies": len(rally_lengths),
+        "total_rallies": len(rallies),
         
         # Movement metrics
         "total_distance_meters": round(total_distance_meters, 2),
@@ -0,0 +1,141 @@
+"""
+Running footwork metrics for live analysis.
+
+LiveFootwork is fed one (interpolated) sample at a time and keeps only
+running sums, so each update is O(1) whatever the length of the session.
+Strokes are classified inline by a StreamingStrokeClassifier. snapshot()
+returns the analyze_footwork metrics of everything pushed so far.
+"""
+import math
+from typing import Dict
+
+import numpy as np
+
+from analysis.footwork import PIXELS_TO_METERS
+from analysis.stroke_classifier import StrokeClassifier
+
+
+class LiveFootwork:
+    def __init__(self, fps: int = 30, frame_step: int = 1):
+        """
+        Args:
+            fps: Video frame rate
+            frame_step: Source frames per nominal sample, as analyze_footwork
+        """
+        self.fps = fps
+        self.frame_step = frame_step
+        self.frames = 0
+        self.detections = 0
+        self.last_frame = None
+
+        # Speeds (km/h): count, running mean / M2 (Welford), extremes
+        self._speed_count = 0
+        self._speed_sum = 0.0
+        self._speed_mean = 0.0
+        self._speed_m2 = 0.0
+        self._speed_min = math.inf
+        self._speed_max = -math.inf
+        self._distance_px = 0.0
+
+        # Rallies: closed runs and the open one
+        self._rally_count = 0
+        self._rally_total = 0.0
+        self._run_start = None
+        self._run_last = None
+
+        self._first_frame = None
+        self._prev_time = None
+        self._prev_center = None
+
+        self.strokes = StrokeClassifier(fps=fps, pixels_to_meters=PIXELS_TO_METERS).stream()
+
+    def push(self, frame_idx: int, box) -> None:
+        """
+        Add the sample of source frame `frame_idx`.
+
+        Args:
+            frame_idx: Source frame index (increasing)
+            box: [x1, y1, x2, y2] or None / NaN when the shuttle is missing
+        """
+        if self._first_frame is None:
+            self._first_frame = frame_idx
+        t = (frame_idx - self._first_frame) / self.frame_step
+        self.frames += 1
+        self.last_frame = frame_idx
+
+        center = None
+        if box is not None:
+            # float32 like a stored Trajectory, so the numbers match a batch run
+            box = np.asarray(box, dtype=np.float32).astype(np.float64).tolist()
+            if not math.isnan(box[0]):
+                center = ((box[0] + box[2]) / 2, (box[1] + box[3]) / 2)
+
+        if self._prev_time is not None and center is not None and self._prev_center is not None:
+            dx = center[0] - self._prev_center[0]
+            dy = center[1] - self._prev_center[1]
+            step = math.sqrt(dx * dx + dy * dy)
+            self._add_speed(step / (t - self._prev_time) * PIXELS_TO_METERS * self.fps * 3.6)
+            self._distance_px += step
+        self.strokes.push(box if center is not None else None, time=t)
+
+        if center is not None:
+            self.detections += 1
+            if self._run_start is None:
+                self._run_start = t
+            self._run_last = t
+        elif self._run_start is not None:
+            self._close_rally()
+
+        self._prev_time = t
+        self._prev_center = center
+
+    def _add_speed(self, speed):
+        self._speed_count += 1
+        self._speed_sum += speed
+        delta = speed - self._speed_mean
+        self._speed_mean += delta / self._speed_count
+        self._speed_m2 += delta * (speed - self._speed_mean)
+        self._speed_min = min(self._speed_min, speed)
+        self._speed_max = max(self._speed_max, speed)
+
+    def _close_rally(self):
+        self._rally_count += 1
+        self._rally_total += self._run_last - self._run_start + 1
+        self._run_start = None
+        self._run_last = None
+
+    def snapshot(self) -> Dict:
+        """analyze_footwork metrics of the samples pushed so far"""
+        rally_count, rally_total = self._rally_count, self._rally_total
+        if self._run_start is not None:
+            rally_count += 1
+            rally_total += self._run_last - self._run_start + 1
+        avg_rally_frames = rally_total / rally_count if rally_count else 0
+
+        n = self._speed_count
+        if n > 1:
+            variance = self._speed_m2 / n
+            smoothness = 1 / (1 + math.sqrt(variance) / 100)
+        else:
+            variance = 0
+            smoothness = 0
+
+        strokes = self.strokes.stats()
+        return {
+            "frames_processed": self.frames,
+            "last_frame": self.last_frame,
+            "detections": self.detections,
+            "consistency_percent": round(100 * self.detections / self.frames, 1) if self.frames else 0,
+            "avg_shuttle_speed_km_h": round(self._speed_sum / n, 2) if n else 0,
+            "max_shuttle_speed_km_h": round(self._speed_max, 2) if n else 0,
+            "min_speed_km_h": round(self._speed_min, 2) if n else 0,
+            "speed_variance": round(variance, 2),
+            "avg_rally_length_frames": round(avg_rally_frames, 1),
+            "avg_rally_length_seconds": round(avg_rally_frames / self.fps, 2),
+            "total_rallies": rally_count,
+            "total_distance_meters": round(self._distance_px * PIXELS_TO_METERS, 2),
+            "movement_smoothness": round(smoothness, 3),
+            "total_strokes": strokes["total_strokes"],
+            "stroke_counts": strokes["stroke_counts"],
+            "stroke_quality": strokes["stroke_quality"],
+        }
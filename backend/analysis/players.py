@@ -0,0 +1,64 @@
+from typing import List, Dict, Optional
+
+import numpy as np
+
+from analysis.footwork import PIXELS_TO_METERS
+
+# Track ids seen in fewer sampled frames than this are tracker noise
+MIN_PLAYER_FRAMES = 5
+
+
+def analyze_players(player_detections: List[Dict], fps: int = 30, frame_step: int = 1,
+                    frames: Optional[np.ndarray] = None) -> Dict:
+    """
+    Court-movement metrics per tracked player.
+
+    Players are followed by the bottom-center of their box (where the feet
+    touch the court), so jumps and lunges don't count as distance.
+
+    Args:
+        player_detections: [{track_id: [x1, y1, x2, y2]}, ...], one dict per sampled frame
+        fps: Video frame rate
+        frame_step: Source frames between two samples (ignored with `frames`)
+        frames: Optional source frame number of every sample
+
+    Returns:
+        dict: {track_id (str): metrics} for every player tracked long enough
+    """
+    if frames is None:
+        frames = np.arange(len(player_detections)) * frame_step
+    times = np.asarray(frames, dtype=np.float64) / fps
+
+    tracks = {}
+    for i, det in enumerate(player_detections):
+        for track_id, box in det.items():
+            x1, y1, x2, y2 = box
+            tracks.setdefault(int(track_id), []).append((i, (x1 + x2) / 2, y2))
+
+    players = {}
+    for track_id, rows in sorted(tracks.items()):
+        if len(rows) < MIN_PLAYER_FRAMES:
+            continue
+
+        rows = np.array(rows, dtype=np.float64)
+        idx = rows[:, 0].astype(int)
+        feet = rows[:, 1:]
+
+        # Only steps between consecutive samples; a player lost for a while
+        # would otherwise "teleport" into the distance
+        consecutive = np.diff(idx) == 1
+        steps = np.hypot(*np.diff(feet, axis=0).T)[consecutive]
+        dt = np.diff(times[idx])[consecutive]
+        speeds_km_h = steps * PIXELS_TO_METERS / dt * 3.6 if len(steps) else np.empty(0)
+
+        span = (feet.max(axis=0) - feet.min(axis=0)) * PIXELS_TO_METERS
+        players[str(track_id)] = {
+            "frames_detected": len(rows),
+            "total_distance_meters": round(float(steps.sum()) * PIXELS_TO_METERS, 2),
+            "avg_speed_km_h": round(float(speeds_km_h.mean()), 2) if len(speeds_km_h) else 0,
+            "max_speed_km_h": round(float(speeds_km_h.max()), 2) if len(speeds_km_h) else 0,
+            "court_coverage_m": [round(float(span[0]), 2), round(float(span[1]), 2)],
+            "avg_position_px": [round(float(v), 1) for v in feet.mean(axis=0)],
+        }
+
+    return players
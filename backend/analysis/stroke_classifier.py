@@ -2,7 +2,97 @@
 Stroke Classifier - Analyzes shuttle trajectory to classify badminton strokes
 """
 import math
-from typing import List, Dict, Optional, Tuple
+from collections import deque
+from itertools import islice
+from typing import List, Dict, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from analysis.trajectory import trajectory_array, step_distances, sample_times
+
+
+def find_speed_peaks(
+    speeds: np.ndarray,
+    window: int = 5,
+    min_speed: float = 5,
+    min_separation: int = 0
+) -> np.ndarray:
+    """
+    Indices k where speeds[k] >= min_speed and is strictly greater than the
+    `window` speeds before it and the `window - 1` speeds after it, for
+    window <= k < len(speeds) - window.
+
+    Sliding-window maxima replace the per-index Python comparisons, so the
+    whole scan is a handful of array ops. Peaks closer than min_separation
+    to the previously kept peak are dropped.
+    """
+    n = len(speeds)
+    if window < 1 or n < 2 * window + 1:
+        return np.empty(0, dtype=np.int64)
+
+    centers = speeds[window:n - window]
+    left_max = sliding_window_view(speeds, window).max(axis=1)[:n - 2 * window]
+    is_peak = (centers >= min_speed) & (centers > left_max)
+
+    if window > 1:
+        right_max = sliding_window_view(speeds[window + 1:], window - 1).max(axis=1)
+        is_peak &= centers > right_max[:n - 2 * window]
+
+    peaks = np.flatnonzero(is_peak) + window
+
+    if min_separation > 0 and len(peaks) > 1:
+        kept = [peaks[0]]
+        for idx in peaks[1:]:
+            if idx - kept[-1] >= min_separation:
+                kept.append(idx)
+        peaks = np.array(kept, dtype=np.int64)
+
+    return peaks
+
+
+class SpeedPeakTracker:
+    """
+    Incremental find_speed_peaks for a stream of speeds.
+
+    push() takes one speed at a time and returns the index of the peak it
+    confirms, if any. A peak at k is known once speed k + window has
+    arrived, so only the last 2 * window + 1 speeds are kept and every push
+    costs O(window). The peaks are exactly those find_speed_peaks returns
+    on the whole series.
+    """
+
+    def __init__(self, window: int = 5, min_speed: float = 5, min_separation: int = 0):
+        self.window = window
+        self.min_speed = min_speed
+        self.min_separation = min_separation
+        self.count = 0
+        self._speeds = deque(maxlen=2 * window + 1)
+        self._last_peak = None
+
+    def push(self, speed: float) -> Optional[int]:
+        """Feed speeds[count]; returns the newly confirmed peak index or None"""
+        if math.isnan(speed):
+            speed = 0.0
+        self._speeds.append(speed)
+        self.count += 1
+        window = self.window
+        if window < 1 or len(self._speeds) < 2 * window + 1:
+            return None
+
+        center = self._speeds[window]
+        if center < self.min_speed or center <= max(islice(self._speeds, 0, window)):
+            return None
+        if window > 1 and center <= max(islice(self._speeds, window + 1, 2 * window)):
+            return None
+
+        peak = self.count - 1 - window
+        if (self.min_separation > 0 and self._last_peak is not None
+                and peak - self._last_peak < self.min_separation):
+            return None
+        self._last_peak = peak
+        return peak
+
 
 class StrokeClassifier:
     """Classify badminton strokes from shuttle trajectory data"""
@@ -18,94 +108,94 @@ class StrokeClassifier:
     STEEP_UP_ANGLE = 35     # Upward trajectory
     FLAT_ANGLE_MAX = 20     # Near horizontal
     
-    def __init__(self, fps=30, pixels_to_meters=0.02):
+    def __init__(self, fps=30, pixels_to_meters=0.02, peak_window=5, min_peak_speed=5,
+                 min_peak_separation=0):
         """
         Args:
             fps: Video frame rate
             pixels_to_meters: Conversion factor for court scaling
+            peak_window: Frames either side a speed peak must dominate
+            min_peak_speed: Ignore peaks slower than this (pixels/frame)
+            min_peak_separation: Minimum frames between two stroke events
         """
         self.fps = fps
         self.pixels_to_meters = pixels_to_meters
+        self.peak_window = peak_window
+        self.min_peak_speed = min_peak_speed
+        self.min_peak_separation = min_peak_separation
         
-    def analyze_strokes(self, detections: List[Dict]) -> Dict:
+    def analyze_strokes(
+        self,
+        detections: List[Dict],
+        track: Optional[np.ndarray] = None,
+        steps: Optional[np.ndarray] = None,
+        times: Optional[np.ndarray] = None
+    ) -> Dict:
         """
         Analyze all strokes in a video
         
         Args:
-            detections: List of frame detections [{0: [x1, y1, x2, y2]}, ...]
+            detections: Trajectory or list of frame detections [{0: [x1, y1, x2, y2]}, ...]
+            track: Optional trajectory_array(detections), if the caller has it
+            steps: Optional step_distances(track), if the caller has it
+            times: Optional sample_times(detections); speeds are divided by
+                the time between samples, so uneven sampling is handled
             
         Returns:
             Dict with stroke counts and quality metrics
         """
-        # Extract positions
-        positions = self._extract_positions(detections)
+        # Extract positions (reuse the caller's arrays when given)
+        if track is None:
+            track = trajectory_array(detections)
+        positions = track[:, :2]
+        if steps is None:
+            steps = step_distances(track)
+        if times is None:
+            times = sample_times(detections)
         
         # Find stroke events (rapid speed changes indicate hits)
-        stroke_events = self._detect_stroke_events(positions)
+        stroke_events = self._detect_stroke_events(steps, times)
         
         # Classify each stroke
         stroke_data = []
         for event_idx in stroke_events:
-            stroke_info = self._classify_single_stroke(positions, event_idx)
+            stroke_info = self._classify_single_stroke(positions, event_idx, times)
             if stroke_info:
                 stroke_data.append(stroke_info)
         
         # Aggregate statistics
         return self._aggregate_stroke_stats(stroke_data)
     
-    def _extract_positions(self, detections: List[Dict]) -> List[Optional[Tuple[float, float]]]:
-        """Extract center positions from detections"""
-        positions = []
-        for frame_det in detections:
-            if 0 in frame_det:
-                x1, y1, x2, y2 = frame_det[0]
-                cx = (x1 + x2) / 2
-                cy = (y1 + y2) / 2
-                positions.append((cx, cy))
-            else:
-                positions.append(None)
-        return positions
+    def _extract_positions(self, detections: List[Dict]) -> np.ndarray:
+        """Extract center positions from detections as an (N, 2) array, NaN when missing"""
+        return trajectory_array(detections)[:, :2]
     
-    def _detect_stroke_events(self, positions: List[Optional[Tuple]]) -> List[int]:
+    def _detect_stroke_events(self, steps: np.ndarray, times: Optional[np.ndarray] = None) -> List[int]:
         """
         Detect stroke events by finding rapid acceleration points
         (speed increases indicate player hitting shuttle)
+
+        Args:
+            steps: Per-step pixel distances from step_distances (NaN = missing)
+            times: Optional sample times; distances become per-unit-time speeds
         """
-        speeds = []
-        for i in range(1, len(positions)):
-            if positions[i] and positions[i-1]:
-                dx = positions[i][0] - positions[i-1][0]
-                dy = positions[i][1] - positions[i-1][1]
-                speed = math.sqrt(dx*dx + dy*dy)
-                speeds.append((i, speed))
-            else:
-                speeds.append((i, 0))
-        
-        # Find local maxima (peaks in speed = strokes)
-        stroke_indices = []
-        window = 5  # frames
-        
-        for i in range(window, len(speeds) - window):
-            current_speed = speeds[i][1]
-            if current_speed < 5:  # Skip very slow movements
-                continue
-                
-            # Check if this is a local maximum
-            is_peak = all(
-                current_speed > speeds[j][1] 
-                for j in range(i - window, i + window) 
-                if j != i
-            )
-            
-            if is_peak:
-                stroke_indices.append(speeds[i][0])
-        
-        return stroke_indices
+        if times is not None:
+            steps = steps / np.diff(times)
+        speeds = np.nan_to_num(steps, nan=0.0)
+        peaks = find_speed_peaks(
+            speeds,
+            window=self.peak_window,
+            min_speed=self.min_peak_speed,
+            min_separation=self.min_peak_separation
+        )
+        # speeds[k] is the step into frame k + 1
+        return (peaks + 1).tolist()
     
     def _classify_single_stroke(
         self, 
-        positions: List[Optional[Tuple]], 
-        event_idx: int
+        positions: np.ndarray, 
+        event_idx: int,
+        times: Optional[np.ndarray] = None
     ) -> Optional[Dict]:
         """
         Classify a single stroke based on trajectory around the event
@@ -118,11 +208,20 @@ class StrokeClassifier:
             return None
             
         # Get pre-stroke and post-stroke positions
-        pre_pos = positions[event_idx - 2]
-        event_pos = positions[event_idx]
-        post_pos = positions[event_idx + 2]
+        pre_pos = positions[event_idx - 2].tolist()
+        event_pos = positions[event_idx].tolist()
+        post_pos = positions[event_idx + 2].tolist()
         
-        if not (pre_pos and event_pos and post_pos):
+        # Scaled by the time the two steps took (1 for even sampling)
+        span = (times[event_idx] - times[event_idx - 2]) / 2 if times is not None else 1.0
+        return self._classify_points(pre_pos, event_pos, post_pos, event_idx, span)
+
+    def _classify_points(self, pre_pos, event_pos, post_pos, event_idx: int, span: float) -> Optional[Dict]:
+        """
+        Classify the stroke at `event_idx` from the positions two samples
+        before, at and two samples after it; `span` is the time of one step
+        """
+        if math.isnan(pre_pos[0]) or math.isnan(event_pos[0]) or math.isnan(post_pos[0]):
             return None
         
         # Calculate speed at impact (km/h)
@@ -130,7 +229,7 @@ class StrokeClassifier:
         dy = event_pos[1] - pre_pos[1]
         pixel_dist = math.sqrt(dx*dx + dy*dy)
         
-        meters_per_frame = pixel_dist * self.pixels_to_meters
+        meters_per_frame = pixel_dist * self.pixels_to_meters / span
         meters_per_second = meters_per_frame * self.fps
         speed_km_h = meters_per_second * 3.6
         
@@ -198,54 +297,17 @@ class StrokeClassifier:
         Returns:
             Dict matching frontend expected format
         """
-        if not stroke_data:
-            return self._empty_stats()
-        
-        # Count strokes by type
-        counts = {'smash': 0, 'clear': 0, 'drop': 0, 'net': 0, 'drive': 0}
+        tally = StrokeTally()
         for stroke in stroke_data:
-            stroke_type = stroke['type']
-            if stroke_type in counts:
-                counts[stroke_type] += 1
-        
-        # Smash quality metrics
-        smashes = [s for s in stroke_data if s['type'] == 'smash']
-        smash_quality = {
-            "avg_speed": sum(s['speed_km_h'] for s in smashes) / len(smashes) if smashes else 0,
-            "max_speed": max((s['speed_km_h'] for s in smashes), default=0),
-            "avg_angle": sum(s['attack_angle'] for s in smashes) / len(smashes) if smashes else 0
-        }
-        
-        # Drop quality metrics
-        drops = [s for s in stroke_data if s['type'] == 'drop']
-        drop_quality = {
-            "net_clearance": 45 if drops else 0,  # Placeholder - need court detection
-            "accuracy": min(100, len(drops) * 5) if drops else 0  # Rough estimate
-        }
-        
-        # Clear quality metrics
-        clears = [s for s in stroke_data if s['type'] == 'clear']
-        clear_quality = {
-            "avg_apex": 5.5,  # Placeholder - need trajectory tracking
-            "depth_percentage": 75 if clears else 0
-        }
-        
-        return {
-            "stroke_counts": {
-                "smash": counts['smash'],
-                "clear": counts['clear'],
-                "drop": counts['drop'],
-                "net": counts['net']
-            },
-            "stroke_quality": {
-                "smash": smash_quality,
-                "drop": drop_quality,
-                "clear": clear_quality
-            },
-            "total_strokes": len(stroke_data)
-        }
+            tally.add(stroke)
+        return tally.stats()
     
-    def _empty_stats(self) -> Dict:
+    def stream(self) -> "StreamingStrokeClassifier":
+        """Incremental analyze_strokes, fed one frame at a time"""
+        return StreamingStrokeClassifier(self)
+    
+    @staticmethod
+    def _empty_stats() -> Dict:
         """Return empty stats when no strokes detected"""
         return {
             "stroke_counts": {
@@ -260,4 +322,139 @@ class StrokeClassifier:
                 "clear": {"avg_apex": 0, "depth_percentage": 0}
             },
             "total_strokes": 0
-        }
\ No newline at end of file
+        }
+
+class StrokeTally:
+    """Running aggregate of classified strokes, in the analyze_strokes format"""
+
+    def __init__(self):
+        self.counts = {'smash': 0, 'clear': 0, 'drop': 0, 'net': 0, 'drive': 0}
+        self.total = 0
+        self.smash_speed_sum = 0
+        self.smash_speed_max = 0
+        self.smash_angle_sum = 0
+
+    def add(self, stroke: Dict):
+        self.total += 1
+        stroke_type = stroke['type']
+        if stroke_type in self.counts:
+            self.counts[stroke_type] += 1
+        if stroke_type == 'smash':
+            self.smash_speed_sum += stroke['speed_km_h']
+            self.smash_speed_max = max(self.smash_speed_max, stroke['speed_km_h'])
+            self.smash_angle_sum += stroke['attack_angle']
+
+    def stats(self) -> Dict:
+        if not self.total:
+            return StrokeClassifier._empty_stats()
+
+        smashes = self.counts['smash']
+        drops = self.counts['drop']
+        return {
+            "stroke_counts": {
+                "smash": smashes,
+                "clear": self.counts['clear'],
+                "drop": drops,
+                "net": self.counts['net']
+            },
+            "stroke_quality": {
+                "smash": {
+                    "avg_speed": self.smash_speed_sum / smashes if smashes else 0,
+                    "max_speed": self.smash_speed_max if smashes else 0,
+                    "avg_angle": self.smash_angle_sum / smashes if smashes else 0
+                },
+                "drop": {
+                    "net_clearance": 45 if drops else 0,  # Placeholder - need court detection
+                    "accuracy": min(100, drops * 5) if drops else 0  # Rough estimate
+                },
+                "clear": {
+                    "avg_apex": 5.5,  # Placeholder - need trajectory tracking
+                    "depth_percentage": 75 if self.counts['clear'] else 0
+                }
+            },
+            "total_strokes": self.total
+        }
+
+
+class StreamingStrokeClassifier:
+    """
+    Incremental StrokeClassifier.analyze_strokes.
+
+    push() takes one frame at a time and returns the strokes it completes.
+    A speed peak is confirmed `peak_window` samples after it and classified
+    once the positions two samples either side of it are known, so only
+    the last max(peak_window, 3) + 3 positions are kept. stats() gives
+    exactly what analyze_strokes returns for all frames pushed so far.
+    """
+
+    def __init__(self, classifier: StrokeClassifier):
+        self.classifier = classifier
+        self.peaks = SpeedPeakTracker(
+            window=classifier.peak_window,
+            min_speed=classifier.min_peak_speed,
+            min_separation=classifier.min_peak_separation
+        )
+        self.tally = StrokeTally()
+        self.count = 0
+        size = max(classifier.peak_window, 3) + 3
+        self._positions = deque(maxlen=size)   # (x, y) of the last samples
+        self._times = deque(maxlen=size)
+        self._events = deque()                 # confirmed events awaiting later frames
+
+    def push(self, frame_detection, time: Optional[float] = None) -> List[Dict]:
+        """
+        Args:
+            frame_detection: {0: [x1, y1, x2, y2]} / {} as in a detection
+                list, or the box itself (None or NaN when missing)
+            time: Sample time, as sample_times; defaults to the sample index
+
+        Returns:
+            Strokes classified with this frame (dicts as _classify_single_stroke)
+        """
+        box = frame_detection.get(0) if isinstance(frame_detection, dict) else frame_detection
+        if box is None:
+            position = (math.nan, math.nan)
+        else:
+            # float64 centers, as trajectory_array computes them
+            x1, y1, x2, y2 = (float(v) for v in box)
+            position = ((x1 + x2) / 2, (y1 + y2) / 2)
+        if time is None:
+            time = self.count
+
+        if self._positions:
+            # speeds[k] is the step into frame k + 1
+            prev = self._positions[-1]
+            dx = position[0] - prev[0]
+            dy = position[1] - prev[1]
+            peak = self.peaks.push(math.sqrt(dx * dx + dy * dy) / (time - self._times[-1]))
+            if peak is not None:
+                self._events.append(peak + 1)
+
+        self._positions.append(position)
+        self._times.append(time)
+        self.count += 1
+
+        strokes = []
+        # analyze_strokes needs three samples after an event (and two before)
+        while self._events and self._events[0] + 3 < self.count:
+            event_idx = self._events.popleft()
+            if event_idx < 3:
+                continue
+            stroke = self._classify(event_idx)
+            if stroke:
+                self.tally.add(stroke)
+                strokes.append(stroke)
+        return strokes
+
+    def _classify(self, event_idx: int) -> Optional[Dict]:
+        # Ring index of sample i
+        offset = len(self._positions) - self.count
+        at = event_idx + offset
+        span = (self._times[at] - self._times[at - 2]) / 2
+        return self.classifier._classify_points(
+            self._positions[at - 2], self._positions[at], self._positions[at + 2], event_idx, span
+        )
+
+    def stats(self) -> Dict:
+        """analyze_strokes result for the frames pushed so far"""
+        return self.tally.stats()
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from analysis.footwork import PIXELS_TO_METERS, analyze_footwork
+from analysis.live import LiveFootwork
+from analysis.stroke_classifier import StrokeClassifier
+from analysis.trajectory import sample_times
+from badminton_model.utils import StreamingInterpolator, Trajectory
+
+STRIDE = 3
+MAX_GAP = 10
+
+
+def _rally_track(rng, n=200):
+    """Shuttle flying between the two ends of the court, with misses and dead time"""
+    boxes = np.full((n, 4), np.nan)
+    x, y, vx, vy = 600.0, 300.0, 0.0, 0.0
+    for i in range(n):
+        if rng.random() < 0.08:
+            # a hit: new direction and speed
+            vx = rng.choice([-1, 1]) * rng.uniform(5, 60)
+            vy = rng.uniform(-40, 10)
+        vy += 2.0
+        x = float(np.clip(x + vx, 0, 1270))
+        y = float(np.clip(y + vy, 0, 710))
+        if rng.random() > 0.25:
+            boxes[i] = [x, y, x + 10, y + 10]
+    dead = int(rng.integers(0, n - 30))
+    boxes[dead:dead + int(rng.integers(0, 30))] = np.nan
+    # float32, like the detector output both paths start from
+    return boxes.astype(np.float32).astype(np.float64)
+
+
+def _live_metrics(frames, boxes):
+    """LiveFootwork fed as LiveManager does, through a StreamingInterpolator"""
+    live = LiveFootwork(fps=30, frame_step=STRIDE)
+    interpolator = StreamingInterpolator(MAX_GAP)
+    for frame_idx, box in zip(frames, boxes):
+        position = (frame_idx - frames[0]) / STRIDE
+        for released, filled in interpolator.push(frame_idx, box, position=position):
+            live.push(released, filled)
+    for released, filled in interpolator.finish():
+        live.push(released, filled)
+    return live.snapshot()
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_live_metrics_match_a_batch_run(seed):
+    boxes = _rally_track(np.random.default_rng(seed))
+    frames = STRIDE - 1 + np.arange(len(boxes)) * STRIDE
+
+    trajectory = Trajectory.from_boxes(boxes, frames=frames).interpolate(max_gap=MAX_GAP, frame_step=STRIDE)
+    expected = analyze_footwork(trajectory, fps=30, frame_step=STRIDE)
+
+    snapshot = _live_metrics(frames, boxes)
+    assert snapshot.pop("last_frame") == frames[-1]
+    # analyze_footwork leaves the total out; drives count towards it
+    strokes = StrokeClassifier(fps=30, pixels_to_meters=PIXELS_TO_METERS).analyze_strokes(
+        trajectory, times=sample_times(trajectory, STRIDE))
+    assert snapshot.pop("total_strokes") == strokes["total_strokes"]
+    assert snapshot == expected
+
+
+def test_snapshot_of_an_empty_session():
+    snapshot = LiveFootwork().snapshot()
+    assert snapshot["frames_processed"] == 0 and snapshot["total_strokes"] == 0
+    assert snapshot["avg_shuttle_speed_km_h"] == 0 and snapshot["total_rallies"] == 0
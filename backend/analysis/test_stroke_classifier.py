@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from analysis.stroke_classifier import SpeedPeakTracker, StrokeClassifier, find_speed_peaks
+from analysis.trajectory import sample_times
+from badminton_model.utils import Trajectory
+
+
+def _naive_peaks(speeds, window, min_speed, min_separation):
+    """The per-index scan find_speed_peaks replaced"""
+    peaks = []
+    for k in range(window, len(speeds) - window):
+        if speeds[k] < min_speed:
+            continue
+        if all(speeds[k] > speeds[j] for j in range(k - window, k)) and \
+                all(speeds[k] > speeds[j] for j in range(k + 1, k + window)):
+            if not peaks or not min_separation or k - peaks[-1] >= min_separation:
+                peaks.append(k)
+    return peaks
+
+
+def _random_track(rng, n=300, miss_rate=0.2):
+    """Shuttle boxes with random hits, misses (None) and repeated positions"""
+    x, y, vx, vy = 600.0, 300.0, 0.0, 0.0
+    track = []
+    for _ in range(n):
+        if rng.random() < 0.1:
+            vx = rng.uniform(-60, 60)
+            vy = rng.uniform(-40, 20)
+        vy += 2.0
+        x = float(np.clip(x + vx, 0, 1270))
+        y = float(np.clip(y + vy, 0, 710))
+        track.append(None if rng.random() < miss_rate else [x, y, x + 10, y + 10])
+    return track
+
+
+@pytest.mark.parametrize("window", [1, 2, 5, 8])
+@pytest.mark.parametrize("min_separation", [0, 4])
+def test_find_speed_peaks_matches_the_naive_scan(window, min_separation):
+    rng = np.random.default_rng(window * 10 + min_separation)
+    for _ in range(20):
+        speeds = np.round(rng.uniform(0, 30, int(rng.integers(0, 120))))  # ties included
+        assert find_speed_peaks(speeds, window, 5, min_separation).tolist() == \
+            _naive_peaks(speeds, window, 5, min_separation)
+
+
+@pytest.mark.parametrize("window", [1, 2, 5, 8])
+@pytest.mark.parametrize("min_separation", [0, 4])
+def test_speed_peak_tracker_matches_find_speed_peaks(window, min_separation):
+    rng = np.random.default_rng(window + 100 * min_separation)
+    for _ in range(20):
+        speeds = np.round(rng.uniform(0, 30, int(rng.integers(0, 120))))
+        speeds[rng.random(len(speeds)) < 0.1] = np.nan
+
+        tracker = SpeedPeakTracker(window, 5, min_separation)
+        streamed = [peak for peak in map(tracker.push, speeds) if peak is not None]
+        assert streamed == find_speed_peaks(np.nan_to_num(speeds), window, 5, min_separation).tolist()
+        assert len(tracker._speeds) <= 2 * window + 1
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_stream_matches_analyze_strokes(seed):
+    track = _random_track(np.random.default_rng(seed))
+    detections = [{} if box is None else {0: box} for box in track]
+    classifier = StrokeClassifier(fps=30, pixels_to_meters=0.05, min_peak_separation=seed % 3)
+
+    stream = classifier.stream()
+    strokes = [stroke for det in detections for stroke in stream.push(det)]
+
+    expected = classifier.analyze_strokes(detections)
+    assert stream.stats() == expected
+    assert len(strokes) == expected["total_strokes"]
+    assert [s["frame"] for s in strokes] == sorted(s["frame"] for s in strokes)
+    assert len(stream._positions) <= max(classifier.peak_window, 3) + 3
+
+
+def test_stream_stats_match_every_prefix():
+    track = _random_track(np.random.default_rng(42), n=150)
+    classifier = StrokeClassifier()
+    stream = classifier.stream()
+    for n, box in enumerate(track, 1):
+        stream.push(box)
+        assert stream.stats() == classifier.analyze_strokes([{} if b is None else {0: b} for b in track[:n]])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_stream_with_sample_times_matches_a_trajectory(seed):
+    rng = np.random.default_rng(seed)
+    track = _random_track(rng)
+    # uneven sampling, as adaptive sampling mixes dense and strided frames
+    frames = np.cumsum(rng.choice([1, 3], size=len(track)))
+    boxes = np.array([[np.nan] * 4 if box is None else box for box in track])
+    trajectory = Trajectory.from_boxes(boxes, frames=frames)
+    times = sample_times(trajectory, 3)
+
+    classifier = StrokeClassifier(fps=30, pixels_to_meters=0.015)
+    stream = classifier.stream()
+    for i in range(len(trajectory)):
+        stream.push(trajectory[i], time=times[i])
+
+    assert stream.stats() == classifier.analyze_strokes(trajectory, times=times)
+
+
+def test_empty_stream():
+    stream = StrokeClassifier().stream()
+    assert stream.push({}) == []
+    assert stream.stats() == StrokeClassifier._empty_stats()
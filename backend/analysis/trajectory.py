@@ -0,0 +1,79 @@
+"""
+Array helpers shared by footwork and stroke analysis: detections are turned
+into one contiguous float array and every metric is computed from it.
+"""
+from itertools import chain
+from typing import List, Dict, Optional, Union
+
+import numpy as np
+
+from badminton_model.utils.trajectory import Trajectory
+
+
+def trajectory_array(detections: Union[Trajectory, List[Dict], np.ndarray]) -> np.ndarray:
+    """
+    Convert detections once into a contiguous (N, 3) float array:
+    columns are center x, center y and a 0/1 detected mask.
+    Missing frames have NaN centers.
+
+    `detections` is a Trajectory, an (N, 4) box array (NaN rows = missing)
+    as returned by ShuttleTracker.interpolate_shuttle_array, or the
+    per-frame dict list.
+    """
+    track = np.full((len(detections), 3), np.nan)
+    track[:, 2] = 0.0
+
+    if isinstance(detections, Trajectory):
+        # centers from the float32 boxes in float64, as the dict path does
+        detections = detections.boxes.astype(np.float64)
+
+    if isinstance(detections, np.ndarray):
+        track[:, 0] = (detections[:, 0] + detections[:, 2]) / 2
+        track[:, 1] = (detections[:, 1] + detections[:, 3]) / 2
+        track[:, 2] = ~np.isnan(track[:, 0])
+        return track
+
+    idx = [i for i, frame_det in enumerate(detections) if 0 in frame_det]
+    if idx:
+        boxes = np.fromiter(
+            chain.from_iterable(detections[i][0] for i in idx),
+            dtype=np.float64,
+            count=4 * len(idx)
+        ).reshape(-1, 4)
+        track[idx, 0] = (boxes[:, 0] + boxes[:, 2]) / 2
+        track[idx, 1] = (boxes[:, 1] + boxes[:, 3]) / 2
+        track[idx, 2] = 1.0
+    return track
+
+
+def step_distances(track: np.ndarray) -> np.ndarray:
+    """Pixel distance between consecutive frames; NaN where either end is missing"""
+    delta = np.diff(track[:, :2], axis=0)
+    return np.sqrt(delta[:, 0] * delta[:, 0] + delta[:, 1] * delta[:, 1])
+
+
+def sample_times(detections, frame_step: Optional[int] = None) -> np.ndarray:
+    """
+    Time of every sample in units of `frame_step` source frames. By default
+    the unit is the track's own finest stride, so evenly sampled input gives
+    0, 1, 2, ... Only a Trajectory records which frames were sampled; other
+    inputs count as evenly spaced.
+    """
+    if not isinstance(detections, Trajectory) or len(detections) < 2:
+        return np.arange(len(detections), dtype=np.float64)
+    if frame_step is None:
+        return detections.sample_positions().astype(np.float64)
+    frames = detections.frames.astype(np.float64)
+    return (frames - frames[0]) / frame_step
+
+
+def rally_lengths(mask: np.ndarray, times: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Lengths of the runs of consecutive detected frames; with sample `times`,
+    the time each run spans (one unit per sample for even sampling)
+    """
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    if times is None:
+        return ends - starts
+    return times[ends - 1] - times[starts] + 1
@@ -1,32 +1,372 @@
+"""
+Analysis results, indexed in an embedded SQLite database.
+
+Every result is stored as its JSON document plus indexed columns (time,
+player / session tags and the key metrics), so past analyses can be listed,
+filtered and aggregated without opening each one. The id of the newest
+result is kept in a one-row meta entry, so get_latest is a primary-key
+lookup; the latest result of one player or session comes from its index.
+Per-analysis JSON files written by earlier versions are imported the first
+time the database is opened.
+
+The database runs in WAL mode with one connection per thread: readers
+never block the writer or each other, and concurrent saves queue on
+SQLite's write lock (each save is a single short transaction) instead of
+racing on a shared file. Trajectory files are written to a temporary file
+and renamed into place, so a reader never sees a partial one.
+"""
+import glob
 import json
 import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import closing, contextmanager
 from datetime import datetime
+from typing import Optional
+
+import numpy as np
 
 RESULTS_DIR = os.path.join(os.path.dirname(__file__), "analysis_results")
 os.makedirs(RESULTS_DIR, exist_ok=True)
 
+DB_PATH = os.path.join(RESULTS_DIR, "analyses.db")
+
+# Largest page returned by AnalysisStorage.query
+MAX_PAGE_SIZE = 500
+
+# How long a writer waits for another worker's transaction to commit
+BUSY_TIMEOUT_MS = int(os.environ.get("ANALYSIS_DB_BUSY_TIMEOUT_MS", "30000"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    player TEXT,
+    session TEXT,
+    video_path TEXT,
+    frames_processed INTEGER,
+    detections INTEGER,
+    consistency_percent REAL,
+    avg_shuttle_speed_km_h REAL,
+    max_shuttle_speed_km_h REAL,
+    total_rallies INTEGER,
+    total_distance_meters REAL,
+    total_strokes INTEGER,
+    overall_rating TEXT,
+    result TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_created ON analyses (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_analyses_player ON analyses (player, created_at);
+CREATE INDEX IF NOT EXISTS idx_analyses_session ON analyses (session, created_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Indexed copies of result fields, in table column order
+_METRIC_COLUMNS = (
+    "frames_processed", "detections", "consistency_percent", "avg_shuttle_speed_km_h",
+    "max_shuttle_speed_km_h", "total_rallies", "total_distance_meters",
+)
+_SUMMARY_COLUMNS = ("id", "created_at", "player", "session", "video_path") + _METRIC_COLUMNS + (
+    "total_strokes", "overall_rating",
+)
+
+# GROUP BY expressions accepted by AnalysisStorage.aggregate
+_GROUPS = {
+    "player": "player",
+    "session": "session",
+    "day": "substr(created_at, 1, 10)",
+    "rating": "overall_rating",
+}
+
+_init_lock = threading.Lock()
+_initialized = False
+_local = threading.local()
+
+
+def _open() -> sqlite3.Connection:
+    # Autocommit mode; writes use explicit transactions (see _write)
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None,
+                           check_same_thread=False)
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _connect() -> sqlite3.Connection:
+    """This thread's connection (database created and migrated on first use)"""
+    global _initialized
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                with closing(_open()) as conn:
+                    # Persistent: every later connection opens in WAL mode
+                    conn.execute("PRAGMA journal_mode = WAL")
+                    conn.executescript(_SCHEMA)
+                    _migrate_json_files(conn)
+                _initialized = True
+
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = _open()
+    return conn
+
+
+@contextmanager
+def _write():
+    """
+    Write transaction on this thread's connection.
+
+    BEGIN IMMEDIATE takes the write lock up front, so a read-then-write
+    (update_result) waits its turn instead of failing to upgrade its lock
+    when another worker committed in between.
+    """
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _index_row(result: dict) -> tuple:
+    """Column values of the `analyses` row for one result document"""
+    metrics = result.get("metrics") or {}
+    insights = result.get("insights") or {}
+    return (
+        result["id"],
+        result.get("timestamp") or datetime.now().isoformat(),
+        result.get("player"),
+        result.get("session"),
+        result.get("video_path"),
+        *(metrics.get(column) for column in _METRIC_COLUMNS),
+        sum((metrics.get("stroke_counts") or {}).values()),
+        insights.get("overall_rating"),
+        json.dumps(result, separators=(",", ":")),
+    )
+
+
+def _upsert(conn: sqlite3.Connection, result: dict, replace: bool = True):
+    verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+    placeholders = ", ".join("?" * (len(_SUMMARY_COLUMNS) + 1))
+    conn.execute(
+        f"{verb} INTO analyses ({', '.join(_SUMMARY_COLUMNS)}, result) VALUES ({placeholders})",
+        _index_row(result)
+    )
+
+
+def _migrate_json_files(conn: sqlite3.Connection):
+    """One-time import of the <id>.json / latest.json files of the old file store"""
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+        return
+
+    conn.execute("BEGIN IMMEDIATE")
+    imported = 0
+    for path in glob.glob(os.path.join(RESULTS_DIR, "*.json")):
+        if os.path.basename(path) == "latest.json":
+            continue
+        try:
+            with open(path, 'r') as f:
+                result = json.load(f)
+            _upsert(conn, result, replace=False)
+            imported += 1
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"⚠️ Skipping unreadable result {path}: {e}")
+
+    latest_id = None
+    latest_path = os.path.join(RESULTS_DIR, "latest.json")
+    if os.path.exists(latest_path):
+        try:
+            with open(latest_path, 'r') as f:
+                latest_id = json.load(f).get("id")
+        except (OSError, ValueError):
+            pass
+    if latest_id is None:
+        row = conn.execute("SELECT id FROM analyses ORDER BY created_at DESC, id DESC LIMIT 1").fetchone()
+        latest_id = row[0] if row else None
+    if latest_id is not None:
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('latest_id', ?)", (latest_id,))
+
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)",
+                 (datetime.now().isoformat(),))
+    conn.execute("COMMIT")
+    if imported:
+        print(f"📦 Imported {imported} stored analyses into {DB_PATH}")
+
+
+def _where(player=None, session=None, since=None, until=None, rating=None, min_consistency=None):
+    """WHERE clause and parameters for the query / aggregate filters"""
+    clauses, params = [], []
+    for column, value in (("player", player), ("session", session), ("overall_rating", rating)):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if since is not None:
+        clauses.append("created_at >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("created_at < ?")
+        params.append(until)
+    if min_consistency is not None:
+        clauses.append("consistency_percent >= ?")
+        params.append(min_consistency)
+    return clauses, params
+
+
 class AnalysisStorage:
     @staticmethod
-    def save_result(analysis_id: str, metrics: dict, video_path: str):
+    def save_result(analysis_id: str, metrics: dict, video_path: str,
+                    player: Optional[str] = None, session: Optional[str] = None):
         """Save analysis results for chat consumption"""
         result = {
             "id": analysis_id,
             "timestamp": datetime.now().isoformat(),
             "video_path": video_path,
+            "player": player,
+            "session": session,
             "metrics": metrics,
             "insights": AnalysisStorage._generate_insights(metrics)
         }
-        
-        filepath = os.path.join(RESULTS_DIR, f"{analysis_id}.json")
-        with open(filepath, 'w') as f:
-            json.dump(result, f, indent=2)
-        
-        # Also save as "latest.json" for easy chat access
-        latest_path = os.path.join(RESULTS_DIR, "latest.json")
-        with open(latest_path, 'w') as f:
-            json.dump(result, f, indent=2)
-        
+
+        with _write() as conn:
+            _upsert(conn, result)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('latest_id', ?)", (analysis_id,))
+
+        return analysis_id
+
+    @staticmethod
+    def update_result(analysis_id: str, **fields):
+        """Update fields of a stored result"""
+        with _write() as conn:
+            row = conn.execute("SELECT result FROM analyses WHERE id = ?", (analysis_id,)).fetchone()
+            if row is None:
+                return None
+            result = json.loads(row["result"])
+            result.update(fields)
+            _upsert(conn, result)
+        return result
+
+    @staticmethod
+    def get_result(analysis_id: str):
+        """Full stored result, or None"""
+        row = _connect().execute("SELECT result FROM analyses WHERE id = ?", (analysis_id,)).fetchone()
+        return json.loads(row["result"]) if row else None
+
+    @staticmethod
+    def query(limit: int = 50, cursor: Optional[str] = None, **filters) -> dict:
+        """
+        Newest-first page of result summaries (indexed columns only).
+
+        Args:
+            limit: Page size (at most MAX_PAGE_SIZE)
+            cursor: `next_cursor` of the previous page
+            **filters: player, session, since, until (ISO timestamps),
+                rating, min_consistency
+
+        Returns:
+            dict: {"items": [...], "next_cursor": str or None}
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        clauses, params = _where(**filters)
+        if cursor:
+            # Keyset pagination: stable under inserts, no OFFSET scan
+            created_at, _, last_id = cursor.partition("|")
+            clauses.append("(created_at, id) < (?, ?)")
+            params += [created_at, last_id]
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = (f"SELECT {', '.join(_SUMMARY_COLUMNS)} FROM analyses {where} "
+               f"ORDER BY created_at DESC, id DESC LIMIT ?")
+        rows = _connect().execute(sql, params + [limit + 1]).fetchall()
+
+        items = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = f"{items[-1]['created_at']}|{items[-1]['id']}"
+        return {"items": items, "next_cursor": next_cursor}
+
+    @staticmethod
+    def aggregate(group_by: Optional[str] = None, **filters) -> list:
+        """
+        Summary statistics over the stored results matching `filters`
+        (see query), optionally per player, session, day or rating.
+
+        Returns:
+            list: One dict per group (a single overall row without group_by)
+        """
+        if group_by is not None and group_by not in _GROUPS:
+            raise ValueError(f"group_by must be one of {sorted(_GROUPS)}")
+
+        clauses, params = _where(**filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        group_expr = _GROUPS.get(group_by)
+        select_group = f"{group_expr} AS grp, " if group_expr else ""
+        group_sql = "GROUP BY grp ORDER BY grp" if group_expr else ""
+
+        sql = f"""
+            SELECT {select_group}
+                COUNT(*) AS analyses,
+                MIN(created_at) AS first_at,
+                MAX(created_at) AS last_at,
+                AVG(consistency_percent) AS avg_consistency_percent,
+                AVG(avg_shuttle_speed_km_h) AS avg_shuttle_speed_km_h,
+                MAX(max_shuttle_speed_km_h) AS max_shuttle_speed_km_h,
+                SUM(total_rallies) AS total_rallies,
+                SUM(total_strokes) AS total_strokes,
+                SUM(total_distance_meters) AS total_distance_meters
+            FROM analyses {where} {group_sql}
+        """
+        rows = _connect().execute(sql, params).fetchall()
+
+        groups = []
+        for row in rows:
+            group = dict(row)
+            if group_expr:
+                group[group_by] = group.pop("grp")
+            for key, value in group.items():
+                if isinstance(value, float):
+                    group[key] = round(value, 2)
+            groups.append(group)
+        return groups
+
+    @staticmethod
+    def save_trajectory(analysis_id: str, trajectory: np.ndarray):
+        """Store the per-frame shuttle track (Trajectory.data) next to the result"""
+        filepath = os.path.join(RESULTS_DIR, f"{analysis_id}.npy")
+        fd, tmp_path = tempfile.mkstemp(dir=RESULTS_DIR, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, trajectory, allow_pickle=False)
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
         return filepath
+
+    @staticmethod
+    def profile_path(analysis_id: str) -> str:
+        """Folded-stack CPU profile of an analysis run with profiling on"""
+        return os.path.join(RESULTS_DIR, f"{analysis_id}.folded")
+
+    @staticmethod
+    def save_profile(analysis_id: str, profiler) -> str:
+        """Store a stopped SamplingProfiler's stacks next to the result"""
+        return profiler.save(AnalysisStorage.profile_path(analysis_id))
+
+    @staticmethod
+    def load_trajectory(analysis_id: str):
+        """Structured array saved by save_trajectory, or None"""
+        filepath = os.path.join(RESULTS_DIR, f"{analysis_id}.npy")
+        if not os.path.exists(filepath):
+            return None
+        return np.load(filepath, allow_pickle=False)
     
     @staticmethod
     def _generate_insights(metrics: dict) -> dict:
@@ -74,10 +414,26 @@ class AnalysisStorage:
             return "needs_practice"
     
     @staticmethod
-    def get_latest():
-        """Get most recent analysis for chat"""
-        latest_path = os.path.join(RESULTS_DIR, "latest.json")
-        if os.path.exists(latest_path):
-            with open(latest_path, 'r') as f:
-                return json.load(f)
-        return None
\ No newline at end of file
+    def get_latest(player: Optional[str] = None, session: Optional[str] = None):
+        """
+        Get most recent analysis for chat
+
+        Args:
+            player: Only consider this player's analyses
+            session: Only consider analyses of this session
+
+        Returns:
+            dict: Stored result, or None
+        """
+        conn = _connect()
+        if player is None and session is None:
+            row = conn.execute(
+                "SELECT a.result FROM meta m JOIN analyses a ON a.id = m.value WHERE m.key = 'latest_id'"
+            ).fetchone()
+        else:
+            clauses, params = _where(player=player, session=session)
+            row = conn.execute(
+                f"SELECT result FROM analyses WHERE {' AND '.join(clauses)} "
+                f"ORDER BY created_at DESC, id DESC LIMIT 1", params
+            ).fetchone()
+        return json.loads(row["result"]) if row else None
\ No newline at end of file
@@ -0,0 +1,605 @@
+"""
+Video analysis pipeline - detection, rendering and metrics for one upload.
+Runs on a job-queue worker thread, never on the event loop.
+
+Rendering the annotated video is optional: metrics-only analyses keep the
+source video and the shuttle trajectory so render_analysis can draw and
+encode the video later, on demand.
+"""
+import os
+import time
+import uuid
+from typing import Optional
+
+import numpy as np
+
+from badminton_model.tracker.shuttle_tracker import ShuttleTracker
+from badminton_model.tracker.adaptive_sampler import AdaptiveSampler
+from badminton_model.tracker.roi_search import RoiSearch
+from badminton_model.tracker.combined_detector import CombinedDetector
+from badminton_model.tracker.detection_cache import DetectionCache
+from badminton_model.utils import (
+    iter_video, iter_video_frames, first_sample, iter_batches, save_video, get_video_info,
+    Trajectory, Pipeline, StreamingInterpolator, SamplingProfiler
+)
+from analysis.footwork import analyze_footwork  # Now includes stroke classification!
+from analysis.players import analyze_players
+from analysis_storage import AnalysisStorage
+from metrics import (
+    INFERENCE_BATCH_SECONDS, FRAMES_PROCESSED, JOBS, JOB_SECONDS, JOBS_RUNNING,
+    timed_stage, observe_pipeline, log_sampled
+)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(BASE_DIR, "outputs")
+
+# Uploads of metrics-only analyses, kept until their video is rendered
+SOURCE_DIR = os.path.join(BASE_DIR, "sources")
+os.makedirs(SOURCE_DIR, exist_ok=True)
+
+# Kept sources never rendered within this many hours are deleted (the
+# metrics stay; only on-demand rendering is no longer possible)
+SOURCE_TTL_HOURS = float(os.environ.get("SOURCE_TTL_HOURS", "72"))
+
+# Sampling used for every upload: every 3rd frame, first 300 sampled frames
+FRAME_STRIDE = 3
+MAX_FRAMES = 300
+
+# Default for ?adaptive=: sample by shuttle motion (sparse in dead time, every
+# frame around hits) instead of a fixed stride; covers the same span of video
+ADAPTIVE_SAMPLING = os.environ.get("ADAPTIVE_SAMPLING", "0") == "1"
+
+# Search a small crop around the predicted shuttle position while tracking is
+# locked, full frames otherwise (in-process tracker only)
+ROI_TRACKING = os.environ.get("ROI_TRACKING", "0") == "1"
+ROI_CROP_SIZE = int(os.environ.get("ROI_CROP_SIZE", "160"))
+
+# Longest run of missed (sampled) frames bridged by interpolation; ~1s at stride 3
+MAX_INTERPOLATION_GAP = int(os.environ.get("MAX_INTERPOLATION_GAP", "10"))
+
+# Full-match mode: length of one shard handed to a detection process
+MATCH_WINDOW_SEC = float(os.environ.get("MATCH_WINDOW_SEC", "60"))
+
+# Detections keyed by video content + weights + settings; re-uploads skip YOLO
+DETECTION_CACHE_DIR = os.path.join(BASE_DIR, "detection_cache")
+DETECTION_CACHE_MB = int(os.environ.get("DETECTION_CACHE_MB", "1024"))
+detection_cache = DetectionCache(DETECTION_CACHE_DIR, max_bytes=DETECTION_CACHE_MB * 1024 * 1024)
+
+# Frames buffered between two pipeline stages (decode -> detect -> annotate -> encode)
+PIPELINE_QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE", "16"))
+
+# Sampling interval of ?profile=true runs
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+
+
+def empty_metrics(frames_processed: int = 0) -> dict:
+    """Metrics payload used when no shuttle was detected"""
+    return {
+        "frames_processed": frames_processed,
+        "detections": 0,
+        "consistency_percent": 0,
+        "avg_shuttle_speed_km_h": 0,
+        "max_shuttle_speed_km_h": 0,
+        "min_speed_km_h": 0,
+        "speed_variance": 0,
+        "avg_rally_length_frames": 0,
+        "avg_rally_length_seconds": 0,
+        "total_rallies": 0,
+        "total_distance_meters": 0,
+        "movement_smoothness": 0,
+        # Empty stroke data
+        "stroke_counts": {
+            "smash": 0,
+            "clear": 0,
+            "drop": 0,
+            "net": 0,
+            "drive": 0,
+            "unknown": 0
+        },
+        "stroke_quality": {
+            "smash": {"count": 0, "avg_speed": 0, "max_speed": 0, "avg_angle": 0},
+            "drop": {"count": 0, "net_clearance": 0, "accuracy": 0},
+            "clear": {"count": 0, "avg_apex": 0, "depth_percentage": 0}
+        }
+    }
+
+
+def _track_progress(frames, job, stage, total, start, span):
+    """Pass frames through while reporting progress in [start, start + span]"""
+    for i, frame in enumerate(frames, 1):
+        if job is not None and total:
+            job.update(stage=stage, progress=start + span * min(i / total, 1.0))
+        yield frame
+
+
+def _expected_frames(video_path, max_frames=MAX_FRAMES):
+    """Number of sampled frames the decode stage will produce (0 if unknown)"""
+    frame_count = get_video_info(video_path)["frame_count"]
+    if not frame_count:
+        return max_frames or 0
+    samples = frame_count // FRAME_STRIDE
+    return min(samples, max_frames) if max_frames else samples
+
+
+def _detect_stage(detector, known, raw_boxes, raw_conf, positions=False, roi=None, players=None):
+    """
+    Pipeline stage: frames in, (frame, raw box) pairs out.
+
+    With `known` detections (cache hit or pool result) the model is skipped
+    and the boxes are just paired with the decoded frames; otherwise frames
+    are detected batch by batch and the raw results collected for the cache.
+    With `positions`, the sample time (in FRAME_STRIDE steps) is passed
+    along as well, for unevenly sampled frames. An optional RoiSearch
+    narrows detection to a crop around the predicted shuttle position.
+
+    With a `players` list, `detector` is a CombinedDetector: players are
+    tracked on the same batches, concurrently with the shuttle model (or
+    alone when the shuttle is known), and collected into the list.
+    """
+    model = "shuttle" if players is None else ("players" if known is not None else "combined")
+
+    def stage(frames):
+        if known is not None and players is None:
+            boxes = known.boxes.astype(np.float64)
+            if positions:
+                yield from zip(frames, boxes, (known.frames / FRAME_STRIDE).tolist())
+            else:
+                yield from zip(frames, boxes)
+            return
+
+        if players is not None:
+            detector.reset()
+
+        frame_idx = first_sample(FRAME_STRIDE)
+        done = 0
+        for batch in iter_batches(frames, detector.batch_size):
+            indices = range(frame_idx, frame_idx + len(batch) * FRAME_STRIDE, FRAME_STRIDE)
+            frame_idx += len(batch) * FRAME_STRIDE
+            start = time.perf_counter()
+            if players is None:
+                boxes, conf = detector.detect_batch(batch, roi=roi, frame_indices=indices)
+            else:
+                boxes, conf, batch_players = detector.detect_batch(
+                    batch, roi=roi, frame_indices=indices, shuttle=known is None
+                )
+                players.extend(batch_players)
+            INFERENCE_BATCH_SECONDS.observe(time.perf_counter() - start, model=model)
+
+            if known is not None:
+                boxes = known.boxes[done:done + len(batch)].astype(np.float64)
+            else:
+                raw_boxes.append(boxes)
+                raw_conf.append(conf)
+            done += len(batch)
+            yield from zip(batch, boxes)
+
+    return stage
+
+
+def _adaptive_source(detector, video_path, sampler, end_frame, raw_frames, raw_boxes, raw_conf,
+                     roi=None):
+    """
+    Pipeline source for adaptive sampling. The next frame to decode depends
+    on the last detections, so decode and detection share one thread.
+
+    Yields:
+        (frame, raw box, sample time in FRAME_STRIDE steps) per sampled frame
+    """
+    def observe_batch(seconds, frames):
+        INFERENCE_BATCH_SECONDS.observe(seconds, model="shuttle")
+
+    for frame_idx, frame, box, conf in detector.iter_adaptive(video_path, sampler, end_frame=end_frame,
+                                                                  roi=roi, on_batch=observe_batch):
+        raw_frames.append(frame_idx)
+        raw_boxes.append(box[None])
+        raw_conf.append(np.array([conf]))
+        yield frame, box, frame_idx / FRAME_STRIDE
+
+
+def _annotate_stage(items):
+    """Pipeline stage: interpolate boxes on the fly and draw them"""
+    prev_center = None
+    interpolator = StreamingInterpolator(MAX_INTERPOLATION_GAP)
+    for i, (frame, box) in enumerate(interpolator.feed(items)):
+        det = {} if np.isnan(box).any() else {0: box.tolist()}
+        prev_center = ShuttleTracker.annotate_frame(frame, i, det, prev_center)
+        yield frame
+
+
+def _discard_stage(items):
+    """Pipeline sink for metrics-only runs: frames are dropped after detection"""
+    for _ in items:
+        pass
+    return ()
+
+
+def _encode_stage(video_path, output_path):
+    def stage(frames):
+        save_video(frames, video_path, output_path)
+        return ()
+
+    return stage
+
+
+def output_path_for(analysis_id: str) -> str:
+    """Annotated video of an analysis (doubles as its render cache)"""
+    return os.path.join(OUTPUT_DIR, f"{analysis_id}.mp4")
+
+
+def source_path_for(analysis_id: str) -> str:
+    return os.path.join(SOURCE_DIR, f"{analysis_id}.mp4")
+
+
+def prune_sources(keep=(), ttl_hours: float = SOURCE_TTL_HOURS) -> int:
+    """
+    Delete kept sources older than `ttl_hours`.
+
+    Args:
+        keep: Analysis ids whose source must stay (e.g. a render in progress)
+
+    Returns:
+        int: Number of sources removed
+    """
+    cutoff = time.time() - ttl_hours * 3600
+    removed = 0
+    for name in os.listdir(SOURCE_DIR):
+        analysis_id, ext = os.path.splitext(name)
+        path = os.path.join(SOURCE_DIR, name)
+        if ext != ".mp4" or analysis_id in keep:
+            continue
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    if removed:
+        print(f"🧹 Removed {removed} unrendered source video(s) older than {ttl_hours}h")
+    return removed
+
+
+def can_render(analysis_id: str) -> bool:
+    """True if the video is rendered already or can be rendered on demand"""
+    if os.path.exists(output_path_for(analysis_id)):
+        return True
+    return (os.path.exists(source_path_for(analysis_id))
+            and AnalysisStorage.load_trajectory(analysis_id) is not None)
+
+
+def run_job(job, detector, task: str = "analyze", profile: bool = False, **payload) -> dict:
+    """
+    JobQueue handler: dispatch on the job's task.
+
+    With `profile`, a SamplingProfiler records this run and its stacks are
+    stored next to the result (see AnalysisStorage.profile_path).
+    """
+    start = time.perf_counter()
+    status = "failed"
+    profiler = SamplingProfiler(interval=PROFILE_INTERVAL_MS / 1000).start() if profile else None
+    JOBS_RUNNING.inc()
+    try:
+        if task == "render":
+            result = render_analysis(job, **payload)
+        else:
+            result = run_analysis(job, detector, **payload)
+        status = "done"
+    finally:
+        JOBS_RUNNING.dec()
+        JOBS.inc(task=task, status=status)
+        JOB_SECONDS.observe(time.perf_counter() - start, task=task)
+        if profiler is not None:
+            profiler.stop()
+
+    if profiler is not None and task == "analyze":
+        AnalysisStorage.save_profile(result["analysis_id"], profiler)
+        result["profile"] = {**profiler.summary(), "url": f"/analyses/{result['analysis_id']}/profile"}
+        print(f"🔬 Profile saved: {profiler.samples} samples, {len(profiler.stacks)} stacks")
+    return result
+
+
+def run_analysis(job, detector, video_path: str, render: bool = True, full_match: bool = False,
+                 adaptive: bool = False, players: bool = False, player: Optional[str] = None,
+                 session: Optional[str] = None) -> dict:
+    """
+    Analyze one uploaded video end to end.
+
+    Decode, detection, drawing and encoding run as a threaded pipeline, so
+    OpenCV work overlaps with inference instead of waiting for it.
+
+    Args:
+        job: Job to report stage/progress on (may be None)
+        detector: ShuttleTracker (or CombinedDetector, when a player model
+            is loaded) owned by the calling worker, or a shared DetectionPool
+            when inference runs in worker processes
+        video_path: Uploaded video; removed once analysis finishes
+        render: Draw and encode the annotated video. When False only metrics
+            are computed; the upload is kept so render_analysis can build
+            the video later.
+        full_match: Analyze the whole video instead of the first MAX_FRAMES
+            sampled frames. With a DetectionPool the match is sharded into
+            time windows processed in parallel and stitched back together.
+        adaptive: Pick the stride per batch from the shuttle motion (see
+            AdaptiveSampler) instead of sampling every FRAME_STRIDE frames.
+            Needs the in-process tracker; ignored with a DetectionPool.
+        players: Track players in the same pass as the shuttle and add
+            per-player movement metrics. Needs a CombinedDetector with a
+            player model and fixed-stride sampling.
+        player: Optional player tag stored with the result (for queries)
+        session: Optional session tag stored with the result
+
+    Returns:
+        dict: Response payload (analysis_id, video_url, render_url, metrics,
+        pipeline stats)
+    """
+    try:
+        max_frames = None if full_match else MAX_FRAMES
+        known = None
+        trajectory = None
+        sampler = None
+        roi = None
+        combined = None
+        if isinstance(detector, CombinedDetector):
+            combined = detector
+            detector = combined.shuttle
+
+        track_players = players and combined is not None and combined.player is not None and not adaptive
+        if players and not track_players:
+            print("⚠️ Player tracking needs the in-process player model and a fixed stride, skipping players")
+        known_players = None
+        if track_players:
+            player_key = combined.player.cache_key(detection_cache, video_path,
+                                                   stride=FRAME_STRIDE, max_frames=max_frames)
+            known_players = detection_cache.get(player_key)
+        detect_players = track_players and known_players is None
+        player_detections = [] if detect_players else known_players
+
+        if isinstance(detector, ShuttleTracker):
+            # In-process model: detection runs as a pipeline stage
+            if full_match:
+                print("⚠️ Full-match analysis without a detection pool runs in one process; "
+                      "set INFERENCE_PROCESSES>0 to shard it over cores")
+            if ROI_TRACKING:
+                roi = RoiSearch(crop_size=ROI_CROP_SIZE)
+            if adaptive:
+                # Same span of video as fixed sampling, fewer frames inside it
+                sampler = AdaptiveSampler(base_stride=FRAME_STRIDE)
+                end_frame = max_frames * FRAME_STRIDE if max_frames else None
+                cache_key = detector.cache_key(detection_cache, video_path, sampler=sampler, roi=roi,
+                                               start_frame=0, end_frame=end_frame)
+            else:
+                cache_key = detector.cache_key(detection_cache, video_path, roi=roi,
+                                               stride=FRAME_STRIDE, max_frames=max_frames)
+            known = detection_cache.get(cache_key)
+            progress_start = 0.0
+        else:
+            if adaptive:
+                print("⚠️ Adaptive sampling needs the in-process tracker, using a fixed stride")
+
+            # Process pool: detection fans out over processes first
+            def detect_progress(fraction):
+                if job is not None:
+                    job.update(stage="detecting", progress=0.7 * fraction)
+
+            with timed_stage("inference"):
+                if full_match:
+                    trajectory = detector.detect_match(
+                        video_path,
+                        stride=FRAME_STRIDE,
+                        max_gap=MAX_INTERPOLATION_GAP,
+                        window_sec=MATCH_WINDOW_SEC,
+                        cache=detection_cache,
+                        progress=detect_progress
+                    )
+                    known = trajectory.detections_only()
+                else:
+                    known = detector.detect_video(
+                        video_path,
+                        stride=FRAME_STRIDE,
+                        max_frames=max_frames,
+                        cache=detection_cache,
+                        progress=detect_progress
+                    )
+            progress_start = 0.7 if render else 0.95
+
+        if known is not None:
+            known = Trajectory.from_detections(known)
+
+        analysis_id = str(uuid.uuid4())
+        output_path = output_path_for(analysis_id)
+        raw_frames, raw_boxes, raw_conf = [], [], []
+        pipeline_stats = None
+
+        total = _expected_frames(video_path, max_frames)
+        stage = "rendering" if known is not None else "processing"
+
+        def track(items):
+            return _track_progress(items, job, stage, total, progress_start, 0.95 - progress_start)
+
+        source_name = "decode"
+        if sampler is None:
+            source = iter_video(video_path, stride=FRAME_STRIDE, max_frames=max_frames)
+            if detect_players:
+                # DECODE -> DETECT (players + shuttle on each batch)
+                head = [("detect", _detect_stage(combined, known, raw_boxes, raw_conf, roi=roi,
+                                                 players=player_detections))]
+            else:
+                head = [("detect", _detect_stage(detector, known, raw_boxes, raw_conf, roi=roi))]
+        elif known is not None:
+            # Cached adaptive run: decode exactly the frames sampled back then
+            source = iter_video_frames(video_path, known.frames)
+            head = [("detect", _detect_stage(detector, known, raw_boxes, raw_conf, positions=True))]
+        else:
+            source = _adaptive_source(detector, video_path, sampler, end_frame,
+                                      raw_frames, raw_boxes, raw_conf, roi=roi)
+            source_name = "decode+detect"
+            head = []
+
+        if render:
+            # DECODE -> DETECT -> DRAW -> ENCODE, bounded queues in between
+            encode = _encode_stage(video_path, output_path)
+            stages = head + [
+                ("annotate", _annotate_stage),
+                ("encode", lambda frames: encode(track(frames))),
+            ]
+        elif known is None or detect_players:
+            # DECODE -> DETECT, nothing is drawn or encoded
+            stages = head + [("discard", lambda items: _discard_stage(track(items)))]
+        else:
+            # Detections already known and no video wanted: nothing to decode
+            stages = None
+
+        if stages is not None:
+            pipeline = Pipeline(source, stages, queue_size=PIPELINE_QUEUE_SIZE, source_name=source_name)
+            pipeline.run()
+            pipeline_stats = pipeline.report()
+            observe_pipeline(pipeline_stats)
+            log_sampled("pipeline_stages", "⏱ Pipeline stages:", pipeline_stats)
+
+        if known is not None:
+            detections = known
+        else:
+            n = sum(len(b) for b in raw_boxes)
+            detections = Trajectory.from_boxes(
+                np.concatenate(raw_boxes) if raw_boxes else np.empty((0, 4)),
+                conf=np.concatenate(raw_conf) if raw_conf else None,
+                frames=np.array(raw_frames) if sampler is not None else first_sample(FRAME_STRIDE) + np.arange(n) * FRAME_STRIDE
+            )
+            if n:
+                detection_cache.put(cache_key, detections)
+            if roi is not None:
+                print(f"🎯 ROI search: {roi.roi_frames} cropped, {roi.full_frames} full-frame")
+
+        if not len(detections):
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise RuntimeError("❌ No frames read from video")
+
+        print(f"🎞 Frames read: {len(detections)}")
+        FRAMES_PROCESSED.inc(len(detections))
+
+        if detect_players and player_detections:
+            detection_cache.put(player_key, player_detections)
+
+        if trajectory is None:
+            with timed_stage("interpolation", len(detections)):
+                trajectory = detections.interpolate(max_gap=MAX_INTERPOLATION_GAP, frame_step=FRAME_STRIDE)
+        has_shuttle = trajectory.valid
+
+        print(f"📊 Shuttle in {int(has_shuttle.sum())}/{len(has_shuttle)} frames")
+        log_sampled("detections_per_frame", "📊 Detections per frame:", has_shuttle.astype(int).tolist())
+
+        if render:
+            if not os.path.exists(output_path):
+                raise RuntimeError("❌ Output video was not saved")
+            print("🎥 Output video saved to:", output_path)
+        else:
+            # Keep what render_analysis needs to draw the video later
+            os.replace(video_path, source_path_for(analysis_id))
+            print("⏭ Rendering skipped, source kept for on-demand render")
+
+        # ============================================================
+        # COMPUTE METRICS (NOW INCLUDES STROKE CLASSIFICATION!)
+        # ============================================================
+        if job is not None:
+            job.update(stage="analyzing", progress=0.95)
+
+        with timed_stage("analytics", len(trajectory)):
+            if has_shuttle.any():
+                metrics = analyze_footwork(trajectory, fps=30, frame_step=FRAME_STRIDE)
+                print("✅ Metrics computed with stroke classification!")
+                print(f"   Strokes detected: {metrics.get('stroke_counts', {})}")
+            else:
+                print("⚠️ No shuttle detected in entire video")
+                metrics = empty_metrics(len(detections))
+
+            if track_players:
+                metrics["players"] = analyze_players(player_detections, fps=30, frame_step=FRAME_STRIDE)
+                print(f"🏸 Players tracked: {len(metrics['players'])}")
+
+        # Store results for chat
+        with timed_stage("storage"):
+            AnalysisStorage.save_result(
+                analysis_id=analysis_id,
+                metrics=metrics,
+                video_path=output_path if render else None,
+                player=player,
+                session=session
+            )
+            AnalysisStorage.save_trajectory(analysis_id, trajectory.data)
+        print(f"💾 Analysis results saved with ID: {analysis_id}")
+
+        print(f"✅ Analysis complete, total strokes: {sum(metrics.get('stroke_counts', {}).values())}")
+
+        return {
+            "message": "Analysis complete",
+            "analysis_id": analysis_id,
+            "video_url": f"/outputs/{analysis_id}.mp4" if render else None,
+            "render_url": f"/analyses/{analysis_id}/render",
+            "metrics": metrics,
+            "sampling": {
+                "mode": "adaptive" if sampler is not None else "fixed",
+                "frames_sampled": len(detections),
+                "frames_covered": int(detections.frames[-1] - detections.frames[0]) + 1,
+                "roi": roi.stats() if roi is not None and known is None else None
+            },
+            "pipeline": pipeline_stats
+        }
+
+    finally:
+        # Cleanup uploaded file (already moved away for metrics-only runs)
+        try:
+            os.remove(video_path)
+        except Exception:
+            pass
+
+
+def render_analysis(job, analysis_id: str) -> dict:
+    """
+    Draw and encode the annotated video of a stored analysis from its
+    source video and trajectory. The result is cached in OUTPUT_DIR under
+    the analysis id, so repeated requests return it straight away.
+
+    Returns:
+        dict: Response payload (analysis_id, video_url)
+    """
+    output_path = output_path_for(analysis_id)
+    video_url = f"/outputs/{analysis_id}.mp4"
+
+    if not os.path.exists(output_path):
+        source_path = source_path_for(analysis_id)
+        data = AnalysisStorage.load_trajectory(analysis_id)
+        if data is None or not os.path.exists(source_path):
+            raise FileNotFoundError(f"❌ Nothing to render for analysis {analysis_id}")
+
+        trajectory = Trajectory(data)
+        # Encode under a temporary name so a half-written file is never served
+        partial_path = os.path.join(OUTPUT_DIR, f"{analysis_id}.partial.mp4")
+        encode = _encode_stage(source_path, partial_path)
+
+        pipeline = Pipeline(
+            iter_video_frames(source_path, trajectory.frames),
+            [
+                ("annotate", lambda frames: ShuttleTracker.iter_shuttle_bbox(frames, trajectory)),
+                ("encode", lambda frames: encode(
+                    _track_progress(frames, job, "rendering", len(trajectory), 0.0, 0.95)
+                )),
+            ],
+            queue_size=PIPELINE_QUEUE_SIZE
+        )
+        pipeline.run()
+        observe_pipeline(pipeline.report())
+        os.replace(partial_path, output_path)
+        print("🎥 Output video rendered to:", output_path)
+
+        with timed_stage("storage"):
+            AnalysisStorage.update_result(analysis_id, video_path=output_path)
+        try:
+            os.remove(source_path)
+        except FileNotFoundError:
+            pass
+
+    return {
+        "message": "Render complete",
+        "analysis_id": analysis_id,
+        "video_url": video_url
+    }
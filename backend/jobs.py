@@ -0,0 +1,168 @@
+"""
+Background job queue for video analysis.
+
+POST /analyze only enqueues work; a fixed pool of worker threads pulls jobs
+off the queue and runs them, so the event loop never blocks on decode,
+inference or encode and throughput scales with the number of workers.
+"""
+import queue
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+
+class Job:
+    """State of one queued analysis"""
+
+    def __init__(self, job_id: str, payload: dict):
+        self.id = job_id
+        self.payload = payload
+        self.status = "queued"      # queued -> running -> done | failed
+        self.stage = "queued"
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+
+    def update(self, stage: Optional[str] = None, progress: Optional[float] = None):
+        """Called from the worker to report what it is doing (progress in 0-1)"""
+        if stage is not None:
+            self.stage = stage
+        if progress is not None:
+            self.progress = round(min(max(progress, 0.0), 1.0), 3)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """
+    FIFO queue drained by `num_workers` threads.
+
+    Args:
+        handler: handler(job, worker_state, **payload) -> result dict
+        num_workers: Number of jobs processed concurrently
+        worker_init: Optional factory called once per worker thread; its return
+            value is passed to every handler call on that thread (e.g. a model
+            instance that must not be shared between threads). If it raises,
+            it is retried before the worker's next job, and that job fails
+            with the error instead of staying queued.
+        max_finished: How many finished jobs to keep around for status queries
+    """
+
+    def __init__(
+        self,
+        handler: Callable,
+        num_workers: int = 1,
+        worker_init: Optional[Callable] = None,
+        max_finished: int = 1000
+    ):
+        self.handler = handler
+        self.num_workers = max(1, num_workers)
+        self.worker_init = worker_init
+        self.max_finished = max_finished
+
+        self._queue = queue.Queue()
+        self._jobs: Dict[str, Job] = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        """Spawn the worker threads (idempotent)"""
+        if self._threads:
+            return
+        for i in range(self.num_workers):
+            thread = threading.Thread(
+                target=self._worker_loop,
+                name=f"analysis-worker-{i}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Ask workers to exit once the jobs already queued are done"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, **payload) -> Job:
+        job = Job(str(uuid.uuid4()), payload)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def _prune(self):
+        """Drop the oldest finished jobs once more than max_finished are kept"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def _init_worker(self):
+        """(state, None) from worker_init, or (None, error) if it raised"""
+        if not self.worker_init:
+            return None, None
+        try:
+            return self.worker_init(), None
+        except Exception as e:
+            traceback.print_exc()
+            print(f"❌ {threading.current_thread().name} failed to initialize: {e}")
+            return None, e
+
+    def _worker_loop(self):
+        state, init_error = self._init_worker()
+
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+
+            if init_error is not None:
+                # Retry before every job, so a transient failure heals
+                state, init_error = self._init_worker()
+
+            job.status = "running"
+            job.started_at = datetime.now().isoformat()
+            try:
+                if init_error is not None:
+                    raise RuntimeError(f"Worker initialization failed: {init_error}")
+                job.result = self.handler(job, state, **job.payload)
+                job.status = "done"
+                job.update(stage="done", progress=1.0)
+            except Exception as e:
+                traceback.print_exc()
+                job.error = str(e)
+                job.status = "failed"
+                job.update(stage="failed")
+            finally:
+                job.finished_at = datetime.now().isoformat()
+                self._queue.task_done()
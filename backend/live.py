@@ -0,0 +1,462 @@
+"""
+Live analysis of a stream or of a video file that is still being written.
+
+A live session decodes its source as frames arrive (iter_live_video),
+detects the shuttle batch by batch and feeds the interpolated track into
+LiveFootwork, whose running metrics update in O(1) per frame. Every
+LIVE_PUSH_INTERVAL seconds a snapshot is published to the session's
+subscribers (GET /live/{id}/events), so coaches see the numbers during the
+session instead of after an upload.
+
+End-to-end latency is bounded: frames wait in a queue of at most
+LIVE_QUEUE_FRAMES (a stream that falls behind drops its oldest frames
+instead of lagging further), detection takes whatever is queued up to one
+batch without waiting for a full one, and the interpolator holds a frame
+back only while the gap around it can still be filled (MAX_INTERPOLATION_GAP
+samples). Each snapshot reports the latency of its newest frame.
+
+Strokes are classified inline as well (StreamingStrokeClassifier), so when
+the source ends (or the session is stopped) the running metrics already
+equal an analyze_footwork run over the whole track; they are stored with
+the interpolated trajectory like any other analysis.
+"""
+import asyncio
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Optional
+from urllib.parse import urlparse
+
+import numpy as np
+
+from badminton_model.utils import iter_live_video, is_stream_source, StreamingInterpolator, Trajectory
+from analysis.live import LiveFootwork
+from analysis_storage import AnalysisStorage
+from analyze import FRAME_STRIDE, MAX_INTERPOLATION_GAP, empty_metrics
+from metrics import INFERENCE_BATCH_SECONDS, FRAMES_PROCESSED, timed_stage
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Local files may only be read from here (e.g. a recorder writing into it)
+LIVE_SOURCE_DIR = os.environ.get("LIVE_SOURCE_DIR", os.path.join(BASE_DIR, "live_sources"))
+
+# Seconds between two metric snapshots pushed to subscribers
+LIVE_PUSH_INTERVAL = float(os.environ.get("LIVE_PUSH_INTERVAL", "0.5"))
+
+# Decoded frames waiting for detection; bounds latency and memory
+LIVE_QUEUE_FRAMES = int(os.environ.get("LIVE_QUEUE_FRAMES", "32"))
+
+# A source without a new frame for this long is considered finished
+LIVE_IDLE_TIMEOUT = float(os.environ.get("LIVE_IDLE_TIMEOUT", "10"))
+
+# Concurrent live sessions (they share one detector)
+LIVE_MAX_SESSIONS = int(os.environ.get("LIVE_MAX_SESSIONS", "4"))
+
+STREAM_SCHEMES = ("rtsp", "rtsps", "rtmp", "http", "https", "udp", "srt")
+
+# Streams the server may connect to, comma separated: host names, host:port
+# or URL prefixes (rtsp://10.0.0.5/live/). Empty refuses every stream, so
+# clients can't make the server open arbitrary URLs.
+LIVE_STREAM_ALLOWLIST = [entry.strip() for entry in os.environ.get("LIVE_STREAM_ALLOWLIST", "").split(",")
+                         if entry.strip()]
+
+# Frame rate assumed when a source doesn't report a plausible one
+LIVE_DEFAULT_FPS = float(os.environ.get("LIVE_DEFAULT_FPS", "30"))
+MAX_SOURCE_FPS = 240
+
+
+class LiveError(Exception):
+    """Invalid live request; `status_code` is the HTTP status to answer with"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LiveSession:
+    """State of one live analysis and the queues of its subscribers"""
+
+    def __init__(self, session_id: str, source: str, player: Optional[str] = None,
+                 session: Optional[str] = None, fps: Optional[float] = None):
+        self.id = session_id
+        self.source = source
+        self.player = player
+        self.session = session
+        self.fps = fps              # None until the source reports its frame rate
+        self.status = "starting"    # starting -> running -> done | failed
+        self.error = None
+        self.analysis_id = None
+        self.created_at = datetime.now().isoformat()
+        self.finished_at = None
+
+        self.footwork = None        # LiveFootwork, once the frame rate is known
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.latency_ms = None
+        self.metrics = None         # full metrics once finished
+
+        self.stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._subscribers = []      # (event loop, asyncio.Queue)
+        self._snapshot = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def source_opened(self, fps: float):
+        """The source reported its frame rate (reader thread); the first plausible one is kept"""
+        if self.fps is None and 0 < fps <= MAX_SOURCE_FPS:
+            self.fps = fps
+
+    def start_metrics(self):
+        """Create the running metrics; called once the first frame is decoded"""
+        if self.fps is None:
+            print(f"⚠️ Live source {self.source} reports no frame rate, assuming {LIVE_DEFAULT_FPS} fps")
+            self.fps = LIVE_DEFAULT_FPS
+        self.footwork = LiveFootwork(fps=self.fps, frame_step=FRAME_STRIDE)
+
+    def event(self) -> dict:
+        """Latest state, as pushed to subscribers"""
+        with self._lock:
+            snapshot = self._snapshot
+        return {
+            "type": self.status if self.finished else "metrics",
+            "live_id": self.id,
+            "status": self.status,
+            "frames_read": self.frames_read,
+            "frames_dropped": self.frames_dropped,
+            "latency_ms": self.latency_ms,
+            "metrics": self.metrics if self.metrics is not None else snapshot,
+            "analysis_id": self.analysis_id,
+            "error": self.error,
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            **self.event(),
+            "source": self.source,
+            "fps": self.fps,
+            "player": self.player,
+            "session": self.session,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop) -> asyncio.Queue:
+        """
+        Queue on `loop` receiving every published event. Only the newest
+        event is kept, so a slow client skips snapshots instead of lagging.
+        """
+        events = asyncio.Queue(maxsize=1)
+        with self._lock:
+            self._subscribers.append((loop, events))
+        return events
+
+    def unsubscribe(self, events: asyncio.Queue):
+        with self._lock:
+            self._subscribers = [(loop, q) for loop, q in self._subscribers if q is not events]
+
+    def publish(self, snapshot: Optional[dict] = None, latency_ms: Optional[float] = None):
+        """Called from the session thread; hands the event to every subscriber's loop"""
+        with self._lock:
+            if snapshot is not None:
+                self._snapshot = snapshot
+            subscribers = list(self._subscribers)
+        if latency_ms is not None:
+            self.latency_ms = round(latency_ms, 1)
+        event = self.event()
+        for loop, events in subscribers:
+            try:
+                loop.call_soon_threadsafe(_put_latest, events, event)
+            except RuntimeError:
+                # The subscriber's loop is closed
+                self.unsubscribe(events)
+
+
+def _put_latest(events: asyncio.Queue, event: dict):
+    if events.full():
+        events.get_nowait()
+    events.put_nowait(event)
+
+
+class LiveManager:
+    """
+    Args:
+        detector: Callable returning the shuttle detector (loaded on first
+            use); one detector serves every session, one batch at a time
+        batch_size: Largest batch handed to the detector
+        max_sessions: Sessions running at once
+        max_finished: Finished sessions kept around for status queries
+    """
+
+    def __init__(self, detector: Callable, batch_size: int = 8, max_sessions: int = LIVE_MAX_SESSIONS,
+                 max_finished: int = 100):
+        self.detector = detector
+        self.batch_size = max(1, batch_size)
+        self.max_sessions = max_sessions
+        self.max_finished = max_finished
+        self._sessions: Dict[str, LiveSession] = OrderedDict()
+        self._threads: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+        self._detect_lock = threading.Lock()
+        os.makedirs(LIVE_SOURCE_DIR, exist_ok=True)
+
+    @staticmethod
+    def resolve_source(source: str) -> str:
+        """
+        Stream URL as is if LIVE_STREAM_ALLOWLIST allows it, or the path of a
+        file inside LIVE_SOURCE_DIR. Anything else (other schemes or hosts,
+        paths outside the directory) is refused.
+        """
+        source = (source or "").strip()
+        if is_stream_source(source):
+            if urlparse(source).scheme.lower() not in STREAM_SCHEMES:
+                raise LiveError(f"Unsupported stream, use one of: {', '.join(STREAM_SCHEMES)}")
+            if not LiveManager.stream_allowed(source):
+                raise LiveError("Stream source is not in LIVE_STREAM_ALLOWLIST", 403)
+            return source
+        if not source or os.path.basename(source) != source or source in (".", ".."):
+            raise LiveError(f"Local sources must be a file name inside {LIVE_SOURCE_DIR}")
+        return os.path.join(LIVE_SOURCE_DIR, source)
+
+    @staticmethod
+    def stream_allowed(url: str, allowlist=None) -> bool:
+        """
+        True if `url` matches an entry of the allowlist (default
+        LIVE_STREAM_ALLOWLIST): a host name, a host:port, or a URL prefix
+        with the same scheme and host whose path starts at a segment boundary.
+        """
+        parsed = urlparse(url)
+        try:
+            host = (parsed.hostname or "").lower()
+            port = parsed.port
+        except ValueError:
+            return False
+        if not host:
+            return False
+
+        for entry in LIVE_STREAM_ALLOWLIST if allowlist is None else allowlist:
+            entry = entry.lower()
+            if "://" not in entry:
+                if entry in (host, f"{host}:{port}"):
+                    return True
+                continue
+
+            allowed = urlparse(entry)
+            try:
+                same_host = (allowed.hostname, allowed.port) == (host, port)
+            except ValueError:
+                continue
+            prefix = allowed.path.rstrip("/")
+            if (allowed.scheme == parsed.scheme.lower() and same_host
+                    and (parsed.path == prefix or parsed.path.startswith(prefix + "/"))):
+                return True
+        return False
+
+    def start(self, source: str, player: Optional[str] = None, session: Optional[str] = None,
+              fps: Optional[float] = None) -> LiveSession:
+        """
+        Args:
+            fps: Frame rate of the source; by default the one it reports
+        """
+        path = self.resolve_source(source)
+        with self._lock:
+            running = sum(not s.finished for s in self._sessions.values())
+            if running >= self.max_sessions:
+                raise LiveError(f"{running} live sessions already running", 429)
+            live = LiveSession(str(uuid.uuid4()), source, player=player, session=session, fps=fps)
+            self._sessions[live.id] = live
+            self._prune()
+            thread = threading.Thread(target=self._run, args=(live, path), name=f"live-{live.id[:8]}",
+                                      daemon=True)
+            self._threads[live.id] = thread
+        thread.start()
+        return live
+
+    def get(self, live_id: str) -> Optional[LiveSession]:
+        with self._lock:
+            return self._sessions.get(live_id)
+
+    def stop(self, live_id: str) -> Optional[LiveSession]:
+        """Ask a session to finish; what was analyzed so far is still stored"""
+        live = self.get(live_id)
+        if live is not None:
+            live.stop_event.set()
+        return live
+
+    def stop_all(self, timeout: float = 30.0):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            threads = list(self._threads.values())
+        for live in sessions:
+            live.stop_event.set()
+        for thread in threads:
+            thread.join(timeout)
+
+    def _prune(self):
+        finished = [live_id for live_id, live in self._sessions.items() if live.finished]
+        for live_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._sessions[live_id]
+            self._threads.pop(live_id, None)
+
+    # ------------------------------------------------------------------
+    # Session thread
+    # ------------------------------------------------------------------
+    def _run(self, live: LiveSession, path: str):
+        print(f"📡 Live session {live.id} started on {live.source}")
+        try:
+            live.status = "running"
+            live.publish()
+            frames, boxes, conf = self._analyze_live(live, path)
+            self._finish(live, frames, boxes, conf)
+            live.status = "done"
+            print(f"✅ Live session {live.id} done: {live.frames_read} frames, analysis {live.analysis_id}")
+        except Exception as e:
+            traceback.print_exc()
+            live.error = str(e)
+            live.status = "failed"
+        finally:
+            live.finished_at = datetime.now().isoformat()
+            live.stop_event.set()
+            live.publish()
+            with self._lock:
+                self._threads.pop(live.id, None)
+
+    @staticmethod
+    def _read(live: LiveSession, path: str, frames: queue.Queue, stream: bool):
+        """
+        Reader thread: decoded frames into the bounded queue. A stream that
+        gets ahead of detection drops its oldest frames; a file just waits.
+        """
+        try:
+            for frame_idx, frame in iter_live_video(path, stride=FRAME_STRIDE, idle_timeout=LIVE_IDLE_TIMEOUT,
+                                                    stop=live.stop_event, on_open=live.source_opened):
+                item = (frame_idx, frame, time.perf_counter())
+                live.frames_read += 1
+                while not live.stop_event.is_set():
+                    try:
+                        frames.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        if stream:
+                            try:
+                                frames.get_nowait()
+                                live.frames_dropped += 1
+                            except queue.Empty:
+                                pass
+        finally:
+            frames.put(None)
+
+    def _analyze_live(self, live: LiveSession, path: str):
+        """Detect and update the running metrics until the source ends; returns the raw track"""
+        detector = self.detector()
+        stream = is_stream_source(path)
+        frames = queue.Queue(maxsize=max(LIVE_QUEUE_FRAMES, self.batch_size))
+        reader = threading.Thread(target=self._read, args=(live, path, frames, stream),
+                                  name=f"live-read-{live.id[:8]}", daemon=True)
+        reader.start()
+
+        try:
+            return self._consume(live, detector, frames)
+        except BaseException:
+            # Let the reader see the stop and hand in its end marker
+            live.stop_event.set()
+            while not frames.empty():
+                frames.get_nowait()
+            raise
+        finally:
+            reader.join()
+
+    def _consume(self, live: LiveSession, detector, frames: queue.Queue):
+        interpolator = StreamingInterpolator(MAX_INTERPOLATION_GAP)
+        raw_frames, raw_boxes, raw_conf = [], [], []
+        decoded_at = {}
+        last_push = time.perf_counter()
+        ended = False
+
+        while not ended:
+            # Block for one frame, then take whatever else is queued (up to a batch)
+            batch = [frames.get()]
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                try:
+                    batch.append(frames.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                ended = True
+                batch.pop()
+
+            released = []
+            if batch:
+                if live.footwork is None:
+                    live.start_metrics()
+                indices = [frame_idx for frame_idx, _, _ in batch]
+                start = time.perf_counter()
+                with self._detect_lock:
+                    boxes, conf = detector.detect_batch([frame for _, frame, _ in batch], frame_indices=indices)
+                INFERENCE_BATCH_SECONDS.observe(time.perf_counter() - start, model="live")
+                FRAMES_PROCESSED.inc(len(batch))
+
+                raw_frames.extend(indices)
+                raw_boxes.append(boxes)
+                raw_conf.append(conf)
+                for (frame_idx, _, read_at), box in zip(batch, boxes):
+                    decoded_at[frame_idx] = read_at
+                    # Same positions as Trajectory.interpolate(frame_step=...) on the saved run
+                    position = (frame_idx - raw_frames[0]) / FRAME_STRIDE
+                    released.extend(interpolator.push(frame_idx, box, position=position))
+            if ended:
+                released.extend(interpolator.finish())
+
+            newest = None
+            for frame_idx, box in released:
+                live.footwork.push(frame_idx, box)
+                newest = decoded_at.pop(frame_idx)
+
+            now = time.perf_counter()
+            if (ended and live.footwork is not None and live.footwork.frames) or (newest is not None and now - last_push >= LIVE_PUSH_INTERVAL):
+                live.publish(live.footwork.snapshot(),
+                             latency_ms=(now - newest) * 1000 if newest is not None else None)
+                last_push = now
+
+        if not raw_frames:
+            return np.empty(0, dtype=np.int64), np.empty((0, 4)), np.empty(0)
+        return np.array(raw_frames), np.concatenate(raw_boxes), np.concatenate(raw_conf)
+
+    @staticmethod
+    def _finish(live: LiveSession, frames: np.ndarray, boxes: np.ndarray, conf: np.ndarray):
+        """Store the session's final metrics and trajectory like an upload"""
+        if not len(frames):
+            raise RuntimeError("❌ No frames read from live source")
+
+        detections = Trajectory.from_boxes(boxes, conf=conf, frames=frames)
+        with timed_stage("interpolation", len(detections)):
+            trajectory = detections.interpolate(max_gap=MAX_INTERPOLATION_GAP, frame_step=FRAME_STRIDE)
+
+        if trajectory.valid.any():
+            metrics = live.footwork.snapshot()
+            # Keys of analyze_footwork only
+            del metrics["last_frame"], metrics["total_strokes"]
+        else:
+            print("⚠️ No shuttle detected in live session")
+            metrics = empty_metrics(len(detections))
+
+        analysis_id = str(uuid.uuid4())
+        with timed_stage("storage"):
+            AnalysisStorage.save_result(
+                analysis_id=analysis_id,
+                metrics=metrics,
+                video_path=None,
+                player=live.player,
+                session=live.session
+            )
+            AnalysisStorage.save_trajectory(analysis_id, trajectory.data)
+        live.metrics = metrics
+        live.analysis_id = analysis_id
+        print(f"💾 Live analysis results saved with ID: {analysis_id}")
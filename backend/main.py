@@ -1,10 +1,16 @@
+import asyncio
+import json
 import os
 import sys
+import threading
 import uuid
-from fastapi import FastAPI, UploadFile, File
+from typing import Optional
+from fastapi import FastAPI, UploadFile, File, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, FileResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 from analysis_storage import AnalysisStorage
 
 # ============================================================
@@ -13,8 +19,6 @@ from analysis_storage import AnalysisStorage
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_DIR = os.path.abspath(os.path.join(BASE_DIR, ".."))
 
-analysis_running = False
-
 if PROJECT_DIR not in sys.path:
     sys.path.insert(0, PROJECT_DIR)
 
@@ -27,8 +31,16 @@ os.makedirs(OUTPUT_DIR, exist_ok=True)
 # IMPORTS
 # ============================================================
 from badminton_model.tracker.shuttle_tracker import ShuttleTracker
-from badminton_model.utils import read_video, save_video
-from analysis.footwork import analyze_footwork  # Now includes stroke classification!
+from badminton_model.tracker.player_tracker import PlayerTracker
+from badminton_model.tracker.combined_detector import CombinedDetector
+from badminton_model.tracker.inference_backend import export_model
+from badminton_model.tracker.process_pool import DetectionPool
+from analyze import run_job, can_render, output_path_for, prune_sources, ADAPTIVE_SAMPLING
+from jobs import JobQueue
+from upload_sessions import UploadManager, UploadError
+from model_registry import ModelRegistry, ModelSlot
+from live import LiveManager, LiveError
+from metrics import REGISTRY, QUEUE_DEPTH, POOL_TASK_SECONDS
 
 # ============================================================
 # MODEL PATH
@@ -43,15 +55,143 @@ MODEL_PATH = os.path.join(
     "best.pt"
 )
 
+# Optional player model; when present, players are tracked in the same pass
+# as the shuttle for analyses that ask for them
+PLAYER_MODEL_PATH = os.path.join(
+    PROJECT_DIR,
+    "badminton_model",
+    "train",
+    "player_output",
+    "models",
+    "weights",
+    "best.pt"
+)
+
+# Default for ?players=: add per-player movement metrics to every analysis
+PLAYER_TRACKING = os.environ.get("PLAYER_TRACKING", "0") == "1"
+
+# Inference runtime: "torch" (best.pt as trained), "onnx" or "openvino";
+# the latter two run an export of best.pt (made once, on first load) on CPU
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "torch")
+INFERENCE_INT8 = os.environ.get("INFERENCE_INT8", "0") == "1"
+
+# 1 loads and warms every model in the background at startup; 0 loads each
+# worker's model on its first job (or on POST /warmup). /readyz reports
+# ready only once all models are warm.
+MODEL_WARMUP = os.environ.get("MODEL_WARMUP", "1") == "1"
+
+# Frames per YOLO predict call; tune per host with ShuttleTracker.benchmark_batch_sizes
+DETECT_BATCH_SIZE = int(os.environ.get("DETECT_BATCH_SIZE", "8"))
+
+# Number of videos analyzed concurrently (each worker owns its own model)
+ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", "2"))
+
+# > 0 runs inference in this many processes, each with its own model, and
+# splits every video across them; 0 keeps inference on the worker threads
+INFERENCE_PROCESSES = int(os.environ.get("INFERENCE_PROCESSES", "0"))
+
+# Uploads are copied to disk in chunks of this size
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Seconds between two sweeps of expired source videos and finished render jobs
+CLEANUP_INTERVAL_SEC = float(os.environ.get("CLEANUP_INTERVAL_SEC", "3600"))
+
+# Largest file accepted by the resumable upload API
+MAX_UPLOAD_MB = int(os.environ.get("MAX_UPLOAD_MB", "8192"))
+
+upload_manager = UploadManager(
+    os.path.join(UPLOAD_DIR, "sessions"),
+    max_size=MAX_UPLOAD_MB * 1024 * 1024
+)
+
 if not os.path.isfile(MODEL_PATH):
     raise FileNotFoundError(f"❌ Model not found at: {MODEL_PATH}")
 
 # ============================================================
-# LOAD MODEL
+# MODELS (loaded lazily, see model_registry)
+# ============================================================
+def _export_models():
+    """Export once, before workers / processes load the model concurrently"""
+    if INFERENCE_BACKEND == "torch":
+        return
+    export_model(MODEL_PATH, INFERENCE_BACKEND, int8=INFERENCE_INT8)
+    if os.path.isfile(PLAYER_MODEL_PATH):
+        export_model(PLAYER_MODEL_PATH, INFERENCE_BACKEND, int8=INFERENCE_INT8)
+
+
+def _load_worker_detector():
+    """YOLO models are not thread-safe, so every worker loads its own"""
+    _export_models()
+
+    print("🚀 Loading shuttle tracker model...")
+    tracker = ShuttleTracker(MODEL_PATH, batch_size=DETECT_BATCH_SIZE,
+                             backend=INFERENCE_BACKEND, int8=INFERENCE_INT8)
+    print("✅ Model loaded successfully!")
+
+    if not os.path.isfile(PLAYER_MODEL_PATH):
+        return tracker
+
+    print("🚀 Loading player tracker model...")
+    players = PlayerTracker(PLAYER_MODEL_PATH, batch_size=DETECT_BATCH_SIZE,
+                            backend=INFERENCE_BACKEND, int8=INFERENCE_INT8)
+    print("✅ Player model loaded, players and shuttle are detected in one pass")
+    return CombinedDetector(tracker, players)
+
+
+def _load_detection_pool():
+    """One pool shared by every worker; its processes each hold a model"""
+    _export_models()
+    print(f"🚀 Starting {INFERENCE_PROCESSES} inference processes...")
+    return DetectionPool(
+        MODEL_PATH,
+        processes=INFERENCE_PROCESSES,
+        batch_size=DETECT_BATCH_SIZE,
+        backend=INFERENCE_BACKEND,
+        int8=INFERENCE_INT8,
+        on_task=lambda kind, seconds: POOL_TASK_SECONDS.observe(seconds, kind=kind)
+    )
+
+
+def _load_live_detector():
+    """Live sessions share one in-process shuttle model, batch by batch"""
+    _export_models()
+    print("🚀 Loading shuttle tracker model for live sessions...")
+    return ShuttleTracker(MODEL_PATH, batch_size=DETECT_BATCH_SIZE,
+                          backend=INFERENCE_BACKEND, int8=INFERENCE_INT8)
+
+
+if INFERENCE_PROCESSES > 0:
+    model_registry = ModelRegistry(_load_detection_pool, slots=1)
+else:
+    model_registry = ModelRegistry(_load_worker_detector, slots=ANALYSIS_WORKERS)
+
+# ============================================================
+# JOB QUEUE
 # ============================================================
-print("🚀 Loading shuttle tracker model...")
-shuttle_tracker = ShuttleTracker(MODEL_PATH)
-print("✅ Model loaded successfully!")
+def _run_job(job, slot, task: str = "analyze", **payload) -> dict:
+    """Fetch the worker's detector on first use; render jobs never need it"""
+    detector = None
+    if task == "analyze":
+        if not slot.ready:
+            job.update(stage="loading_model")
+        detector = slot.get()
+    return run_job(job, detector, task=task, **payload)
+
+
+job_queue = JobQueue(
+    handler=_run_job,
+    num_workers=ANALYSIS_WORKERS,
+    worker_init=model_registry.slot
+)
+
+live_model = ModelSlot("live-model", _load_live_detector)
+live_manager = LiveManager(live_model.get, batch_size=DETECT_BATCH_SIZE)
+
+QUEUE_DEPTH.set_function(job_queue.queue_depth)
+MODELS_READY = REGISTRY.gauge(
+    "badminton_models_ready", "Model slots loaded and warm",
+    function=lambda: sum(slot.ready for slot in model_registry.slots)
+)
 
 # ============================================================
 # FASTAPI SETUP
@@ -70,13 +210,103 @@ app.add_middleware(
 # Mount static files
 app.mount("/outputs", StaticFiles(directory=OUTPUT_DIR), name="outputs")
 
+
+# Render job per analysis id, so repeated requests share one render
+render_jobs = {}
+cleanup_stop = threading.Event()
+
+
+def _prune_render_jobs():
+    """Forget render jobs that finished (or were dropped from the job queue)"""
+    for analysis_id, job_id in list(render_jobs.items()):
+        job = job_queue.get(job_id)
+        if job is None or job.finished:
+            render_jobs.pop(analysis_id, None)
+
+
+def _cleanup():
+    """Remove expired source videos, keeping those a render job still needs"""
+    _prune_render_jobs()
+    try:
+        prune_sources(keep=set(render_jobs))
+    except OSError as e:
+        print(f"⚠️ Source cleanup failed: {e}")
+
+
+def _cleanup_loop():
+    while not cleanup_stop.wait(CLEANUP_INTERVAL_SEC):
+        _cleanup()
+
+
+@app.on_event("startup")
+def start_workers():
+    job_queue.start()
+    if MODEL_WARMUP:
+        # In the background: the server takes requests while models load
+        model_registry.warmup()
+    _cleanup()
+    cleanup_stop.clear()
+    threading.Thread(target=_cleanup_loop, name="cleanup", daemon=True).start()
+
+
+@app.on_event("shutdown")
+def stop_workers():
+    cleanup_stop.set()
+    live_manager.stop_all()
+    job_queue.stop()
+    for detector in model_registry.loaded() + ([live_model.model] if live_model.model else []):
+        if hasattr(detector, "close"):
+            detector.close()
+
 # ============================================================
 # ROUTES
 # ============================================================
+def _job_accepted(job, message: str) -> JSONResponse:
+    return JSONResponse({
+        "message": message,
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "result_url": f"/jobs/{job.id}/result"
+    }, status_code=202)
+
+
+def _upload_error(e: UploadError) -> JSONResponse:
+    return JSONResponse({"error": str(e), **e.details}, status_code=e.status_code)
+
+
+def _profile_requested(request: Request, flag: bool = False) -> bool:
+    """?profile=true or an `X-Profile: 1` header turns on profiling for one job"""
+    return flag or request.headers.get("x-profile", "").lower() in ("1", "true", "yes")
+
+
 @app.get("/")
 def root():
     return {"message": "Backend is running", "cors": "enabled"}
 
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process serves requests (models may still be loading)"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: 200 once every model is loaded and warm, 503 before"""
+    status = model_registry.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.post("/warmup")
+def warmup():
+    """Start loading and warming every model that isn't yet; poll /readyz"""
+    model_registry.warmup()
+    status = model_registry.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 202)
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint: stage timings, inference latency, queue depth, frame counts"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.options("/analyze")
 async def analyze_options():
     return JSONResponse(
@@ -89,9 +319,9 @@ async def analyze_options():
     )
 
 @app.get("/latest-analysis")
-async def get_latest_analysis():
-    """Get latest analysis for chat consumption"""
-    result = AnalysisStorage.get_latest()
+def get_latest_analysis(player: Optional[str] = None, session: Optional[str] = None):
+    """Get latest analysis for chat consumption, optionally of one ?player= / ?session="""
+    result = AnalysisStorage.get_latest(player=player, session=session)
     if result:
         return JSONResponse(result)
     else:
@@ -101,127 +331,329 @@ async def get_latest_analysis():
         )
 
 @app.post("/analyze")
-async def analyze_video(file: UploadFile = File(...)):
-    print("🚀 Analysis started")
-    global analysis_running
+async def analyze_video(
+    request: Request,
+    file: UploadFile = File(...),
+    render: bool = True,
+    full_match: bool = False,
+    adaptive: bool = ADAPTIVE_SAMPLING,
+    players: bool = PLAYER_TRACKING,
+    player: Optional[str] = None,
+    session: Optional[str] = None,
+    profile: bool = False
+):
+    """
+    Save the upload and queue it for analysis; poll /jobs/{job_id} for progress.
+    With ?render=false only metrics are computed; the annotated video can be
+    requested later from /analyses/{analysis_id}/render. ?full_match=true
+    analyzes the whole video rather than its first 300 sampled frames;
+    ?adaptive=true samples frames by shuttle motion instead of a fixed stride;
+    ?players=true adds per-player movement metrics (needs the player model).
+    ?player= / ?session= tag the stored result for /analyses queries.
+    ?profile=true (or an X-Profile: 1 header) records a CPU profile of this
+    run, served from /analyses/{analysis_id}/profile.
+    """
+    temp_input = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}.mp4")
+    # Disk writes run in the threadpool so a large upload doesn't stall the event loop
+    f = await run_in_threadpool(open, temp_input, "wb")
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            await run_in_threadpool(f.write, chunk)
+    finally:
+        await run_in_threadpool(f.close)
 
-    if analysis_running:
-        return JSONResponse({
-            "message": "Analysis already in progress. Please wait.",
-            "error": "concurrent_analysis"
-        }, status_code=409)
+    print("📥 Uploaded video saved:", temp_input)
+
+    job = job_queue.submit(video_path=temp_input, render=render, full_match=full_match, adaptive=adaptive,
+                           players=players, player=player, session=session,
+                           profile=_profile_requested(request, profile))
+    print(f"🚀 Analysis queued: {job.id} ({job_queue.queue_depth()} waiting)")
 
-    analysis_running = True
+    return _job_accepted(job, "Analysis queued")
 
+# ============================================================
+# RESUMABLE UPLOADS
+# 1. POST /uploads                    -> upload_id
+# 2. PUT  /uploads/{id}?offset=N      -> raw bytes, repeat until done
+#    (after a dropped connection: GET /uploads/{id} and resume at "received")
+# 3. POST /uploads/{id}/finalize      -> checksum check, analysis job
+# ============================================================
+class UploadInit(BaseModel):
+    size: Optional[int] = None
+    sha256: Optional[str] = None
+    filename: Optional[str] = None
+    render: bool = True
+    full_match: bool = False
+    adaptive: bool = ADAPTIVE_SAMPLING
+    players: bool = PLAYER_TRACKING
+    player: Optional[str] = None
+    session: Optional[str] = None
+    profile: bool = False
+
+
+@app.post("/uploads")
+async def create_upload(init: UploadInit, request: Request):
+    """Open a resumable upload session"""
     try:
-        # Save uploaded video
-        temp_input = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}.mp4")
-        with open(temp_input, "wb") as f:
-            f.write(await file.read())
+        session = upload_manager.create(
+            size=init.size, sha256=init.sha256, filename=init.filename,
+            render=init.render, full_match=init.full_match, adaptive=init.adaptive,
+            players=init.players, player=init.player, session=init.session,
+            profile=_profile_requested(request, init.profile)
+        )
+    except UploadError as e:
+        return _upload_error(e)
+
+    return JSONResponse({
+        **session.to_dict(),
+        "chunk_url": f"/uploads/{session.id}",
+        "finalize_url": f"/uploads/{session.id}/finalize"
+    }, status_code=201)
+
+@app.get("/uploads/{upload_id}")
+async def get_upload(upload_id: str):
+    """Bytes received so far; a resuming client continues at "received" """
+    try:
+        return JSONResponse(upload_manager.get(upload_id).to_dict())
+    except UploadError as e:
+        return _upload_error(e)
 
-        print("📥 Uploaded video saved:", temp_input)
+@app.put("/uploads/{upload_id}")
+async def put_upload_chunk(upload_id: str, request: Request, offset: int):
+    """Append the request body at `offset`, streamed straight to disk"""
+    try:
+        received = await upload_manager.write_chunk(upload_id, offset, request.stream())
+    except UploadError as e:
+        return _upload_error(e)
+    return JSONResponse({"upload_id": upload_id, "received": received})
+
+@app.post("/uploads/{upload_id}/finalize")
+async def finalize_upload(upload_id: str, request: Request):
+    """Verify the upload and queue it for analysis"""
+    video_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}.mp4")
+    try:
+        session = await upload_manager.finalize(upload_id, video_path)
+    except UploadError as e:
+        return _upload_error(e)
+
+    print("📥 Chunked upload complete:", video_path)
+
+    job = job_queue.submit(
+        video_path=video_path,
+        render=session.options.get("render", True),
+        full_match=session.options.get("full_match", False),
+        adaptive=session.options.get("adaptive", ADAPTIVE_SAMPLING),
+        players=session.options.get("players", PLAYER_TRACKING),
+        player=session.options.get("player"),
+        session=session.options.get("session"),
+        profile=_profile_requested(request, session.options.get("profile", False))
+    )
+    print(f"🚀 Analysis queued: {job.id} ({job_queue.queue_depth()} waiting)")
 
-        # Read + analyze video
-        frames = read_video(temp_input)
-        frames = frames[:300]  # Limit to 300 frames for faster processing
+    return _job_accepted(job, "Analysis queued")
 
-        if not frames:
-            raise RuntimeError("❌ No frames read from video")
+@app.delete("/uploads/{upload_id}")
+async def delete_upload(upload_id: str):
+    """Abandon an upload session and free its disk space"""
+    upload_manager.discard(upload_id)
+    return JSONResponse({"upload_id": upload_id, "deleted": True})
 
-        print(f"🎞 Frames read: {len(frames)}")
+# ============================================================
+# LIVE ANALYSIS
+# 1. POST   /live                -> live_id (stream URL or a file in LIVE_SOURCE_DIR)
+# 2. GET    /live/{id}/events    -> server-sent events with the running metrics
+# 3. DELETE /live/{id}           -> stop early (also stops by itself at the end)
+#    The finished session is analyzed in full and stored: see analysis_id
+# ============================================================
+class LiveStart(BaseModel):
+    source: str
+    player: Optional[str] = None
+    session: Optional[str] = None
 
-        # SHUTTLE DETECTION
-        detections = shuttle_tracker.detect_shuttle(frames)
-        detections = shuttle_tracker.interpolate_shuttle_position(detections)
 
-        print("📊 Detections per frame:", [len(d) for d in detections])
+def _live_error(e: LiveError) -> JSONResponse:
+    return JSONResponse({"error": str(e)}, status_code=e.status_code)
 
-        # DRAW BOUNDING BOXES
-        output_frames = shuttle_tracker.draw_shuttle_bbox(frames, detections)
 
-        # Save output video
-        output_filename = f"{uuid.uuid4()}.mp4"
-        output_path = os.path.join(OUTPUT_DIR, output_filename)
-        save_video(output_frames, temp_input, output_path)
+def _server_event(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
 
-        if not os.path.exists(output_path):
-            raise RuntimeError("❌ Output video was not saved")
 
-        print("🎥 Output video saved to:", output_path)
+@app.post("/live")
+def start_live(init: LiveStart):
+    """Start analyzing a stream (rtsp://, http://...) or a file that is still being written"""
+    try:
+        live = live_manager.start(init.source, player=init.player, session=init.session)
+    except LiveError as e:
+        return _live_error(e)
+
+    return JSONResponse({
+        **live.to_dict(),
+        "status_url": f"/live/{live.id}",
+        "events_url": f"/live/{live.id}/events"
+    }, status_code=201)
+
+@app.get("/live/{live_id}")
+def get_live(live_id: str):
+    """Latest running metrics of a live session (full metrics once it is done)"""
+    live = live_manager.get(live_id)
+    if live is None:
+        return JSONResponse({"error": "Unknown live session"}, status_code=404)
+    return JSONResponse(live.to_dict())
+
+@app.get("/live/{live_id}/events")
+async def live_events(live_id: str, request: Request):
+    """
+    Server-sent events: a `metrics` event every LIVE_PUSH_INTERVAL seconds
+    while the session runs, then one `done` (or `failed`) event.
+    """
+    live = live_manager.get(live_id)
+    if live is None:
+        return JSONResponse({"error": "Unknown live session"}, status_code=404)
+
+    async def stream():
+        events = live.subscribe(asyncio.get_running_loop())
+        try:
+            event = live.event()
+            yield _server_event(event)
+            while event["type"] == "metrics":
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _server_event(event)
+        finally:
+            live.unsubscribe(events)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.delete("/live/{live_id}")
+def stop_live(live_id: str):
+    """Stop a live session; what was analyzed so far is still stored"""
+    live = live_manager.stop(live_id)
+    if live is None:
+        return JSONResponse({"error": "Unknown live session"}, status_code=404)
+    return JSONResponse(live.to_dict(), status_code=202)
 
-        # ============================================================
-        # COMPUTE METRICS (NOW INCLUDES STROKE CLASSIFICATION!)
-        # ============================================================
-        if detections and any(len(d) > 0 for d in detections):
-            metrics = analyze_footwork(detections, fps=30)
-            print("✅ Metrics computed with stroke classification!")
-            print(f"   Strokes detected: {metrics.get('stroke_counts', {})}")
-        else:
-            print("⚠️ No shuttle detected in entire video")
-            metrics = {
-                "frames_processed": len(frames),
-                "detections": 0,
-                "consistency_percent": 0,
-                "avg_shuttle_speed_km_h": 0,
-                "max_shuttle_speed_km_h": 0,
-                "min_speed_km_h": 0,
-                "speed_variance": 0,
-                "avg_rally_length_frames": 0,
-                "avg_rally_length_seconds": 0,
-                "total_rallies": 0,
-                "total_distance_meters": 0,
-                "movement_smoothness": 0,
-                # Empty stroke data
-                "stroke_counts": {
-                    "smash": 0,
-                    "clear": 0,
-                    "drop": 0,
-                    "net": 0,
-                    "drive": 0,
-                    "unknown": 0
-                },
-                "stroke_quality": {
-                    "smash": {"count": 0, "avg_speed": 0, "max_speed": 0, "avg_angle": 0},
-                    "drop": {"count": 0, "net_clearance": 0, "accuracy": 0},
-                    "clear": {"count": 0, "avg_apex": 0, "depth_percentage": 0}
-                }
-            }
-
-        # Store results for chat
-        analysis_id = output_filename.split('.')[0]
-        AnalysisStorage.save_result(
-            analysis_id=analysis_id,
-            metrics=metrics,
-            video_path=output_path
+# ============================================================
+# STORED ANALYSES
+# ============================================================
+@app.get("/analyses")
+def list_analyses(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    player: Optional[str] = None,
+    session: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    rating: Optional[str] = None,
+    min_consistency: Optional[float] = None
+):
+    """
+    Newest-first summaries of stored analyses. Pass the returned
+    next_cursor as ?cursor= to fetch the next page; since / until are ISO
+    timestamps.
+    """
+    return JSONResponse(AnalysisStorage.query(
+        limit=limit, cursor=cursor, player=player, session=session, since=since,
+        until=until, rating=rating, min_consistency=min_consistency
+    ))
+
+@app.get("/analyses/aggregate")
+def aggregate_analyses(
+    group_by: Optional[str] = None,
+    player: Optional[str] = None,
+    session: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    rating: Optional[str] = None,
+    min_consistency: Optional[float] = None
+):
+    """Counts and averages of the key metrics, optionally ?group_by=player|session|day|rating"""
+    try:
+        groups = AnalysisStorage.aggregate(
+            group_by=group_by, player=player, session=session, since=since,
+            until=until, rating=rating, min_consistency=min_consistency
         )
-        print(f"💾 Analysis results saved with ID: {analysis_id}")
-
-        # Cleanup uploaded file
-        try:
-            os.remove(temp_input)
-        except Exception:
-            pass
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return JSONResponse({"group_by": group_by, "groups": groups})
+
+@app.get("/analyses/{analysis_id}")
+def get_analysis(analysis_id: str):
+    """Full stored result of one analysis"""
+    result = AnalysisStorage.get_result(analysis_id)
+    if result is None:
+        return JSONResponse({"error": "Unknown analysis"}, status_code=404)
+    return JSONResponse(result)
+
+@app.get("/analyses/{analysis_id}/profile")
+def get_analysis_profile(analysis_id: str):
+    """CPU profile of a ?profile=true run, folded stacks (flamegraph.pl / speedscope)"""
+    try:
+        analysis_id = str(uuid.UUID(analysis_id))
+    except ValueError:
+        return JSONResponse({"error": "Unknown analysis"}, status_code=404)
+
+    path = AnalysisStorage.profile_path(analysis_id)
+    if not os.path.exists(path):
+        return JSONResponse({"error": "No profile for this analysis"}, status_code=404)
+    return FileResponse(path, media_type="text/plain", filename=f"{analysis_id}.folded")
+
+@app.post("/analyses/{analysis_id}/render")
+async def render_video(analysis_id: str):
+    """Annotated video of an analysis; rendered on first request, then cached"""
+    try:
+        analysis_id = str(uuid.UUID(analysis_id))
+    except ValueError:
+        return JSONResponse({"error": "Unknown analysis"}, status_code=404)
 
-        # Build response
-        response_data = {
-            "message": "Analysis complete",
+    if os.path.exists(output_path_for(analysis_id)):
+        return JSONResponse({
+            "message": "Render complete",
             "analysis_id": analysis_id,
-            "video_url": f"/outputs/{output_filename}",
-            "metrics": metrics
-        }
-        
-        print("✅ Sending response with stroke data:")
-        print(f"   Total strokes: {sum(metrics.get('stroke_counts', {}).values())}")
-        
-        return JSONResponse(response_data)
-
-    except Exception as e:
-        print("🔥 ANALYSIS ERROR:", str(e))
-        import traceback
-        traceback.print_exc()
-        
-        error_response = {
-            "message": f"Analysis failed: {str(e)}",
+            "video_url": f"/outputs/{analysis_id}.mp4"
+        })
+
+    _prune_render_jobs()
+    job = job_queue.get(render_jobs.get(analysis_id, ""))
+    if job is None or job.finished:
+        if not can_render(analysis_id):
+            if AnalysisStorage.get_result(analysis_id) is not None:
+                return JSONResponse({"error": "Source video expired, the analysis can no longer be rendered"},
+                                    status_code=410)
+            return JSONResponse({"error": "Unknown analysis"}, status_code=404)
+        job = job_queue.submit(task="render", analysis_id=analysis_id)
+        render_jobs[analysis_id] = job.id
+        print(f"🎬 Render queued: {job.id} for analysis {analysis_id}")
+
+    return _job_accepted(job, "Render queued")
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status and progress of a queued analysis"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Unknown job"}, status_code=404)
+    return JSONResponse(job.to_dict())
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Result of a finished analysis (202 while it is still queued/running)"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Unknown job"}, status_code=404)
+
+    if job.status == "done":
+        return JSONResponse(job.result)
+
+    if job.status == "failed":
+        return JSONResponse({
+            "message": f"Analysis failed: {job.error}",
             "video_url": None,
             "metrics": {
                 "frames_processed": 0,
@@ -232,13 +664,7 @@ async def analyze_video(file: UploadFile = File(...)):
                 "stroke_counts": {},
                 "stroke_quality": {}
             },
-            "error": str(e)
-        }
-        
-        print("❌ Sending error response:", error_response)
-        
-        return JSONResponse(error_response, status_code=500)
-    
-    finally:
-        analysis_running = False
-        print("✅ Analysis finished")
\ No newline at end of file
+            "error": job.error
+        }, status_code=500)
+
+    return JSONResponse(job.to_dict(), status_code=202)
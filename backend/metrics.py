@@ -0,0 +1,296 @@
+"""
+Prometheus-style instrumentation for the backend.
+
+Counters, gauges and histograms live in one process-wide registry and are
+rendered in the Prometheus text exposition format on GET /metrics. Updates
+are a dict lookup and an add under a lock, cheap enough for per-batch use;
+nothing is written to stdout.
+
+Per-frame debug output goes through log_sampled, which prints only every
+LOG_SAMPLE_EVERY-th call for a given key, so detail stays available under
+load without paying for it on every request.
+"""
+import bisect
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+# Print every Nth sampled log line per key (0 disables sampled logs)
+LOG_SAMPLE_EVERY = int(os.environ.get("LOG_SAMPLE_EVERY", "100"))
+
+# Seconds; from one fast batch up to a long full-match analysis
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} takes labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, per label combination"""
+    type_name = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self) -> list:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down. With `function`, the value is read when
+    the metrics are rendered (e.g. a queue's current depth).
+    """
+    type_name = "gauge"
+
+    def __init__(self, name, help_text, labels=(), function: Optional[Callable[[], float]] = None):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[Tuple, float] = {}
+        self.function = function
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]):
+        self.function = function
+
+    def render(self) -> list:
+        if self.function is not None:
+            values = [((), self.function())]
+        else:
+            with self._lock:
+                values = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram of observed values, per label combination"""
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts, sum, count]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series[2] if series else 0
+
+    def render(self) -> list:
+        with self._lock:
+            series = sorted((key, (list(counts), total, n)) for key, (counts, total, n) in self._series.items())
+        lines = self.header()
+        for key, (counts, total, n) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = _format_labels(self.label_names, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _format_labels(self.label_names, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {n}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {n}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labels=()) -> Counter:
+        return self._register(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=(), function=None) -> Gauge:
+        return self._register(Gauge(name, help_text, labels, function=function))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labels, buckets=buckets))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ============================================================
+# BACKEND METRICS
+# ============================================================
+# Stages: decode, inference, decode+inference (adaptive sampling, one thread),
+# interpolation, analytics, render, encode, storage
+STAGE_SECONDS = REGISTRY.histogram(
+    "badminton_stage_seconds", "Busy time of one analysis stage per job", labels=("stage",)
+)
+STAGE_FRAMES = REGISTRY.counter(
+    "badminton_stage_frames_total", "Frames handled by each analysis stage", labels=("stage",)
+)
+INFERENCE_BATCH_SECONDS = REGISTRY.histogram(
+    "badminton_inference_batch_seconds", "Latency of one detection model call (one frame batch)",
+    labels=("model",), buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+POOL_TASK_SECONDS = REGISTRY.histogram(
+    "badminton_pool_task_seconds", "Latency of one detection process pool task, from submit to result",
+    labels=("kind",)
+)
+FRAMES_PROCESSED = REGISTRY.counter(
+    "badminton_frames_processed_total", "Sampled video frames analyzed"
+)
+JOBS = REGISTRY.counter(
+    "badminton_jobs_total", "Finished jobs by task and outcome", labels=("task", "status")
+)
+JOB_SECONDS = REGISTRY.histogram(
+    "badminton_job_seconds", "Wall time of one job, from start to finish", labels=("task",)
+)
+QUEUE_DEPTH = REGISTRY.gauge(
+    "badminton_job_queue_depth", "Jobs waiting for an analysis worker"
+)
+JOBS_RUNNING = REGISTRY.gauge(
+    "badminton_jobs_running", "Jobs being processed right now"
+)
+
+# Pipeline stage names (badminton_model.utils.Pipeline) -> instrumented stage
+PIPELINE_STAGES = {
+    "decode": "decode",
+    "detect": "inference",
+    "decode+detect": "decode+inference",
+    "annotate": "render",
+    "encode": "encode",
+}
+
+
+def observe_stage(stage: str, seconds: float, frames: int = 0):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if frames:
+        STAGE_FRAMES.inc(frames, stage=stage)
+
+
+@contextmanager
+def timed_stage(stage: str, frames: int = 0):
+    """Record the duration of the with-block as one run of `stage`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start, frames)
+
+
+def observe_pipeline(report: dict):
+    """Record the busy time of every stage of a Pipeline.report()"""
+    for name, stats in report.items():
+        stage = PIPELINE_STAGES.get(name)
+        if stage is not None:
+            observe_stage(stage, stats["busy_sec"], stats["items"])
+
+
+_sample_counts: Dict[str, int] = {}
+_sample_lock = threading.Lock()
+
+
+def log_sampled(key: str, *args):
+    """print(*args) for the 1st and then every LOG_SAMPLE_EVERY-th call with this key"""
+    if LOG_SAMPLE_EVERY <= 0:
+        return
+    with _sample_lock:
+        n = _sample_counts.get(key, 0)
+        _sample_counts[key] = n + 1
+    if n % LOG_SAMPLE_EVERY == 0:
+        print(*args)
@@ -0,0 +1,106 @@
+"""
+Lazy model loading and warmup.
+
+Importing the API never loads YOLO weights (and never imports torch), so a
+new replica answers /healthz straight away. Each analysis worker gets a
+ModelSlot that loads its detector on first use, or earlier when warmup()
+is called (at startup with MODEL_WARMUP=1, or via POST /warmup). Loading
+ends with a blank-frame inference so the first real upload doesn't pay for
+lazy runtime initialisation. /readyz reports ready once every slot is hot.
+"""
+import threading
+import time
+from typing import Callable, List
+
+
+class ModelSlot:
+    """One detector, loaded at most once and only used by its worker"""
+
+    def __init__(self, name: str, loader: Callable):
+        self.name = name
+        self.loader = loader
+        self.model = None
+        self.state = "cold"   # cold -> loading -> ready | failed
+        self.error = None
+        self.load_sec = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def get(self):
+        """The detector, loaded and warmed first if needed (blocks meanwhile)"""
+        with self._lock:
+            if self.model is None:
+                self.state = "loading"
+                start = time.perf_counter()
+                try:
+                    model = self.loader()
+                    model.warmup()
+                except Exception as e:
+                    self.state = "failed"
+                    self.error = str(e)
+                    raise
+                self.model = model
+                self.load_sec = round(time.perf_counter() - start, 3)
+                self.state = "ready"
+                self.error = None
+                print(f"🔥 {self.name} loaded and warmed in {self.load_sec}s")
+            return self.model
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "state": self.state, "load_sec": self.load_sec, "error": self.error}
+
+
+class ModelRegistry:
+    """
+    Args:
+        loader: Factory returning a detector with a warmup() method
+        slots: Number of independent detectors (one per analysis worker);
+            1 for a detector shared by every worker, such as a DetectionPool
+    """
+
+    def __init__(self, loader: Callable, slots: int = 1):
+        self.slots: List[ModelSlot] = [ModelSlot(f"model-{i}", loader) for i in range(max(1, slots))]
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def slot(self) -> ModelSlot:
+        """Hand out slots in turn; use as JobQueue worker_init"""
+        with self._lock:
+            slot = self.slots[self._next % len(self.slots)]
+            self._next += 1
+        return slot
+
+    def warmup(self, wait: bool = False):
+        """Load every cold (or failed) slot in the background; wait=True blocks until done"""
+        threads = []
+        for slot in self.slots:
+            if slot.ready or slot.state == "loading":
+                continue
+            thread = threading.Thread(target=self._load, args=(slot,), name=f"warmup-{slot.name}",
+                                      daemon=True)
+            thread.start()
+            threads.append(thread)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    @staticmethod
+    def _load(slot: ModelSlot):
+        try:
+            slot.get()
+        except Exception as e:
+            print(f"❌ Loading {slot.name} failed: {e}")
+
+    @property
+    def ready(self) -> bool:
+        return all(slot.ready for slot in self.slots)
+
+    def loaded(self) -> list:
+        """Detectors loaded so far (for shutdown)"""
+        return [slot.model for slot in self.slots if slot.model is not None]
+
+    def status(self) -> dict:
+        return {"ready": self.ready, "slots": [slot.to_dict() for slot in self.slots]}
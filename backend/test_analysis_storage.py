@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pytest
+
+import analysis_storage
+from analysis_storage import AnalysisStorage
+
+
+def _reopen():
+    """Forget the process-wide connection state, as a restart would"""
+    analysis_storage._initialized = False
+    analysis_storage._local = threading.local()
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(analysis_storage, "RESULTS_DIR", str(tmp_path))
+    monkeypatch.setattr(analysis_storage, "DB_PATH", str(tmp_path / "analyses.db"))
+    monkeypatch.setattr(analysis_storage, "_initialized", False)
+    monkeypatch.setattr(analysis_storage, "_local", threading.local())
+    return AnalysisStorage
+
+
+def _metrics(consistency=80.0):
+    return {"frames_processed": 100, "detections": 80, "consistency_percent": consistency,
+            "avg_shuttle_speed_km_h": 60.0, "max_shuttle_speed_km_h": 250.0, "total_rallies": 2,
+            "total_distance_meters": 40.0, "stroke_counts": {"smash": 1, "clear": 2}}
+
+
+def _write_json(directory, analysis_id, timestamp, player=None):
+    result = {"id": analysis_id, "timestamp": timestamp, "video_path": None, "player": player,
+              "session": None, "metrics": _metrics(), "insights": {"overall_rating": "beginner"}}
+    with open(os.path.join(directory, f"{analysis_id}.json"), "w") as f:
+        json.dump(result, f)
+    return result
+
+
+def test_migrates_json_files_once(storage, tmp_path):
+    _write_json(tmp_path, "a", "2024-01-01T10:00:00")
+    _write_json(tmp_path, "b", "2024-01-02T10:00:00", player="amy")
+    _write_json(tmp_path, "c", "2024-01-03T10:00:00")
+    (tmp_path / "broken.json").write_text("{not json")
+    (tmp_path / "latest.json").write_text(json.dumps({"id": "b"}))
+
+    assert sorted(item["id"] for item in storage.query()["items"]) == ["a", "b", "c"]
+    assert storage.get_latest()["id"] == "b"
+    assert storage.get_result("b")["player"] == "amy"
+    assert storage.query(player="amy")["items"][0]["total_strokes"] == 3
+
+    # Files showing up after the import are not picked up again
+    _write_json(tmp_path, "d", "2024-01-04T10:00:00")
+    _reopen()
+    assert storage.get_result("d") is None
+
+
+def test_migration_without_latest_file_uses_newest(storage, tmp_path):
+    _write_json(tmp_path, "old", "2024-01-01T10:00:00")
+    _write_json(tmp_path, "new", "2024-02-01T10:00:00")
+    assert storage.get_latest()["id"] == "new"
+
+
+def _walk(storage, limit, **filters):
+    ids, cursor = [], None
+    while True:
+        page = storage.query(limit=limit, cursor=cursor, **filters)
+        ids += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+def test_keyset_pagination_visits_every_row_once(storage, tmp_path):
+    # Equal timestamps are ordered by id
+    for i in range(7):
+        _write_json(tmp_path, f"id{i}", "2024-01-01T10:00:00" if i % 2 else f"2024-01-0{i + 1}T12:00:00")
+
+    ids = _walk(storage, limit=3)
+    rows = sorted(((item["created_at"], item["id"]) for item in storage.query(limit=100)["items"]), reverse=True)
+    assert ids == [analysis_id for _, analysis_id in rows]
+    assert len(set(ids)) == 7
+
+
+def test_pagination_is_stable_under_inserts(storage, tmp_path):
+    for i in range(6):
+        _write_json(tmp_path, f"id{i}", f"2024-01-0{i + 1}T10:00:00")
+
+    first = storage.query(limit=2)
+    storage.save_result("fresh", _metrics(), None)
+    rest, cursor = [], first["next_cursor"]
+    while cursor:
+        page = storage.query(limit=2, cursor=cursor)
+        rest += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+
+    assert [item["id"] for item in first["items"]] + rest == [f"id{i}" for i in range(5, -1, -1)]
+
+
+def test_filters_and_aggregates(storage):
+    for i in range(3):
+        storage.save_result(f"amy{i}", _metrics(consistency=90.0), None, player="amy")
+    storage.save_result("bob0", _metrics(consistency=50.0), None, player="bob")
+
+    assert len(_walk(storage, limit=2, player="amy")) == 3
+    assert [item["id"] for item in storage.query(min_consistency=60)["items"]] == ["amy2", "amy1", "amy0"]
+
+    groups = {group["player"]: group for group in storage.aggregate(group_by="player")}
+    assert groups["amy"]["analyses"] == 3 and groups["bob"]["analyses"] == 1
+    assert groups["amy"]["total_strokes"] == 9
+    with pytest.raises(ValueError):
+        storage.aggregate(group_by="video_path")
+
+
+def _in_threads(target, count):
+    errors = []
+
+    def run(i):
+        try:
+            target(i)
+        except Exception as e:  # surfaced below, threads swallow exceptions
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_concurrent_saves_are_all_stored(storage):
+    def save(worker):
+        for i in range(10):
+            storage.save_result(f"w{worker}-{i}", _metrics(), None, player=f"p{worker}")
+
+    _in_threads(save, 8)
+
+    assert len(_walk(storage, limit=500)) == 80
+    latest = storage.get_latest()
+    assert latest is not None and storage.get_result(latest["id"]) == latest
+
+
+def test_concurrent_updates_lose_nothing(storage):
+    storage.save_result("shared", _metrics(), None)
+    _in_threads(lambda i: storage.update_result("shared", **{f"note{i}": i}), 8)
+
+    result = storage.get_result("shared")
+    assert all(result[f"note{i}"] == i for i in range(8))
+    assert storage.update_result("missing", note=1) is None
+
+
+def test_latest_is_scoped_by_player_and_session(storage):
+    storage.save_result("amy-1", _metrics(), None, player="amy", session="mon")
+    storage.save_result("bob-1", _metrics(), None, player="bob", session="mon")
+    storage.save_result("amy-2", _metrics(), None, player="amy", session="tue")
+
+    assert storage.get_latest()["id"] == "amy-2"
+    assert storage.get_latest(player="bob")["id"] == "bob-1"
+    assert storage.get_latest(session="mon")["id"] == "bob-1"
+    assert storage.get_latest(player="amy", session="mon")["id"] == "amy-1"
+    assert storage.get_latest(player="carol") is None
+
+
+def test_trajectory_files_are_replaced_atomically(storage, tmp_path):
+    first = np.arange(6, dtype=np.float32)
+    storage.save_trajectory("t", first)
+    storage.save_trajectory("t", first * 2)
+
+    assert np.array_equal(storage.load_trajectory("t"), first * 2)
+    assert not list(tmp_path.glob("*.tmp"))
+    assert storage.load_trajectory("missing") is None
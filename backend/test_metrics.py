@@ -0,0 +1,82 @@
+import pytest
+
+import metrics
+from metrics import Registry, STAGE_SECONDS, STAGE_FRAMES, observe_pipeline
+
+
+def test_counter_text_format():
+    registry = Registry()
+    jobs = registry.counter("test_jobs_total", "Finished jobs", labels=("task", "status"))
+    jobs.inc(task="analyze", status="done")
+    jobs.inc(2, task="analyze", status="failed")
+    jobs.inc(0.5, task="render", status="done")
+
+    assert registry.render() == (
+        "# HELP test_jobs_total Finished jobs\n"
+        "# TYPE test_jobs_total counter\n"
+        'test_jobs_total{task="analyze",status="done"} 1\n'
+        'test_jobs_total{task="analyze",status="failed"} 2\n'
+        'test_jobs_total{task="render",status="done"} 0.5\n'
+    )
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    counter = registry.counter("test_escaped_total", "Escaping", labels=("path",))
+    counter.inc(path='C:\\clips\n"final"')
+    assert registry.render().splitlines()[-1] == 'test_escaped_total{path="C:\\\\clips\\n\\"final\\""} 1'
+
+
+def test_gauge_reads_its_function_at_render_time():
+    registry = Registry()
+    depth = [3]
+    registry.gauge("test_queue_depth", "Waiting jobs", function=lambda: depth[0])
+    assert registry.render().splitlines()[-1] == "test_queue_depth 3"
+    depth[0] = 0
+    assert registry.render().splitlines()[-1] == "test_queue_depth 0"
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram("test_latency_seconds", "Latency", labels=("model",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        latency.observe(value, model="shuttle")
+
+    assert registry.render().splitlines()[2:] == [
+        'test_latency_seconds_bucket{model="shuttle",le="0.1"} 2',
+        'test_latency_seconds_bucket{model="shuttle",le="1"} 3',
+        'test_latency_seconds_bucket{model="shuttle",le="+Inf"} 4',
+        'test_latency_seconds_sum{model="shuttle"} 2.65',
+        'test_latency_seconds_count{model="shuttle"} 4',
+    ]
+    assert latency.count(model="shuttle") == 4
+
+
+def test_labels_must_match_the_declaration():
+    registry = Registry()
+    counter = registry.counter("test_labelled_total", "Labelled", labels=("stage",))
+    with pytest.raises(ValueError):
+        counter.inc()
+    with pytest.raises(ValueError):
+        counter.inc(stage="decode", model="shuttle")
+    with pytest.raises(ValueError):
+        registry.counter("test_labelled_total", "Registered twice")
+
+
+def test_pipeline_stages_are_booked_under_their_own_label():
+    before = {stage: STAGE_SECONDS.count(stage=stage) for stage in ("inference", "decode+inference", "decode")}
+    frames_before = STAGE_FRAMES.value(stage="decode+inference")
+    stats = {"items": 10, "busy_sec": 0.5}
+    observe_pipeline({"decode+detect": stats, "annotate": stats, "discard": stats})
+
+    assert STAGE_SECONDS.count(stage="decode+inference") == before["decode+inference"] + 1
+    assert STAGE_SECONDS.count(stage="inference") == before["inference"]
+    assert STAGE_SECONDS.count(stage="decode") == before["decode"]
+    assert STAGE_FRAMES.value(stage="decode+inference") == frames_before + 10
+
+
+def test_log_sampled_prints_every_nth_call(capsys, monkeypatch):
+    monkeypatch.setattr(metrics, "LOG_SAMPLE_EVERY", 3)
+    for i in range(7):
+        metrics.log_sampled("test_log_sampled", "call", i)
+    assert capsys.readouterr().out.split() == ["call", "0", "call", "3", "call", "6"]
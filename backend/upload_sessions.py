@@ -0,0 +1,253 @@
+"""
+Resumable chunked uploads.
+
+A client opens an upload session, PUTs the file in chunks at explicit byte
+offsets and finalizes it. Every chunk is streamed to a `.part` file as it
+arrives, so memory stays bounded by the request read size no matter how
+large the match recording is. The next expected offset is simply the size
+of the `.part` file, so after a dropped connection (or a server restart)
+the client asks for the session status and resumes from there instead of
+starting over.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadError(Exception):
+    """Invalid upload request; `status_code` is the HTTP status to answer with"""
+
+    def __init__(self, message: str, status_code: int = 400, **details):
+        super().__init__(message)
+        self.status_code = status_code
+        self.details = details
+
+
+class UploadSession:
+    """Metadata of one upload; the data itself lives in `part_path`"""
+
+    def __init__(self, upload_id: str, upload_dir: str, size: Optional[int] = None,
+                 sha256: Optional[str] = None, filename: Optional[str] = None,
+                 options: Optional[dict] = None, created_at: Optional[float] = None):
+        self.id = upload_id
+        self.size = size
+        self.sha256 = sha256.lower() if sha256 else None
+        self.filename = filename
+        self.options = options or {}
+        self.created_at = created_at or time.time()
+        self.part_path = os.path.join(upload_dir, f"{upload_id}.part")
+        self.meta_path = os.path.join(upload_dir, f"{upload_id}.upload.json")
+        self.lock = asyncio.Lock()
+        # Running hash of the bytes received so far; lost on restart, in
+        # which case the next chunk (or finalize) re-reads the file once
+        self._hasher = hashlib.sha256()
+        self._hashed = 0
+
+    @property
+    def received(self) -> int:
+        try:
+            return os.path.getsize(self.part_path)
+        except FileNotFoundError:
+            return 0
+
+    def to_dict(self) -> dict:
+        received = self.received
+        return {
+            "upload_id": self.id,
+            "filename": self.filename,
+            "size": self.size,
+            "received": received,
+            "complete": self.size is not None and received == self.size,
+            "created_at": self.created_at,
+        }
+
+    def save_meta(self):
+        meta = {
+            "id": self.id,
+            "size": self.size,
+            "sha256": self.sha256,
+            "filename": self.filename,
+            "options": self.options,
+            "created_at": self.created_at,
+        }
+        with open(self.meta_path, "w") as f:
+            json.dump(meta, f)
+
+    def digest(self) -> str:
+        """sha256 of the received bytes"""
+        self._catch_up_hash(self.received)
+        return self._hasher.hexdigest()
+
+    def _catch_up_hash(self, received: int):
+        """Rebuild the running hash from the `.part` file if it fell behind"""
+        if self._hashed == received:
+            return
+        hasher = hashlib.sha256()
+        hashed = 0
+        with open(self.part_path, "rb") as f:
+            while hashed < received and (chunk := f.read(min(HASH_CHUNK_SIZE, received - hashed))):
+                hasher.update(chunk)
+                hashed += len(chunk)
+        self._hasher, self._hashed = hasher, hashed
+
+    def _append(self, f, data: bytes):
+        """Write `data` at the current end of `f` and extend the running hash"""
+        f.write(data)
+        self._hasher.update(data)
+        self._hashed += len(data)
+
+
+class UploadManager:
+    """
+    Args:
+        upload_dir: Directory for `.part` files and session metadata
+        max_size: Largest accepted upload in bytes
+        ttl: Seconds after which an unfinished session is discarded
+    """
+
+    def __init__(self, upload_dir: str, max_size: int = 8 * 1024 ** 3, ttl: int = 24 * 3600):
+        self.upload_dir = upload_dir
+        self.max_size = max_size
+        self.ttl = ttl
+        self._sessions = {}
+        os.makedirs(upload_dir, exist_ok=True)
+        self._load_sessions()
+
+    def _load_sessions(self):
+        """Pick up sessions left by a previous run so their clients can resume"""
+        for name in os.listdir(self.upload_dir):
+            if not name.endswith(".upload.json"):
+                continue
+            try:
+                with open(os.path.join(self.upload_dir, name)) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            session = UploadSession(
+                meta["id"], self.upload_dir, size=meta.get("size"), sha256=meta.get("sha256"),
+                filename=meta.get("filename"), options=meta.get("options"),
+                created_at=meta.get("created_at")
+            )
+            session._hashed = -1  # running hash is gone, rebuilt from the file on next use
+            self._sessions[session.id] = session
+
+    def create(self, size: Optional[int] = None, sha256: Optional[str] = None,
+               filename: Optional[str] = None, **options) -> UploadSession:
+        """Open a new upload session; `options` are handed back on finalize"""
+        self.prune()
+        if size is not None and (size <= 0 or size > self.max_size):
+            raise UploadError(f"Upload size must be between 1 and {self.max_size} bytes", 413)
+
+        session = UploadSession(str(uuid.uuid4()), self.upload_dir, size=size, sha256=sha256,
+                                filename=filename, options=options)
+        open(session.part_path, "wb").close()
+        session.save_meta()
+        self._sessions[session.id] = session
+        return session
+
+    def get(self, upload_id: str) -> UploadSession:
+        session = self._sessions.get(upload_id)
+        if session is None:
+            raise UploadError("Unknown upload", 404)
+        return session
+
+    async def write_chunk(self, upload_id: str, offset: int, chunks) -> int:
+        """
+        Append one chunk read from the async iterator `chunks` (e.g.
+        request.stream()) at byte `offset`.
+
+        The offset must equal the number of bytes received so far; anything
+        else is answered with 409 and the offset to resume from.
+
+        Returns:
+            int: New received offset
+        """
+        session = self.get(upload_id)
+        async with session.lock:
+            received = session.received
+            if offset != received:
+                raise UploadError("Offset does not match received bytes", 409, offset=received)
+
+            limit = session.size if session.size is not None else self.max_size
+            written = received
+            # File I/O and hashing run in the threadpool so a large chunk
+            # never blocks the event loop
+            await run_in_threadpool(session._catch_up_hash, received)
+            f = await run_in_threadpool(open, session.part_path, "r+b")
+            # Bytes written before a dropped connection are kept; the client
+            # resumes from the offset reported by the session status
+            try:
+                f.seek(received)
+                async for data in chunks:
+                    if not data:
+                        continue
+                    if written + len(data) > limit:
+                        raise UploadError("Chunk goes past the declared upload size", 413,
+                                          offset=written)
+                    await run_in_threadpool(session._append, f, data)
+                    written += len(data)
+            finally:
+                await run_in_threadpool(f.close)
+            return written
+
+    async def finalize(self, upload_id: str, dest_path: str) -> UploadSession:
+        """
+        Check size and checksum, then move the data to `dest_path` and
+        close the session.
+        """
+        session = self.get(upload_id)
+        if session.lock.locked():
+            raise UploadError("A chunk is still being written", 409, offset=session.received)
+
+        async with session.lock:
+            await run_in_threadpool(self._finalize, session, dest_path)
+        return session
+
+    def _finalize(self, session: UploadSession, dest_path: str):
+        received = session.received
+        if session.size is not None and received != session.size:
+            raise UploadError("Upload is incomplete", 409, offset=received)
+        if received == 0:
+            raise UploadError("Upload is empty", 400)
+
+        if session.sha256 is not None:
+            digest = session.digest()
+            if digest != session.sha256:
+                self.discard(session.id)
+                raise UploadError("Checksum mismatch, upload discarded", 422, sha256=digest)
+
+        os.replace(session.part_path, dest_path)
+        self._remove_meta(session)
+        self._sessions.pop(session.id, None)
+
+    def discard(self, upload_id: str):
+        session = self._sessions.pop(upload_id, None)
+        if session is None:
+            return
+        for path in (session.part_path, session.meta_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def prune(self):
+        """Discard sessions older than the TTL"""
+        cutoff = time.time() - self.ttl
+        for upload_id, session in list(self._sessions.items()):
+            if session.created_at < cutoff and not session.lock.locked():
+                self.discard(upload_id)
+
+    @staticmethod
+    def _remove_meta(session):
+        try:
+            os.remove(session.meta_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,61 @@
+"""
+Shuttle detection parity and throughput of the inference backends.
+
+    python -m badminton_model.compare_backends test_video.mp4 --int8
+
+Every backend detects the same first --max-frames frames of the video and
+is checked against torch (presence agreement, detection count, box IoU and
+confidence). Exits with status 1 if a backend is outside the tolerances,
+so it can gate CI.
+"""
+import argparse
+import os
+import sys
+
+from .utils import read_video
+from .tracker.inference_backend import (BACKENDS, PARITY_MAX_CONF_DIFF, PARITY_MAX_COUNT_DIFF,
+                                        PARITY_MIN_AGREEMENT, PARITY_MIN_IOU, check_parity,
+                                        compare_backends)
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "train", "shuttle_output", "models", "weights", "best.pt")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare shuttle detection across inference backends")
+    parser.add_argument("video_path")
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--int8", action="store_true", help="use INT8 exports for onnx / openvino")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-frames", type=int, default=300)
+    parser.add_argument("--min-agreement", type=float, default=PARITY_MIN_AGREEMENT,
+                        help="share of frames where shuttle presence must match torch")
+    parser.add_argument("--max-count-diff", type=float, default=PARITY_MAX_COUNT_DIFF,
+                        help="largest relative difference in detections")
+    parser.add_argument("--min-iou", type=float, default=PARITY_MIN_IOU,
+                        help="smallest mean box IoU against torch")
+    parser.add_argument("--max-conf-diff", type=float, default=PARITY_MAX_CONF_DIFF,
+                        help="largest confidence difference against torch")
+    args = parser.parse_args()
+
+    frames = read_video(args.video_path, max_frames=args.max_frames)
+    report = compare_backends(args.model_path, frames, backends=args.backends, int8=args.int8,
+                              batch_size=args.batch_size)
+
+    reference_fps = report["torch"]["fps"]
+    for backend, row in report.items():
+        speedup = row["fps"] / reference_fps if reference_fps else 0
+        print(f"{backend:>9}: {row['fps']:.1f} frames/sec ({speedup:.2f}x), {row}")
+
+    failures = check_parity(report, min_agreement=args.min_agreement, max_count_diff=args.max_count_diff,
+                            min_iou=args.min_iou, max_conf_diff=args.max_conf_diff)
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"✅ {len(report) - 1} backend(s) match torch within tolerance")
+
+
+if __name__ == '__main__':
+    main()
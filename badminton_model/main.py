@@ -1,23 +1,44 @@
+import argparse
+
 import cv2
-from utils import read_video, save_video
-from tracker import PlayerTracker, ShuttleTracker
+from utils import read_video, save_video, SamplingProfiler
+from tracker import PlayerTracker, ShuttleTracker, CombinedDetector, DetectionCache
 
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profile", nargs="?", const="profile.folded", metavar="PATH",
+                        help="sample CPU stacks of this run into PATH (folded, for flamegraphs)")
+    args = parser.parse_args()
+
+    profiler = SamplingProfiler().start() if args.profile else None
+    try:
+        run()
+    finally:
+        if profiler is not None:
+            profiler.stop().save(args.profile)
+            print(f"Profile: {profiler.samples} samples written to {args.profile}")
+
+
+def run():
     ### input video ###
     input_video_path = 'test_video.mp4'
     # read video
     frames = read_video(input_video_path)
 
-    # player detection
+    # detections are reused across runs as long as video, weights and settings match
+    cache = DetectionCache("last_detect")
 
+    # player + shuttle detection, both models on each batch in a single pass
     player_tracker = PlayerTracker(model_path="train/player_output/models/weights/best.pt")
-    player_detect = player_tracker.detect_player(frames, last_detect=True,
-                                                    path_of_last_detect="last_detect/list_player_dict.pkl")
-
-    # shuttle detection
     shuttle_tracker = ShuttleTracker(model_path="train/shuttle_output/models/weights/best.pt", )
-    shuttle_detect = shuttle_tracker.detect_shuttle(frames, last_detect=True, path_of_last_detect="last_detect/list_shuttle_dict.pkl")
+    detector = CombinedDetector(shuttle_tracker, player_tracker)
+    shuttle_detect, player_detect = detector.detect_all(
+        frames, cache=cache,
+        shuttle_key=shuttle_tracker.cache_key(cache, input_video_path, stride=3, max_frames=300),
+        player_key=player_tracker.cache_key(cache, input_video_path, stride=3, max_frames=300)
+    )
+    detector.close()
     shuttle_interpolate = shuttle_tracker.interpolate_shuttle_position(shuttle_detect)
 
     ### draw ###
@@ -1,2 +1,7 @@
 from .player_tracker import PlayerTracker
-from .shuttle_tracker import ShuttleTracker
\ No newline at end of file
+from .shuttle_tracker import ShuttleTracker
+from .process_pool import DetectionPool
+from .detection_cache import DetectionCache
+from .adaptive_sampler import AdaptiveSampler
+from .roi_search import RoiSearch
+from .combined_detector import CombinedDetector
@@ -0,0 +1,139 @@
+"""
+Motion-driven frame sampling.
+
+A fixed stride spends as much inference on dead time between rallies as on
+the rallies themselves, and is too coarse around fast hits. The sampler
+looks at the shuttle positions detected so far and picks the stride to the
+next sampled frame:
+
+- sparse while no shuttle is seen or it sits still,
+- the base stride during normal play,
+- every frame for a while after a fast shot or a sharp change of direction
+  (a hit), so stroke classification gets dense positions around it.
+"""
+import math
+
+import numpy as np
+
+
+class AdaptiveSampler:
+    """
+    Args:
+        base_stride: Stride during normal play
+        sparse_stride: Stride while the shuttle is missing or stationary
+        dense_stride: Stride around fast shots and hits
+        still_speed: Below this speed (pixels/frame) the shuttle counts as stationary
+        fast_speed: At or above this speed (pixels/frame) sampling turns dense
+        turn_angle: Change of direction (degrees) between two steps treated as a hit
+        dense_frames: How many source frames sampling stays dense after a trigger
+        idle_samples: Consecutive misses / stationary samples before going sparse
+    """
+
+    def __init__(self, base_stride=3, sparse_stride=12, dense_stride=1, still_speed=1.0,
+                 fast_speed=12.0, turn_angle=60.0, dense_frames=9, idle_samples=2):
+        self.base_stride = base_stride
+        self.sparse_stride = sparse_stride
+        self.dense_stride = dense_stride
+        self.still_speed = still_speed
+        self.fast_speed = fast_speed
+        self.turn_angle = turn_angle
+        self.dense_frames = dense_frames
+        self.idle_samples = idle_samples
+        self.reset()
+
+    def reset(self):
+        self._last_frame = None
+        self._last_center = None
+        self._last_velocity = None
+        self._idle = 0
+        self._dense_until = -1
+        self.stride = self.base_stride
+
+    def params(self):
+        """Settings that change which frames are sampled (for cache keys)"""
+        return {
+            "base_stride": self.base_stride,
+            "sparse_stride": self.sparse_stride,
+            "dense_stride": self.dense_stride,
+            "still_speed": self.still_speed,
+            "fast_speed": self.fast_speed,
+            "turn_angle": self.turn_angle,
+            "dense_frames": self.dense_frames,
+            "idle_samples": self.idle_samples,
+        }
+
+    @property
+    def dense_until(self):
+        """First source frame after the current dense window"""
+        return self._dense_until
+
+    def extend_dense(self, frame_idx):
+        """
+        Restart the dense window at `frame_idx`.
+
+        A batched caller only sees a trigger after its whole batch has been
+        read, so the window is restarted at the last frame read instead of
+        expiring inside a batch that was sampled at the old stride.
+        """
+        self._dense_until = frame_idx + self.dense_frames
+        self.stride = self.dense_stride
+
+    def batch_limit(self, frame_idx, batch_size):
+        """
+        How many samples the next batch (starting at `frame_idx`) may hold:
+        a dense batch stops at the end of the dense window, so the stride is
+        picked again as soon as the window is over.
+        """
+        if self.stride != self.dense_stride or self.dense_stride == self.base_stride:
+            return batch_size
+        left = -(-(self._dense_until - frame_idx) // self.dense_stride)
+        return max(1, min(batch_size, left))
+
+    def update(self, frame_idx, box):
+        """
+        Record the detection for sampled frame `frame_idx` (NaN box = miss).
+
+        Returns:
+            int: Stride to the next frame that should be sampled
+        """
+        box = np.asarray(box, dtype=np.float64)
+        if np.isnan(box).any():
+            self._idle += 1
+            self._last_velocity = None
+        else:
+            center = ((box[0] + box[2]) / 2, (box[1] + box[3]) / 2)
+            velocity = None
+            if self._last_center is not None and frame_idx > self._last_frame:
+                dt = frame_idx - self._last_frame
+                velocity = ((center[0] - self._last_center[0]) / dt,
+                            (center[1] - self._last_center[1]) / dt)
+
+            if velocity is None:
+                self._idle = 0
+            else:
+                speed = math.hypot(*velocity)
+                self._idle = self._idle + 1 if speed < self.still_speed else 0
+                if speed >= self.fast_speed or self._is_turn(self._last_velocity, velocity):
+                    self._dense_until = frame_idx + self.dense_frames
+
+            self._last_center = center
+            self._last_velocity = velocity
+
+        self._last_frame = frame_idx
+
+        if frame_idx < self._dense_until:
+            self.stride = self.dense_stride
+        elif self._idle >= self.idle_samples:
+            self.stride = self.sparse_stride
+        else:
+            self.stride = self.base_stride
+        return self.stride
+
+    def _is_turn(self, before, after):
+        if before is None or after is None:
+            return False
+        norm = math.hypot(*before) * math.hypot(*after)
+        if norm < self.still_speed ** 2:
+            return False
+        cos = (before[0] * after[0] + before[1] * after[1]) / norm
+        return math.degrees(math.acos(max(-1.0, min(1.0, cos)))) >= self.turn_angle
@@ -0,0 +1,191 @@
+"""
+Single-pass player + shuttle detection.
+
+Running PlayerTracker and ShuttleTracker as two separate passes decodes (or
+holds) every frame twice and leaves one model idle while the other works.
+CombinedDetector hands each frame batch to both models at once: players are
+tracked on a helper thread while the shuttle model runs on the calling
+thread (inference releases the GIL), and the results come back merged per
+frame.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count, islice
+
+import numpy as np
+
+from ..utils import iter_batches, iter_video, carry_profiler, FRAME_SIZE
+from ..utils.trajectory import Trajectory
+from .shuttle_tracker import _first_frame
+
+
+class CombinedDetector:
+    def __init__(self, shuttle_tracker, player_tracker=None, batch_size=None):
+        """
+        Args:
+            shuttle_tracker: ShuttleTracker
+            player_tracker: Optional PlayerTracker; without it only the
+                shuttle is detected and `players` stays empty
+            batch_size: Frames per batch for both models (defaults to the
+                shuttle tracker's)
+        """
+        self.shuttle = shuttle_tracker
+        self.player = player_tracker
+        self.batch_size = batch_size or shuttle_tracker.batch_size
+        self.last_fps = None
+        # One thread, so player batches are tracked strictly in order
+        self._executor = None
+        if player_tracker is not None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="player-detect")
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def reset(self):
+        """Start a new video: fresh player track ids"""
+        if self.player is not None:
+            self.player.reset()
+
+    def warmup(self, size=FRAME_SIZE):
+        """Warm both models on blank frames, concurrently like a real batch"""
+        width, height = size
+        self.detect_batch([np.zeros((height, width, 3), dtype=np.uint8)] * self.batch_size)
+        self.reset()
+
+    def detect_batch(self, frames, roi=None, frame_indices=None, players=True, shuttle=True):
+        """
+        Detect one batch with both models running concurrently.
+
+        Args:
+            roi: Optional RoiSearch passed on to the shuttle tracker
+            frame_indices: Source frame numbers of `frames` (for the ROI)
+            players: Track players as well (ignored without a player model)
+            shuttle: Detect the shuttle as well; False only tracks players
+
+        Returns:
+            (boxes, conf, players): shuttle arrays as ShuttleTracker.detect_batch
+            returns them (NaN when not detected) and one {track_id: box} dict
+            per frame ({} when players are not tracked)
+        """
+        future = None
+        if players and self.player is not None:
+            future = self._executor.submit(carry_profiler(self.player.detect_frames), frames)
+
+        try:
+            if shuttle:
+                boxes, conf = self.shuttle.detect_batch(frames, roi=roi, frame_indices=frame_indices)
+            else:
+                boxes, conf = np.full((len(frames), 4), np.nan), np.full(len(frames), np.nan)
+        finally:
+            # Never leave the player model running into the next batch
+            player_detections = future.result() if future is not None else [{} for _ in frames]
+
+        return boxes, conf, player_detections
+
+    def detect(self, frames, batch_size=None, frame_indices=None, roi=None, players=True):
+        """
+        Stream merged per-frame records; frames are consumed one batch at a time.
+
+        Yields:
+            dict: {"frame": source frame number, "shuttle": (4,) box or NaN,
+            "shuttle_conf": float, "players": {track_id: [x1, y1, x2, y2]}}
+        """
+        batch_size = batch_size or self.batch_size
+        numbers = iter(frame_indices) if frame_indices is not None else count()
+        self.reset()
+        if roi is not None:
+            roi.reset()
+
+        for batch in iter_batches(frames, batch_size):
+            indices = list(islice(numbers, len(batch)))
+            boxes, conf, player_detections = self.detect_batch(
+                batch, roi=roi, frame_indices=indices, players=players
+            )
+            for frame_idx, box, score, player_det in zip(indices, boxes, conf, player_detections):
+                yield {"frame": frame_idx, "shuttle": box, "shuttle_conf": float(score), "players": player_det}
+
+    def detect_all(self, frames, cache=None, shuttle_key=None, player_key=None, frame_indices=None,
+                   batch_size=None, roi=None):
+        """
+        Detect every frame with both models in one pass.
+        With a DetectionCache each model's result is cached under its own
+        key; a model whose result is cached is skipped.
+
+        Returns:
+            (Trajectory, list): shuttle detections and per-frame player dicts
+            (None without a player model)
+        """
+        shuttle_detections = cache.get(shuttle_key) if cache is not None and shuttle_key else None
+        player_detections = None
+        if self.player is not None and cache is not None and player_key:
+            player_detections = cache.get(player_key)
+
+        need_shuttle = shuttle_detections is None
+        need_players = self.player is not None and player_detections is None
+        if not need_shuttle and not need_players:
+            return shuttle_detections, player_detections
+
+        batch_size = batch_size or self.batch_size
+        numbers = iter(frame_indices) if frame_indices is not None else count()
+        self.reset()
+        if roi is not None and need_shuttle:
+            roi.reset()
+
+        indices, boxes, conf, players = [], [], [], []
+        start = time.perf_counter()
+        for batch in iter_batches(frames, batch_size):
+            batch_indices = list(islice(numbers, len(batch)))
+            batch_boxes, batch_conf, batch_players = self.detect_batch(
+                batch, roi=roi, frame_indices=batch_indices, players=need_players, shuttle=need_shuttle
+            )
+            indices.extend(batch_indices)
+            boxes.append(batch_boxes)
+            conf.append(batch_conf)
+            players.extend(batch_players)
+        elapsed = time.perf_counter() - start
+
+        self.last_fps = len(indices) / elapsed if elapsed > 0 else None
+        if self.last_fps:
+            print(f"Combined detection: {len(indices)} frames, "
+                  f"batch={batch_size}, {self.last_fps:.1f} frames/sec")
+
+        if need_shuttle:
+            shuttle_detections = Trajectory.from_boxes(
+                np.concatenate(boxes) if boxes else np.empty((0, 4)),
+                conf=np.concatenate(conf) if conf else None,
+                frames=np.array(indices, dtype=np.int64) if frame_indices is not None else None
+            )
+            if cache is not None and shuttle_key:
+                cache.put(shuttle_key, shuttle_detections)
+        if need_players:
+            player_detections = players
+            if cache is not None and player_key:
+                cache.put(player_key, player_detections)
+
+        return shuttle_detections, player_detections
+
+    def detect_video(self, video_path, cache=None, roi=None, **read_kwargs):
+        """
+        Decode `video_path` once and detect players and shuttle in one pass.
+
+        Args:
+            video_path: Source video
+            cache: Optional DetectionCache (keys as ShuttleTracker.cache_key /
+                PlayerTracker.cache_key, so results are shared with them)
+            roi: Optional RoiSearch for the shuttle model
+            **read_kwargs: Passed to iter_video (stride, max_frames, start/end, size)
+
+        Returns:
+            (Trajectory, list): as detect_all
+        """
+        shuttle_key = player_key = None
+        if cache is not None:
+            shuttle_key = self.shuttle.cache_key(cache, video_path, roi=roi, **read_kwargs)
+            if self.player is not None:
+                player_key = self.player.cache_key(cache, video_path, **read_kwargs)
+
+        frame_indices = count(_first_frame(video_path, read_kwargs), read_kwargs.get("stride", 1))
+        return self.detect_all(iter_video(video_path, **read_kwargs), cache=cache,
+                               shuttle_key=shuttle_key, player_key=player_key,
+                               frame_indices=frame_indices, roi=roi)
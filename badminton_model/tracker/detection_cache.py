@@ -0,0 +1,196 @@
+"""
+Content-addressed cache of per-frame detections.
+
+Entries are keyed by a hash of the video bytes, the model weights and every
+parameter that changes the detections (stride, resize, time window,
+confidence threshold...), so a re-upload of the same match or a re-run after
+an analytics-only change skips YOLO entirely. Entries are plain .npz arrays
+loaded with allow_pickle=False, and the directory is kept under `max_bytes`
+by evicting the least recently used entries.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from ..utils.trajectory import Trajectory
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Files whose digest is remembered (least recently used are forgotten)
+DIGEST_MEMO_SIZE = 256
+
+# Part of every key; bump when the frames sampled for the same arguments
+# change, so entries of the old scheme are never served (2: last frame of
+# every stride group, as the original reader; 3: adaptive dense windows
+# restart after the batch that triggered them)
+KEY_VERSION = 3
+
+# iter_video defaults, so omitted and explicit default arguments share a key
+_READ_DEFAULTS = {
+    "stride": 1,
+    "max_frames": None,
+    "start_sec": None,
+    "end_sec": None,
+    "start_frame": None,
+    "end_frame": None,
+    "size": [640, 360],
+}
+
+
+def read_params(**read_kwargs):
+    """Normalised iter_video arguments for use in a cache key"""
+    params = dict(_READ_DEFAULTS)
+    params.update(read_kwargs)
+    if params["size"] is not None:
+        params["size"] = list(params["size"])
+    return params
+
+
+class DetectionCache:
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        """
+        Args:
+            cache_dir: Directory holding the cache entries
+            max_bytes: Size budget for the directory; least recently used
+                entries are removed once it is exceeded
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._digests = OrderedDict()   # (path, size, mtime) -> digest, LRU order
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Keys
+    # ------------------------------------------------------------------
+    def file_digest(self, path):
+        """
+        Hash of a file's content, memoised on (path, size, mtime) for the
+        DIGEST_MEMO_SIZE most recently used files
+        """
+        stat = os.stat(path)
+        path = os.path.abspath(path)
+        memo_key = (path, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if memo_key in self._digests:
+                self._digests.move_to_end(memo_key)
+                return self._digests[memo_key]
+
+        digest = hashlib.blake2b(digest_size=20)
+        with open(path, "rb") as f:
+            while chunk := f.read(HASH_CHUNK_SIZE):
+                digest.update(chunk)
+        digest = digest.hexdigest()
+
+        with self._lock:
+            # An older version of the same file can never match again
+            for stale in [key for key in self._digests if key[0] == path]:
+                del self._digests[stale]
+            self._digests[memo_key] = digest
+            while len(self._digests) > DIGEST_MEMO_SIZE:
+                self._digests.popitem(last=False)
+        return digest
+
+    def make_key(self, video_path, model_path, **params):
+        """
+        Cache key for detecting `video_path` with `model_path`.
+        `params` must hold everything else that affects the result.
+        """
+        key = hashlib.blake2b(digest_size=20)
+        key.update(f"v{KEY_VERSION}".encode())
+        key.update(self.file_digest(video_path).encode())
+        key.update(self.file_digest(model_path).encode())
+        key.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return key.hexdigest()
+
+    # ------------------------------------------------------------------
+    # Entries
+    # ------------------------------------------------------------------
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, key):
+        """Return cached detections (Trajectory or list of dicts) for `key`, or None on a miss"""
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if "trajectory" in data:
+                    trajectory = Trajectory(data["trajectory"])
+                else:
+                    trajectory = None
+                    n_frames = int(data["n_frames"])
+                    frames = data["frame"]
+                    ids = data["track_id"]
+                    boxes = data["bbox"]
+        except (FileNotFoundError, OSError, KeyError, ValueError):
+            return None
+
+        # Touch the entry so eviction sees it as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        if trajectory is not None:
+            return trajectory
+
+        detections = [{} for _ in range(n_frames)]
+        for frame, track_id, box in zip(frames.tolist(), ids.tolist(), boxes.tolist()):
+            detections[frame][track_id] = box
+        return detections
+
+    def put(self, key, detections):
+        """
+        Store detections: a Trajectory is saved as its structured array,
+        multi-object dict lists ([{track_id: [x1, y1, x2, y2]}, ...]) as
+        flat frame / track_id / bbox columns.
+        """
+        if isinstance(detections, Trajectory):
+            arrays = {"trajectory": detections.data}
+        else:
+            rows = [(i, track_id, box) for i, det in enumerate(detections) for track_id, box in det.items()]
+            arrays = {
+                "n_frames": np.int64(len(detections)),
+                "frame": np.array([r[0] for r in rows], dtype=np.int32),
+                "track_id": np.array([r[1] for r in rows], dtype=np.int32),
+                "bbox": np.array([r[2] for r in rows], dtype=np.float64).reshape(-1, 4),
+            }
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self._evict()
+
+    def _evict(self):
+        """Delete least recently used entries until the cache fits max_bytes"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npz"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -0,0 +1,261 @@
+"""
+Pluggable inference runtimes for the YOLO trackers.
+
+`torch` runs best.pt as trained. `onnx` and `openvino` export it once, next
+to the weights (re-exported whenever best.pt is newer), and run the export
+on CPU through onnxruntime / OpenVINO. Ultralytics loads those formats
+behind the same predict / track API, so the trackers work unchanged on
+every backend.
+
+With int8, OpenVINO exports are quantized by Ultralytics (NNCF, calibrated
+on `data`) and ONNX exports with onnxruntime's dynamic weight quantization.
+
+compare_backends (or badminton_model/compare_backends.py) measures detection
+parity and frames/sec of every backend against torch; check_parity turns
+the report into pass / fail against stated tolerances.
+
+Ultralytics (and with it torch) is only imported when a model is loaded,
+so importing the trackers stays cheap.
+"""
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+BACKENDS = ("torch", "onnx", "openvino")
+
+# Parity tolerances against torch on the same frames (fp32 exports; INT8
+# exports usually need a looser confidence tolerance)
+PARITY_MIN_AGREEMENT = 0.98     # share of frames where both agree a shuttle is present
+PARITY_MAX_COUNT_DIFF = 0.02    # relative difference in the number of detections
+PARITY_MIN_IOU = 0.90           # mean box IoU over frames both detected
+PARITY_MAX_CONF_DIFF = 0.05     # largest confidence difference over frames both detected
+
+# Worker threads loading models at the same time must not export twice
+_export_lock = threading.Lock()
+
+
+def exported_path(model_path, backend, int8=False):
+    """Where the export of `model_path` for `backend` lives (best.pt itself for torch)"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r}, expected one of {BACKENDS}")
+    if backend == "torch":
+        return model_path
+
+    root = os.path.splitext(model_path)[0] + ("_int8" if int8 else "")
+    if backend == "onnx":
+        return f"{root}.onnx"
+    return f"{root}_openvino_model"
+
+
+def model_params(backend="torch", int8=False):
+    """Cache-key parameters for the backend; empty for torch so existing keys stay valid"""
+    if backend == "torch":
+        return {}
+    return {"backend": backend, "int8": int8}
+
+
+def _is_fresh(path, model_path):
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(model_path)
+
+
+def _move(src, dst):
+    if os.path.abspath(src) == os.path.abspath(dst):
+        return
+    if os.path.isdir(dst):
+        shutil.rmtree(dst)
+    shutil.move(src, dst)
+
+
+def export_model(model_path, backend="onnx", int8=False, imgsz=640, data=None):
+    """
+    Export `model_path` for `backend` unless an up-to-date export exists.
+
+    Exports use dynamic input shapes, so batched predict calls and the small
+    crops of RoiSearch (which change imgsz) work on every backend.
+
+    Args:
+        model_path: YOLO .pt weights
+        backend: One of BACKENDS
+        int8: Quantize weights to INT8
+        imgsz: Nominal input size of the export
+        data: Calibration dataset yaml for OpenVINO INT8 (Ultralytics default if None)
+
+    Returns:
+        str: Path to load with load_model / YOLO(path)
+    """
+    target = exported_path(model_path, backend, int8)
+    if backend == "torch":
+        return target
+
+    with _export_lock:
+        if not _is_fresh(target, model_path):
+            _export(model_path, backend, target, int8, imgsz, data)
+    return target
+
+
+def _export(model_path, backend, target, int8, imgsz, data):
+    from ultralytics import YOLO
+
+    print(f"📦 Exporting {model_path} for {backend}{' (int8)' if int8 else ''}...")
+    start = time.perf_counter()
+    model = YOLO(model_path)
+
+    if backend == "onnx":
+        onnx_path = model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+        if int8:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(onnx_path, target, weight_type=QuantType.QUInt8)
+        else:
+            _move(onnx_path, target)
+    else:
+        export_kwargs = {"data": data} if int8 and data else {}
+        _move(model.export(format="openvino", imgsz=imgsz, dynamic=True, int8=int8, **export_kwargs), target)
+
+    print(f"✅ Exported to {target} in {time.perf_counter() - start:.1f}s")
+
+
+def load_model(model_path, backend="torch", int8=False, task="detect", threads=None):
+    """
+    YOLO model for `model_path` running on `backend` (exported on first use).
+
+    Args:
+        threads: CPU thread budget of the runtime (None: runtime default,
+            usually every core)
+    """
+    from ultralytics import YOLO
+
+    if backend == "torch":
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return YOLO(model_path)
+
+    path = export_model(model_path, backend, int8=int8)
+    model = YOLO(path, task=task)
+    if threads:
+        _limit_threads(model, backend, path, threads)
+    return model
+
+
+def _limit_threads(model, backend, path, threads):
+    """
+    Rebuild the ONNX Runtime session / OpenVINO compiled model behind
+    `model` with a thread budget.
+
+    Ultralytics creates them with default thread pools (every core), which
+    oversubscribes the CPU as soon as several workers run side by side. The
+    runtime only exists after the first predict, hence the warm-up call.
+    """
+    model.predict(np.zeros((64, 64, 3), dtype=np.uint8), verbose=False)
+    runtime = model.predictor.model
+
+    if backend == "onnx" and hasattr(runtime, "session"):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        # Nodes run sequentially, the inter-op pool only needs the caller
+        options.inter_op_num_threads = 1
+        runtime.session = ort.InferenceSession(path, options, providers=runtime.session.get_providers())
+    elif backend == "openvino" and hasattr(runtime, "ov_compiled_model"):
+        import openvino as ov
+        config = {"PERFORMANCE_HINT": runtime.inference_mode, "INFERENCE_NUM_THREADS": threads}
+        runtime.ov_compiled_model = ov.Core().compile_model(runtime.ov_model, device_name="CPU",
+                                                            config=config)
+    else:
+        print(f"⚠️ Cannot limit {backend} threads with this Ultralytics version, using its defaults")
+
+
+def _box_iou(a, b):
+    """Row-wise IoU of two (N, 4) xyxy arrays"""
+    x1 = np.maximum(a[:, 0], b[:, 0])
+    y1 = np.maximum(a[:, 1], b[:, 1])
+    x2 = np.minimum(a[:, 2], b[:, 2])
+    y2 = np.minimum(a[:, 3], b[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-9)
+
+
+def compare_backends(model_path, frames, backends=BACKENDS, int8=False, batch_size=8, conf=0.10):
+    """
+    Shuttle detection parity and throughput of each backend against torch.
+
+    Args:
+        model_path: Shuttle .pt weights
+        frames: List of BGR frames to detect
+        backends: Backends to run; torch is always run as the reference
+        int8: Use INT8 exports for the non-torch backends
+
+    Returns:
+        dict: {backend: {"fps", "detections", "agreement", "count_diff",
+        "mean_iou", "max_conf_diff", "max_center_error_px"}}. agreement is the
+        share of frames where the backend and torch agree on whether there is
+        a shuttle, count_diff the relative difference in detections; IoU,
+        confidence and center error are over frames both detected.
+    """
+    from .shuttle_tracker import ShuttleTracker
+
+    frames = list(frames)
+    results = {}
+    reference = None
+    for backend in ("torch",) + tuple(b for b in backends if b != "torch"):
+        tracker = ShuttleTracker(model_path, batch_size=batch_size, conf=conf, backend=backend,
+                                 int8=int8 and backend != "torch")
+        tracker.detect_frames(frames[:batch_size])  # warm up
+        trajectory = tracker.detect_shuttle(frames)
+        boxes = trajectory.boxes.astype(np.float64)
+        scores = trajectory.conf.astype(np.float64)
+        found = ~np.isnan(boxes).any(axis=1)
+
+        stats = {"fps": round(tracker.last_fps or 0, 2), "detections": int(found.sum())}
+        if reference is None:
+            reference = (boxes, scores, found)
+        else:
+            ref_boxes, ref_scores, ref_found = reference
+            both = found & ref_found
+            centers = (boxes[both, :2] + boxes[both, 2:]) / 2
+            ref_centers = (ref_boxes[both, :2] + ref_boxes[both, 2:]) / 2
+            stats["agreement"] = round(float((found == ref_found).mean()), 4) if len(found) else 1.0
+            stats["count_diff"] = round(abs(int(found.sum()) - int(ref_found.sum()))
+                                        / max(int(ref_found.sum()), 1), 4)
+            stats["mean_iou"] = round(float(_box_iou(boxes[both], ref_boxes[both]).mean()), 4) if both.any() else None
+            stats["max_conf_diff"] = (round(float(np.abs(scores[both] - ref_scores[both]).max()), 4)
+                                      if both.any() else None)
+            stats["max_center_error_px"] = (round(float(np.hypot(*(centers - ref_centers).T).max()), 2)
+                                            if both.any() else None)
+        results[backend] = stats
+    return results
+
+
+def check_parity(report, min_agreement=PARITY_MIN_AGREEMENT, max_count_diff=PARITY_MAX_COUNT_DIFF,
+                 min_iou=PARITY_MIN_IOU, max_conf_diff=PARITY_MAX_CONF_DIFF):
+    """
+    Compare a compare_backends report against tolerances.
+
+    IoU and confidence are only checked when both backends detected the
+    shuttle on some frame; the presence checks cover the rest.
+
+    Returns:
+        list: One message per violated tolerance, empty when every backend
+        matches torch
+    """
+    failures = []
+    for backend, stats in report.items():
+        if backend == "torch":
+            continue
+        if stats["agreement"] < min_agreement:
+            failures.append(f"{backend}: presence agreement {stats['agreement']} < {min_agreement}")
+        if stats["count_diff"] > max_count_diff:
+            failures.append(f"{backend}: detection count differs by {stats['count_diff']:.2%} "
+                            f"(> {max_count_diff:.2%})")
+        if stats["mean_iou"] is not None and stats["mean_iou"] < min_iou:
+            failures.append(f"{backend}: mean IoU {stats['mean_iou']} < {min_iou}")
+        if stats["max_conf_diff"] is not None and stats["max_conf_diff"] > max_conf_diff:
+            failures.append(f"{backend}: confidence differs by up to {stats['max_conf_diff']} "
+                            f"(> {max_conf_diff})")
+    return failures
+
@@ -1,50 +1,87 @@
-from ultralytics import YOLO
-from ..utils import read_video, save_video
+from ..utils import read_video, save_video, iter_batches, FRAME_SIZE
 import cv2
-import pickle
+import numpy as np
+import time
+from .detection_cache import read_params
+from .inference_backend import load_model, model_params
 
 class PlayerTracker:
-    def __init__(self, model_path):
-        self.model = YOLO(model_path)
+    def __init__(self, model_path, batch_size=1, backend="torch", int8=False):
+        self.model = load_model(model_path, backend, int8=int8)
+        self.model_path = model_path
+        self.backend = backend
+        self.int8 = int8
+        self.batch_size = batch_size
+        self.last_fps = None  # throughput of the most recent detect_player run
+        self._persist = False  # first call after reset() starts fresh tracks
+
+    @staticmethod
+    def _result_to_dict(result):
+        """Convert one tracking result into {track_id: [x1, y1, x2, y2]}"""
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0 or boxes.id is None:
+            return {}
+
+        ids = boxes.id.cpu().numpy().astype(int)
+        xyxy = boxes.xyxy.cpu().numpy()
+        return {int(box_id): box.tolist() for box_id, box in zip(ids, xyxy)}
+
+    def reset(self):
+        """Drop the track state so the next video starts with fresh ids"""
+        self._persist = False
+
+    def detect_frames(self, frames):
+        """
+        Track players over a batch of consecutive frames with one model call.
+        With persist=True the results of a list source are fed to the same
+        tracker in order, so ids stay consistent across batches.
+        """
+        results = self.model.track(list(frames), persist=self._persist, verbose=False)
+        self._persist = True
+        return [self._result_to_dict(r) for r in results]
 
     def detect_frame(self, frame):
         """This function returns a dictionary containing the key of each player and the value of bbox."""
-        model = self.model
-        tracker = model.track(frame, persist=True)[0]
-        tracker_id = tracker.names  # dict
-        player_dict = {}
-        for box in tracker.boxes:
-            # print(box)
-            box_id = int(box.id.tolist()[0])
-            xyxy = box.xyxy.tolist()[0]
-            player_id = box.cls.tolist()[0]
-            player_name = tracker_id[player_id]
-            if player_name == "Player1":
-                player_dict[box_id] = xyxy
-            else:
-                player_dict[box_id] = xyxy
-            # print(player_dict)
-        return player_dict
-
-    def detect_player(self, frames, last_detect=False, path_of_last_detect=None):
+        return self.detect_frames([frame])[0]
+
+    def warmup(self, size=FRAME_SIZE):
+        """One batch of blank frames through the model, then fresh track state"""
+        width, height = size
+        self.detect_frames([np.zeros((height, width, 3), dtype=np.uint8)] * self.batch_size)
+        self.reset()
+
+    def detect_player(self, frames, cache=None, cache_key=None, batch_size=None):
         """This function detects the player in each frame and returns it as a list of dictionaries containing bbox."""
-        # read last detect player
-        if last_detect and path_of_last_detect is not None:
-            with open(path_of_last_detect, 'rb') as f:
-                player_detections = pickle.load(f)
-            return player_detections
+        # reuse cached detections (see DetectionCache / cache_key)
+        if cache is not None and cache_key is not None:
+            player_detections = cache.get(cache_key)
+            if player_detections is not None:
+                return player_detections
+
+        batch_size = batch_size or self.batch_size
+        self.reset()
 
         player_detections = []
-        for frame in frames:
-            player_dict = self.detect_frame(frame)
-            player_detections.append(player_dict)
+        start = time.perf_counter()
+        for batch in iter_batches(frames, batch_size):
+            player_detections.extend(self.detect_frames(batch))
+        elapsed = time.perf_counter() - start
 
-        if path_of_last_detect is not None:
-            with open(path_of_last_detect, 'wb') as f:
-                pickle.dump(player_detections, f)
+        self.last_fps = len(player_detections) / elapsed if elapsed > 0 else None
+        if self.last_fps:
+            print(f"Player detection: {len(player_detections)} frames, "
+                  f"batch={batch_size}, {self.last_fps:.1f} frames/sec")
+
+        if cache is not None and cache_key is not None:
+            cache.put(cache_key, player_detections)
 
         return player_detections
 
+    def cache_key(self, cache, video_path, **read_kwargs):
+        """DetectionCache key for tracking `video_path` with this model and settings"""
+        return cache.make_key(video_path, self.model_path, task="player",
+                              **model_params(self.backend, self.int8), **read_params(**read_kwargs))
+
     def player_positions(frames, detections):
         c_positions = {}
         for k, bbox in detections.items():
@@ -0,0 +1,311 @@
+"""
+Multi-process shuttle detection.
+
+Each worker process loads its own YOLO model once (in the pool initializer)
+and then receives either a frame range of a video file, which it decodes
+itself, or a pickled chunk of frames. Results come back in frame order, so
+one long upload can be spread over every core of a CPU box.
+
+Full matches are split into time windows (shards). Each shard also reads a
+small overlap on both sides so gap filling near its edges sees the same
+neighbours as a single pass would, then keeps only the frames it owns; the
+stitched trajectory is therefore identical to processing the whole match
+in one go, and rallies / strokes computed on it are never counted twice.
+"""
+import math
+import multiprocessing as mp
+import os
+import time
+from itertools import count
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from ..utils import iter_video, first_sample, get_video_info, FRAME_SIZE
+from ..utils.trajectory import Trajectory
+from .detection_cache import read_params
+from .inference_backend import model_params
+
+# Model instance owned by the current worker process
+_worker_tracker = None
+
+
+def _init_worker(model_path, batch_size, conf, threads_per_worker, backend="torch", int8=False):
+    """Pool initializer: runs once per process, loads the model"""
+    global _worker_tracker
+
+    # One process per core only scales if each process stays on its own cores
+    import cv2
+    cv2.setNumThreads(1)
+    if backend == "torch":
+        # Only the torch backend pays for importing torch in every worker
+        import torch
+        torch.set_num_threads(threads_per_worker)
+
+    # The ONNX Runtime / OpenVINO session gets the same budget
+    from .shuttle_tracker import ShuttleTracker
+    _worker_tracker = ShuttleTracker(model_path, batch_size=batch_size, conf=conf, backend=backend, int8=int8,
+                                     threads=threads_per_worker)
+
+
+def _detect_range(video_path, start_frame, end_frame, stride, size):
+    frames = iter_video(video_path, stride=stride, size=size,
+                        start_frame=start_frame, end_frame=end_frame)
+    return _worker_tracker.detect_shuttle(frames, frame_indices=count(first_sample(stride, start_frame), stride))
+
+
+def _detect_window(video_path, read_start, read_end, own_start, own_end, stride, size, max_gap):
+    """Detect a padded window, fill gaps locally, return only the owned frames"""
+    trajectory = _detect_range(video_path, read_start, read_end, stride, size)
+    if max_gap is not None:
+        trajectory = trajectory.interpolate(max_gap=max_gap)
+
+    frames = trajectory.frames
+    owned = frames >= own_start
+    if own_end is not None:
+        owned &= frames < own_end
+    return Trajectory(trajectory.data[owned])
+
+
+def _detect_chunk(frames):
+    return _worker_tracker.detect_frames(frames)
+
+
+def _warmup_worker(size):
+    _worker_tracker.warmup(size=size)
+    return os.getpid()
+
+
+def split_frame_range(first, last, stride, chunks):
+    """
+    Split [first, last) into `chunks` contiguous ranges whose starts are
+    aligned to `stride`, so the union samples exactly the same frames as a
+    single pass with that stride.
+
+    Returns:
+        list of (start_frame, end_frame) tuples; the final end may be None
+        (read to end of file) when `last` is None
+    """
+    if last is None:
+        return [(first, None)]
+
+    samples = -(-(last - first) // stride)
+    chunks = max(1, min(chunks, samples))
+    bounds = [first + (samples * i // chunks) * stride for i in range(chunks)] + [last]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def split_windows(first, last, stride, window, overlap):
+    """
+    Split [first, last) into windows of `window` source frames that each own
+    a contiguous, stride-aligned part of the range and read `overlap` extra
+    frames on both sides.
+
+    Returns:
+        list of (read_start, read_end, own_start, own_end); the last window
+        has read_end = own_end = None (read to end of file)
+    """
+    samples = -(-(last - first) // stride)
+    per_window = max(1, window // stride)
+    pad = -(-overlap // stride) * stride
+
+    starts = [first + k * stride for k in range(0, max(samples, 1), per_window)]
+    ends = starts[1:] + [None]
+    return [
+        (max(first, start - pad), None if end is None else min(last, end + pad), start, end)
+        for start, end in zip(starts, ends)
+    ]
+
+
+class DetectionPool:
+    """
+    Pool of worker processes, each holding its own ShuttleTracker.
+
+    Args:
+        model_path: YOLO weights loaded by every worker
+        processes: Number of worker processes (default: all cores)
+        batch_size: Frames per predict call inside each worker
+        conf: Detection confidence threshold
+        backend: Inference runtime of every worker (see inference_backend);
+            export the weights beforehand so workers don't all export at once
+        int8: Use the INT8-quantized export
+        threads_per_worker: Intra-op threads per worker (torch and the ONNX
+            Runtime / OpenVINO session); keep at 1 for near-linear scaling
+            with processes == cores
+        chunks_per_process: Ranges handed out per process for one video, so a
+            slow range doesn't leave the other cores idle at the end
+        on_task: Optional callable(kind, seconds) called when a task finishes,
+            with its kind ("range", "window" or "chunk") and the time from
+            submit to result
+    """
+
+    def __init__(self, model_path, processes=None, batch_size=1, conf=0.10,
+                 threads_per_worker=1, chunks_per_process=2, backend="torch", int8=False, on_task=None):
+        self.processes = processes or os.cpu_count() or 1
+        self.chunks_per_process = chunks_per_process
+        self.model_path = model_path
+        self.conf = conf
+        self.backend = backend
+        self.int8 = int8
+        self.on_task = on_task
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=mp.get_context("spawn"),  # never fork a process holding torch threads
+            initializer=_init_worker,
+            initargs=(model_path, batch_size, conf, threads_per_worker, backend, int8)
+        )
+
+    def detect_video(self, video_path, stride=1, max_frames=None, start_sec=None, end_sec=None,
+                     size=FRAME_SIZE, cache=None, progress=None):
+        """
+        Detect a whole video across the pool; same result (and same
+        DetectionCache key) as ShuttleTracker.detect_video with the same arguments.
+        """
+        key = None
+        if cache is not None:
+            key = cache.make_key(
+                video_path, self.model_path, task="shuttle", conf=self.conf,
+                **model_params(self.backend, self.int8),
+                **read_params(stride=stride, max_frames=max_frames, start_sec=start_sec,
+                              end_sec=end_sec, size=size)
+            )
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+        info = get_video_info(video_path)
+        fps = info["fps"]
+
+        first = int(round(start_sec * fps)) if start_sec else 0
+        last = int(round(end_sec * fps)) if end_sec is not None else None
+        if info["frame_count"]:
+            last = min(last, info["frame_count"]) if last is not None else info["frame_count"]
+        if max_frames is not None:
+            limit = first + max_frames * stride
+            last = min(last, limit) if last is not None else limit
+
+        ranges = split_frame_range(first, last, stride, self.processes * self.chunks_per_process)
+        # The last range reads to EOF in case the container under-reports its frame count
+        if max_frames is None and end_sec is None:
+            ranges[-1] = (ranges[-1][0], None)
+
+        futures = {
+            self._submit("range", _detect_range, video_path, start, end, stride, size): i
+            for i, (start, end) in enumerate(ranges)
+        }
+        detections = self._gather(futures, len(ranges), progress)
+
+        if key is not None:
+            cache.put(key, detections)
+        return detections
+
+    def detect_match(self, video_path, stride=1, max_gap=None, window_sec=60.0, overlap_sec=1.0,
+                     size=FRAME_SIZE, cache=None, progress=None):
+        """
+        Detect and gap-fill a full-length video, sharded into time windows
+        spread over the pool.
+
+        Args:
+            max_gap: Interpolation gap limit (see interpolate_boxes). Each
+                shard fills its own gaps; its overlap is widened to more than
+                max_gap samples so the result matches a single pass.
+            window_sec: Length of one shard; many small shards keep every
+                core busy until the end of the match
+            overlap_sec: Extra video read on both sides of a shard
+
+        Returns:
+            Interpolated Trajectory of the whole video (detected / conf keep
+            the raw model output)
+        """
+        key = None
+        if cache is not None:
+            # Same entry as detect_video(stride=stride): raw detections of every frame
+            key = cache.make_key(
+                video_path, self.model_path, task="shuttle", conf=self.conf,
+                **model_params(self.backend, self.int8), **read_params(stride=stride, size=size)
+            )
+            cached = cache.get(key)
+            if cached is not None:
+                return Trajectory.from_detections(cached).interpolate(max_gap=max_gap)
+
+        info = get_video_info(video_path)
+        fps = info["fps"] or 30
+        if not info["frame_count"]:
+            # Unknown length: no way to place windows, fall back to one pass
+            windows = [(0, None, 0, None)]
+        else:
+            overlap = int(math.ceil(overlap_sec * fps))
+            if max_gap is not None:
+                overlap = max(overlap, (max_gap + 1) * stride)
+            windows = split_windows(0, info["frame_count"], stride,
+                                    max(1, int(window_sec * fps)), overlap)
+
+        futures = {
+            self._submit("window", _detect_window, video_path, *window, stride, size, max_gap): i
+            for i, window in enumerate(windows)
+        }
+        trajectory = self._gather(futures, len(windows), progress)
+        if max_gap is None:
+            trajectory = trajectory.interpolate()
+
+        if key is not None and len(trajectory):
+            cache.put(key, trajectory.detections_only())
+        return trajectory
+
+    def detect_frames(self, frames, chunk_size=32, progress=None):
+        """Detect already-decoded frames by shipping chunks of them to workers"""
+        futures = {}
+        chunk = []
+        for frame in frames:
+            chunk.append(frame)
+            if len(chunk) == chunk_size:
+                futures[self._submit("chunk", _detect_chunk, chunk)] = len(futures)
+                chunk = []
+        if chunk:
+            futures[self._submit("chunk", _detect_chunk, chunk)] = len(futures)
+
+        return self._gather(futures, len(futures), progress)
+
+    def _submit(self, kind, fn, *args):
+        future = self._executor.submit(fn, *args)
+        if self.on_task is not None:
+            start = time.perf_counter()
+            future.add_done_callback(lambda _: self.on_task(kind, time.perf_counter() - start))
+        return future
+
+    @staticmethod
+    def _gather(futures, total, progress):
+        """Wait for all chunks and concatenate their detections in frame order"""
+        parts = [None] * total
+        for done, future in enumerate(as_completed(futures), 1):
+            parts[futures[future]] = future.result()
+            if progress is not None:
+                progress(done / total)
+
+        if parts and all(isinstance(part, Trajectory) for part in parts):
+            return Trajectory.concatenate(parts)
+        return [det for part in parts for det in part]
+
+    def warmup(self, size=FRAME_SIZE, rounds=3):
+        """
+        Start every worker process and run a blank batch through its model.
+        Tasks go to whichever process is free, so this repeats (up to
+        `rounds` times) until every process has reported in.
+
+        Returns:
+            int: Number of distinct processes warmed
+        """
+        warmed = set()
+        for _ in range(rounds):
+            futures = [self._executor.submit(_warmup_worker, size) for _ in range(self.processes)]
+            warmed.update(future.result() for future in futures)
+            if len(warmed) >= self.processes:
+                break
+        return len(warmed)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,104 @@
+"""
+Region-of-interest search for shuttle detection.
+
+The shuttle is a few pixels wide and moves smoothly between samples, so
+once it has been found there is no need to run the model over the whole
+frame. RoiSearch predicts the next position with a constant-velocity model
+and hands ShuttleTracker.detect_batch a small square crop around it, which
+is detected at a matching small `imgsz`. The tracker falls back to
+full-frame search when the ROI result is empty or touches the window edge;
+once the shuttle is missing for a few frames the lock is dropped and frames
+go straight to full-frame search. A crop is a different model input than
+the full frame, so detections are close to, not identical with, a
+full-frame run.
+"""
+import numpy as np
+
+
+class RoiSearch:
+    """
+    Per-video tracking state; create one per video (or call reset()).
+
+    Args:
+        crop_size: Side of the square search window, in frame pixels; also
+            the model input size for crops, so keep it a multiple of 32
+        min_hits: Consecutive detections needed before locking on
+        max_misses: Consecutive missed frames before dropping the lock
+    """
+
+    def __init__(self, crop_size=160, min_hits=2, max_misses=2):
+        self.crop_size = crop_size
+        self.min_hits = min_hits
+        self.max_misses = max_misses
+        self.reset()
+
+    def reset(self):
+        self._last_frame = None
+        self._last_center = None
+        self._velocity = (0.0, 0.0)
+        self._hits = 0
+        self._misses = 0
+        self.next_frame = 0  # default frame number of the next update
+        self.roi_frames = 0
+        self.full_frames = 0
+
+    def params(self):
+        """Settings that change the detections (for cache keys)"""
+        return {"crop_size": self.crop_size, "min_hits": self.min_hits, "max_misses": self.max_misses}
+
+    @property
+    def locked(self):
+        return self._hits >= self.min_hits and self._misses < self.max_misses
+
+    def stats(self):
+        return {"roi_frames": self.roi_frames, "full_frames": self.full_frames}
+
+    def predict(self, frame_idx):
+        """Constant-velocity estimate of the shuttle center at `frame_idx`"""
+        dt = frame_idx - self._last_frame
+        return (self._last_center[0] + self._velocity[0] * dt,
+                self._last_center[1] + self._velocity[1] * dt)
+
+    def window(self, frame_idx, frame_shape):
+        """
+        Search window (x0, y0, x1, y1) for `frame_idx`, clipped to the frame,
+        or None when the frame should be searched in full.
+        """
+        height, width = frame_shape[:2]
+        if not self.locked or self.crop_size >= min(width, height):
+            return None
+
+        cx, cy = self.predict(frame_idx)
+        half = self.crop_size // 2
+        x0 = int(np.clip(round(cx) - half, 0, width - self.crop_size))
+        y0 = int(np.clip(round(cy) - half, 0, height - self.crop_size))
+        return x0, y0, x0 + self.crop_size, y0 + self.crop_size
+
+    def count(self, cropped=0, full=0):
+        """Tally model inputs: crops searched and full frames searched"""
+        self.roi_frames += cropped
+        self.full_frames += full
+
+    def update(self, frame_idx, box):
+        """Record the (frame-coordinate) detection for `frame_idx`; NaN box = miss"""
+        self.next_frame = frame_idx + 1
+
+        box = np.asarray(box, dtype=np.float64)
+        if np.isnan(box).any():
+            self._misses += 1
+            if not self.locked:
+                self._hits = 0
+            return
+
+        center = ((box[0] + box[2]) / 2, (box[1] + box[3]) / 2)
+        if self._last_center is not None and frame_idx > self._last_frame:
+            dt = frame_idx - self._last_frame
+            self._velocity = ((center[0] - self._last_center[0]) / dt,
+                              (center[1] - self._last_center[1]) / dt)
+        else:
+            self._velocity = (0.0, 0.0)
+
+        self._last_frame = frame_idx
+        self._last_center = center
+        self._hits += 1
+        self._misses = 0
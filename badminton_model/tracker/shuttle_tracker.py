@@ -1,43 +1,165 @@
-from ultralytics import YOLO
 import cv2
-import pickle
-import pandas as pd
 import math
+import time
+from itertools import count, islice
+import numpy as np
+from ..utils import iter_batches, iter_video, first_sample, get_video_info, VideoReader, FRAME_SIZE
+from ..utils import detections_to_boxes, boxes_to_detections, interpolate_boxes
+from ..utils.trajectory import Trajectory
+from .detection_cache import read_params
+from .inference_backend import load_model, model_params
+
+
+def _first_frame(video_path, read_kwargs):
+    """Source frame number of the first frame iter_video yields for these arguments"""
+    start = 0
+    if read_kwargs.get("start_frame") is not None:
+        start = read_kwargs["start_frame"]
+    elif read_kwargs.get("start_sec"):
+        start = int(round(read_kwargs["start_sec"] * get_video_info(video_path)["fps"]))
+    return first_sample(read_kwargs.get("stride", 1), start)
+
+
+def _report_progress(frames, progress, expected):
+    """Pass frames through, calling progress(fraction) as they are consumed"""
+    for i, frame in enumerate(frames, 1):
+        if expected:
+            progress(min(i / expected, 1.0))
+        yield frame
+
+
+def _touches_edge(box, window, frame_shape):
+    """True if `box` reaches a side of `window` that is not also a frame border"""
+    x0, y0, x1, y1 = window
+    height, width = frame_shape[:2]
+    return ((x0 > 0 and box[0] <= x0) or (y0 > 0 and box[1] <= y0)
+            or (x1 < width and box[2] >= x1) or (y1 < height and box[3] >= y1))
 
 
 class ShuttleTracker:
-    def __init__(self, model_path: str):
+    def __init__(self, model_path: str, batch_size: int = 1, conf: float = 0.10,
+                 backend: str = "torch", int8: bool = False, threads: int = None):
         """
         Loads YOLO model for shuttle detection
-        """
-        self.model = YOLO(model_path)
 
-    def detect_frame(self, frame, frame_idx=None):
+        Args:
+            model_path: Path to the YOLO weights
+            batch_size: Frames sent to the model per predict call
+            conf: Detection confidence threshold
+            backend: Inference runtime, "torch", "onnx" or "openvino"
+                (see inference_backend); non-torch weights are exported on first use
+            int8: Use an INT8-quantized export (non-torch backends)
+            threads: CPU thread budget of the inference runtime (None: all cores)
         """
-        Detect shuttle in a single frame.
-        frame_idx is optional and only used for debug / logging.
-        """
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-        results = self.model.predict(
-            frame_rgb,
-            conf=0.10,
-            imgsz=640,
+        self.model = load_model(model_path, backend, int8=int8, threads=threads)
+        self.model_path = model_path
+        self.backend = backend
+        self.int8 = int8
+        self.batch_size = batch_size
+        self.conf = conf
+        self.last_fps = None  # throughput of the most recent detect_shuttle run
+
+    def _predict(self, frames, imgsz=640):
+        """Run a single predict call over a list of BGR frames"""
+        frames_rgb = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in frames]
+        return self.model.predict(
+            frames_rgb,
+            conf=self.conf,
+            imgsz=imgsz,
             verbose=False
-        )[0]
+        )
 
-        shuttle_dict = {}
+    def _detect_images(self, images, imgsz=640):
+        """(boxes, conf) in image coordinates for one predict call"""
+        results = self._predict(images, imgsz=imgsz)
+        boxes = np.full((len(results), 4), np.nan)
+        conf = np.full(len(results), np.nan)
 
-        if results.boxes is None or len(results.boxes) == 0:
-            return shuttle_dict
+        for i, result in enumerate(results):
+            if result.boxes is None or len(result.boxes) == 0:
+                continue
 
-        for box in results.boxes:
-            cls = int(box.cls.tolist()[0])
-            if cls != 0:
+            shuttle = np.flatnonzero(result.boxes.cls.cpu().numpy() == 0)
+            if len(shuttle) == 0:
                 continue
 
-            xyxy = box.xyxy.tolist()[0]
-            shuttle_dict[0] = xyxy
+            # The last shuttle-class box wins, as with the old per-box loop
+            boxes[i] = result.boxes.xyxy.cpu().numpy()[shuttle[-1]]
+            conf[i] = result.boxes.conf.cpu().numpy()[shuttle[-1]]
+
+        return boxes, conf
+
+    def detect_batch(self, frames, roi=None, frame_indices=None):
+        """
+        Detect a batch of frames with one model call (with ROI search: one
+        over the crops, one over frames that are not locked on, and one
+        re-searching crops that missed).
+
+        Args:
+            roi: Optional RoiSearch; while it is locked on the shuttle only a
+                small crop around the predicted position is searched, at a
+                matching small model input size
+            frame_indices: Source frame numbers of `frames`, used by the ROI
+                motion model (defaults to continuing after the last update)
+
+        Returns:
+            (boxes, conf): (B, 4) and (B,) float arrays in frame coordinates,
+            NaN where no shuttle
+        """
+        if roi is None:
+            return self._detect_images(frames)
+
+        if frame_indices is None:
+            frame_indices = range(roi.next_frame, roi.next_frame + len(frames))
+        frame_indices = list(frame_indices)
+
+        # Windows come from the state before the batch: later frames are
+        # extrapolated further instead of waiting on each other's results
+        windows = [roi.window(idx, frame.shape) for idx, frame in zip(frame_indices, frames)]
+        boxes = np.full((len(frames), 4), np.nan)
+        conf = np.full(len(frames), np.nan)
+
+        full = [i for i, window in enumerate(windows) if window is None]
+        if full:
+            boxes[full], conf[full] = self._detect_images([frames[i] for i in full])
+
+        cropped = [i for i, window in enumerate(windows) if window is not None]
+        if cropped:
+            crops = []
+            for i in cropped:
+                x0, y0, x1, y1 = windows[i]
+                crops.append(frames[i][y0:y1, x0:x1])
+            crop_boxes, crop_conf = self._detect_images(crops, imgsz=roi.crop_size)
+            offsets = np.array([windows[i][:2] * 2 for i in cropped], dtype=np.float64)
+            boxes[cropped] = crop_boxes + offsets
+            conf[cropped] = crop_conf
+
+            # The prediction was off (sharp hit, or the shuttle left the
+            # window) or the box is cut by the window edge: search those
+            # frames in full before counting a miss
+            retry = [i for i in cropped
+                     if np.isnan(boxes[i]).any() or _touches_edge(boxes[i], windows[i], frames[i].shape)]
+            if retry:
+                boxes[retry], conf[retry] = self._detect_images([frames[i] for i in retry])
+            roi.count(cropped=len(cropped), full=len(full) + len(retry))
+        else:
+            roi.count(full=len(full))
+
+        for idx, box in zip(frame_indices, boxes):
+            roi.update(idx, box)
+
+        return boxes, conf
+
+    def detect_frames(self, frames):
+        """Detect shuttle in a batch of frames with one model call"""
+        return boxes_to_detections(self.detect_batch(frames)[0])
+
+    def detect_frame(self, frame, frame_idx=None):
+        """
+        Detect shuttle in a single frame.
+        frame_idx is optional and only used for debug / logging.
+        """
+        shuttle_dict = self.detect_frames([frame])[0]
 
         # Optional debug print - only every 30 frames
         if frame_idx is not None and frame_idx % 30 == 0:
@@ -45,111 +167,342 @@ class ShuttleTracker:
 
         return shuttle_dict
 
-    def detect_shuttle(self, frames, last_detect=False, path_of_last_detect=None):
+    def detect_shuttle(self, frames, cache=None, cache_key=None, batch_size=None, frame_indices=None,
+                       roi=None):
         """
-        Detect shuttle across all frames
+        Detect shuttle across all frames.
+        `frames` can be a list or a generator (e.g. iter_video); frames are
+        consumed `batch_size` at a time, so only one batch is held in memory.
+        With a DetectionCache and key, a hit returns without running the model.
+
+        Args:
+            frame_indices: Optional iterable of source frame numbers for
+                `frames` (defaults to 0, 1, 2, ...)
+            roi: Optional RoiSearch for cropped search while tracking is locked
+
+        Returns:
+            Trajectory (indexes / iterates like the old list of dicts)
         """
-        if last_detect and path_of_last_detect is not None:
-            with open(path_of_last_detect, 'rb') as f:
-                shuttle_detections = pickle.load(f)
-            return shuttle_detections
+        if cache is not None and cache_key is not None:
+            shuttle_detections = cache.get(cache_key)
+            if shuttle_detections is not None:
+                return shuttle_detections
+
+        batch_size = batch_size or self.batch_size
+        numbers = iter(frame_indices) if frame_indices is not None else count()
+        if roi is not None:
+            roi.reset()
+
+        boxes, conf, indices = [], [], []
+        start = time.perf_counter()
+        for batch in iter_batches(frames, batch_size):
+            batch_indices = list(islice(numbers, len(batch)))
+            batch_boxes, batch_conf = self.detect_batch(batch, roi=roi, frame_indices=batch_indices)
+            boxes.append(batch_boxes)
+            conf.append(batch_conf)
+            indices.extend(batch_indices)
+        elapsed = time.perf_counter() - start
+
+        n = sum(len(b) for b in boxes)
+        frame_numbers = None
+        if frame_indices is not None:
+            frame_numbers = np.array(indices, dtype=np.int64)
+
+        shuttle_detections = Trajectory.from_boxes(
+            np.concatenate(boxes) if boxes else np.empty((0, 4)),
+            conf=np.concatenate(conf) if conf else None,
+            frames=frame_numbers
+        )
+
+        self.last_fps = n / elapsed if elapsed > 0 else None
+        if self.last_fps:
+            print(f"Shuttle detection: {n} frames, "
+                  f"batch={batch_size}, {self.last_fps:.1f} frames/sec")
+        if roi is not None:
+            print(f"ROI search: {roi.roi_frames} cropped, {roi.full_frames} full-frame")
+
+        if cache is not None and cache_key is not None:
+            cache.put(cache_key, shuttle_detections)
 
-        shuttle_detections = []
-        for i, frame in enumerate(frames):
-            shuttle_dict = self.detect_frame(frame, frame_idx=i)
-            shuttle_detections.append(shuttle_dict)
+        return shuttle_detections
 
-        if path_of_last_detect is not None:
-            with open(path_of_last_detect, 'wb') as f:
-                pickle.dump(shuttle_detections, f)
+    def cache_key(self, cache, video_path, sampler=None, roi=None, **read_kwargs):
+        """DetectionCache key for detecting `video_path` with this model and settings"""
+        if sampler is not None:
+            read_kwargs["sampler"] = sampler.params()
+        if roi is not None:
+            read_kwargs["roi"] = roi.params()
+        return cache.make_key(video_path, self.model_path, task="shuttle", conf=self.conf,
+                              **model_params(self.backend, self.int8), **read_params(**read_kwargs))
+
+    def detect_video(self, video_path, cache=None, progress=None, roi=None, **read_kwargs):
+        """
+        Decode and detect a video file in one streaming pass.
+
+        Args:
+            video_path: Source video
+            cache: Optional DetectionCache; a hit skips decoding and the model
+            progress: Optional callback receiving the fraction of frames done
+            roi: Optional RoiSearch for cropped search while tracking is locked
+            **read_kwargs: Passed to iter_video (stride, max_frames, start/end, size)
+        """
+        key = self.cache_key(cache, video_path, roi=roi, **read_kwargs) if cache is not None else None
+        if key is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+        frames = iter_video(video_path, **read_kwargs)
+        frame_indices = count(_first_frame(video_path, read_kwargs), read_kwargs.get("stride", 1))
+
+        if progress is not None:
+            info = get_video_info(video_path)
+            stride = read_kwargs.get("stride", 1)
+            expected = info["frame_count"] // stride if info["frame_count"] else 0
+            if read_kwargs.get("max_frames"):
+                expected = min(expected, read_kwargs["max_frames"]) if expected else read_kwargs["max_frames"]
+            frames = _report_progress(frames, progress, expected)
+
+        return self.detect_shuttle(frames, cache=cache, cache_key=key, frame_indices=frame_indices,
+                                   roi=roi)
+
+    def iter_adaptive(self, video_path, sampler, start_frame=0, end_frame=None, size=FRAME_SIZE,
+                      batch_size=None, roi=None, on_batch=None):
+        """
+        Decode and detect a video with motion-driven sampling.
+
+        The sampler sees every detection and picks the stride for the next
+        batch, so a batch is always sampled at one stride (the model still
+        runs up to batch_size frames per call). A trigger seen inside a batch
+        restarts the dense window at the batch's last frame, and dense
+        batches end with the window.
+
+        Args:
+            on_batch: Optional callable(seconds, frames) called after every
+                detect_batch call, e.g. to record inference latency
+
+        Yields:
+            (frame_idx, frame, box, conf) per sampled frame; box is NaN on a miss
+        """
+        batch_size = batch_size or self.batch_size
+        sampler.reset()
+        if roi is not None:
+            roi.reset()
+        frame_idx = start_frame or 0
+
+        with VideoReader(video_path, size=size, start_frame=frame_idx) as reader:
+            done = False
+            while not done:
+                stride = sampler.stride
+                limit = sampler.batch_limit(frame_idx, batch_size)
+                indices, batch = [], []
+                while len(batch) < limit:
+                    if end_frame is not None and frame_idx >= end_frame:
+                        done = True
+                        break
+                    frame = reader.read(frame_idx)
+                    if frame is None:
+                        done = True
+                        break
+                    indices.append(frame_idx)
+                    batch.append(frame)
+                    frame_idx += stride
+
+                if not batch:
+                    break
+
+                start = time.perf_counter()
+                boxes, conf = self.detect_batch(batch, roi=roi, frame_indices=indices)
+                if on_batch is not None:
+                    on_batch(time.perf_counter() - start, len(batch))
+                dense_until = sampler.dense_until
+                for i, frame, box, score in zip(indices, batch, boxes, conf):
+                    sampler.update(i, box)
+                    yield i, frame, box, score
+
+                if sampler.dense_until != dense_until:
+                    # Triggered inside this batch: the frames after the hit were
+                    # already sampled at `stride`, keep the window ahead of them
+                    sampler.extend_dense(indices[-1])
+
+                # Next batch starts one stride (as chosen now) after the last sample
+                frame_idx = indices[-1] + sampler.stride
+
+    def detect_adaptive(self, video_path, sampler, cache=None, start_frame=0, end_frame=None,
+                        size=FRAME_SIZE, roi=None):
+        """
+        Detect a video with an AdaptiveSampler instead of a fixed stride.
 
+        Returns:
+            Trajectory whose `frames` column records which source frames were
+            sampled (so the stride used for every step is known downstream)
+        """
+        key = None
+        if cache is not None:
+            key = self.cache_key(cache, video_path, sampler=sampler, roi=roi,
+                                 start_frame=start_frame, end_frame=end_frame, size=size)
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+        frames, boxes, conf = [], [], []
+        start = time.perf_counter()
+        for frame_idx, _, box, score in self.iter_adaptive(video_path, sampler, start_frame=start_frame,
+                                                           end_frame=end_frame, size=size, roi=roi):
+            frames.append(frame_idx)
+            boxes.append(box)
+            conf.append(score)
+        elapsed = time.perf_counter() - start
+
+        shuttle_detections = Trajectory.from_boxes(
+            np.array(boxes).reshape(-1, 4), conf=np.array(conf), frames=np.array(frames, dtype=np.int64)
+        )
+
+        self.last_fps = len(frames) / elapsed if elapsed > 0 else None
+        if self.last_fps:
+            print(f"Shuttle detection (adaptive): {len(frames)} frames, "
+                  f"{self.last_fps:.1f} frames/sec")
+
+        if key is not None:
+            cache.put(key, shuttle_detections)
         return shuttle_detections
 
-    def interpolate_shuttle_position(self, shuttle_detections):
+    def warmup(self, size=FRAME_SIZE):
         """
-        Fills missing frames using linear interpolation
+        Run one full batch of blank frames so lazy runtime initialisation
+        (kernel selection, graph compilation, memory pools) happens now
+        rather than on the first real request.
         """
-        rows = []
+        width, height = size
+        self.detect_batch([np.zeros((height, width, 3), dtype=np.uint8)] * self.batch_size)
 
-        for det in shuttle_detections:
-            if 0 in det:
-                rows.append(det[0])
-            else:
-                rows.append([None, None, None, None])
+    def benchmark_batch_sizes(self, frames, batch_sizes=(1, 4, 8, 16)):
+        """
+        Measure detection throughput for several batch sizes on the same frames.
+        Batch size 1 is the old one-predict-per-frame behaviour.
 
-        df = pd.DataFrame(rows, columns=["x1", "y1", "x2", "y2"])
-        df = df.interpolate()
-        df = df.bfill().ffill()
+        Returns:
+            dict: {batch_size: frames/sec}
+        """
+        frames = list(frames)
+        self.detect_frames(frames[:1])  # warm up so the first run isn't penalised
 
-        interpolated = [{0: row.tolist()} for _, row in df.iterrows()]
-        return interpolated
+        results = {}
+        for batch_size in batch_sizes:
+            self.detect_shuttle(frames, batch_size=batch_size)
+            results[batch_size] = round(self.last_fps or 0, 2)
+        return results
 
-    def draw_shuttle_bbox(self, frames, shuttle_detections, fps=30):
+    @staticmethod
+    def interpolate_shuttle_array(shuttle_detections, max_gap=None):
+        """
+        Fill missing frames using linear interpolation.
+
+        Args:
+            shuttle_detections: Trajectory or per-frame dicts from detect_shuttle
+            max_gap: Longest run of missed frames to fill; longer gaps stay
+                as misses instead of becoming straight lines. None fills all.
+
+        Returns:
+            (N, 4) float array of [x1, y1, x2, y2], NaN rows = no shuttle
+        """
+        if isinstance(shuttle_detections, Trajectory):
+            boxes = shuttle_detections.boxes.astype(np.float64)
+        else:
+            boxes = detections_to_boxes(shuttle_detections)
+        return interpolate_boxes(boxes, max_gap=max_gap)
+
+    @staticmethod
+    def interpolate_shuttle_position(shuttle_detections, max_gap=None):
+        """
+        Fills missing frames using linear interpolation.
+        Returns a Trajectory for Trajectory input, otherwise the dict list.
+        """
+        if isinstance(shuttle_detections, Trajectory):
+            return shuttle_detections.interpolate(max_gap=max_gap)
+        return boxes_to_detections(ShuttleTracker.interpolate_shuttle_array(shuttle_detections, max_gap))
+
+    @staticmethod
+    def draw_shuttle_bbox(frames, shuttle_detections, fps=30):
         """
         Draw bounding boxes, centers, speed, and trails
         """
-        output_frames = []
+        return list(ShuttleTracker.iter_shuttle_bbox(frames, shuttle_detections, fps=fps))
+
+    @staticmethod
+    def iter_shuttle_bbox(frames, shuttle_detections, fps=30):
+        """
+        Streaming version of draw_shuttle_bbox: annotates and yields one frame
+        at a time so it can sit between iter_video and save_video.
+        """
         prev_center = None
+        for i, (frame, det) in enumerate(zip(frames, shuttle_detections)):
+            prev_center = ShuttleTracker.annotate_frame(frame, i, det, prev_center, fps=fps)
+            yield frame
+
+    @staticmethod
+    def annotate_frame(frame, frame_idx, det, prev_center, fps=30):
+        """
+        Draw one frame's box, center, speed and trail in place.
 
+        Returns:
+            The shuttle center drawn on this frame (pass it back as
+            prev_center for the next frame), or None
+        """
         PIXELS_TO_METERS = 0.02
 
-        for i, (frame, det) in enumerate(zip(frames, shuttle_detections)):
+        cv2.putText(
+            frame,
+            f"Frame {frame_idx} | Detections: {len(det)}",
+            (10, 30),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.7,
+            (0, 255, 0),
+            2
+        )
+
+        current_center = None
+
+        if 0 in det:
+            x1, y1, x2, y2 = det[0]
 
-            cv2.putText(
+            cv2.rectangle(
                 frame,
-                f"Frame {i} | Detections: {len(det)}",
-                (10, 30),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.7,
+                (int(x1), int(y1)),
+                (int(x2), int(y2)),
                 (0, 255, 0),
                 2
             )
 
-            current_center = None
+            cx = int((x1 + x2) / 2)
+            cy = int((y1 + y2) / 2)
+            current_center = (cx, cy)
 
-            if 0 in det:
-                x1, y1, x2, y2 = det[0]
+            cv2.circle(frame, current_center, 5, (0, 0, 255), -1)
+
+            if prev_center is not None:
+                dx = cx - prev_center[0]
+                dy = cy - prev_center[1]
+                pixel_dist = math.sqrt(dx * dx + dy * dy)
+
+                speed_kmh = pixel_dist * PIXELS_TO_METERS * fps * 3.6
+
+                cv2.putText(
+                    frame,
+                    f"{speed_kmh:.1f} km/h",
+                    (cx + 10, cy - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX,
+                    0.5,
+                    (255, 255, 0),
+                    2
+                )
 
-                cv2.rectangle(
+                cv2.line(
                     frame,
-                    (int(x1), int(y1)),
-                    (int(x2), int(y2)),
-                    (0, 255, 0),
+                    prev_center,
+                    current_center,
+                    (255, 0, 255),
                     2
                 )
 
-                cx = int((x1 + x2) / 2)
-                cy = int((y1 + y2) / 2)
-                current_center = (cx, cy)
-
-                cv2.circle(frame, current_center, 5, (0, 0, 255), -1)
-
-                if prev_center is not None:
-                    dx = cx - prev_center[0]
-                    dy = cy - prev_center[1]
-                    pixel_dist = math.sqrt(dx * dx + dy * dy)
-
-                    speed_kmh = pixel_dist * PIXELS_TO_METERS * fps * 3.6
-
-                    cv2.putText(
-                        frame,
-                        f"{speed_kmh:.1f} km/h",
-                        (cx + 10, cy - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.5,
-                        (255, 255, 0),
-                        2
-                    )
-
-                    cv2.line(
-                        frame,
-                        prev_center,
-                        current_center,
-                        (255, 0, 255),
-                        2
-                    )
-
-            prev_center = current_center
-            output_frames.append(frame)
-
-        return output_frames
\ No newline at end of file
+        return current_center
@@ -0,0 +1,104 @@
+import cv2
+import numpy as np
+import pytest
+
+from badminton_model.tracker.adaptive_sampler import AdaptiveSampler
+from badminton_model.tracker.shuttle_tracker import ShuttleTracker
+
+MISS = [np.nan] * 4
+
+
+def _box(x, y=100):
+    return [x, y, x + 10, y + 10]
+
+
+def test_base_stride_during_normal_play():
+    sampler = AdaptiveSampler()
+    assert sampler.update(0, _box(100)) == 3
+    assert sampler.update(3, _box(106)) == 3
+    assert sampler.update(6, _box(112)) == 3
+
+
+def test_sparse_after_consecutive_misses_and_back():
+    sampler = AdaptiveSampler(idle_samples=2)
+    assert sampler.update(0, MISS) == 3
+    assert sampler.update(3, MISS) == 12
+    assert sampler.update(15, _box(100)) == 3
+
+
+def test_sparse_while_the_shuttle_is_stationary():
+    sampler = AdaptiveSampler(idle_samples=2)
+    for frame in (0, 3, 6):
+        stride = sampler.update(frame, _box(100))
+    assert stride == 12
+
+
+def test_fast_shot_turns_dense_for_dense_frames():
+    sampler = AdaptiveSampler(fast_speed=12.0, dense_frames=9)
+    sampler.update(0, _box(100))
+    assert sampler.update(3, _box(160)) == 1      # 20 px/frame
+    assert sampler.dense_until == 12
+    x = 160
+    for frame in range(4, 12):
+        x += 2
+        assert sampler.update(frame, _box(x)) == 1
+    assert sampler.update(12, _box(x + 2)) == 3
+
+
+def test_sharp_turn_triggers_dense_sampling():
+    sampler = AdaptiveSampler(turn_angle=60.0)
+    sampler.update(0, _box(100))
+    sampler.update(3, _box(115))                   # 5 px/frame to the right
+    assert sampler.update(6, _box(100)) == 1       # straight back
+
+
+def test_reset_forgets_the_previous_video():
+    sampler = AdaptiveSampler()
+    sampler.update(0, _box(100))
+    sampler.update(3, _box(160))
+    sampler.reset()
+    assert sampler.stride == 3 and sampler.dense_until == -1
+
+
+def test_batch_limit_ends_dense_batches_with_the_window():
+    sampler = AdaptiveSampler(dense_frames=9)
+    assert sampler.batch_limit(0, 16) == 16
+    sampler.extend_dense(20)
+    assert sampler.stride == 1
+    assert sampler.batch_limit(21, 16) == 8
+    assert sampler.batch_limit(29, 16) == 1        # stale dense stride: one sample re-decides
+
+
+class _ScriptedTracker(ShuttleTracker):
+    """detect_batch replays a scripted track: moving right, then a hit at frame 60"""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+
+    def detect_batch(self, frames, roi=None, frame_indices=None):
+        xs = [100 + 5 * i if i < 60 else 400 - 5 * (i - 60) for i in frame_indices]
+        return np.array([_box(x) for x in xs], dtype=np.float64), np.ones(len(xs))
+
+
+@pytest.fixture(scope="module")
+def clip(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("clips") / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 36))
+    for _ in range(120):
+        writer.write(np.zeros((36, 64, 3), dtype=np.uint8))
+    writer.release()
+    return path
+
+
+@pytest.mark.parametrize("batch_size", [1, 4, 8, 16])
+def test_hit_gets_a_dense_window_whatever_the_batch_size(clip, batch_size):
+    tracker = _ScriptedTracker(batch_size)
+    frames = [i for i, _, _, _ in tracker.iter_adaptive(clip, AdaptiveSampler(), end_frame=120, size=None)]
+
+    assert frames == sorted(set(frames))
+    # dense_frames consecutive frames follow the hit (after the batch that saw it)
+    longest = run = 0
+    for step in np.diff([f for f in frames if f > 60]):
+        run = run + 1 if step == 1 else 0
+        longest = max(longest, run)
+    assert longest >= 8
@@ -0,0 +1,102 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from badminton_model.tracker import detection_cache as dc
+from badminton_model.tracker.adaptive_sampler import AdaptiveSampler
+from badminton_model.tracker.detection_cache import DetectionCache, read_params
+from badminton_model.tracker.roi_search import RoiSearch
+from badminton_model.tracker.shuttle_tracker import ShuttleTracker
+from badminton_model.utils.trajectory import Trajectory
+
+
+def _write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DetectionCache(str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def files(tmp_path):
+    return SimpleNamespace(
+        video=_write(tmp_path / "match.mp4", b"video bytes"),
+        model=_write(tmp_path / "best.pt", b"weights"),
+    )
+
+
+def _tracker_key(cache, video, model, conf=0.10, backend="torch", int8=False, **kwargs):
+    tracker = SimpleNamespace(model_path=model, conf=conf, backend=backend, int8=int8)
+    return ShuttleTracker.cache_key(tracker, cache, video, **kwargs)
+
+
+def test_key_is_content_addressed(cache, files, tmp_path):
+    copy = _write(tmp_path / "copy.mp4", b"video bytes")
+    other = _write(tmp_path / "other.mp4", b"other video")
+    key = cache.make_key(files.video, files.model, stride=3)
+
+    assert cache.make_key(copy, files.model, stride=3) == key
+    assert cache.make_key(other, files.model, stride=3) != key
+    assert cache.make_key(files.video, _write(tmp_path / "new.pt", b"new weights"), stride=3) != key
+
+
+def test_default_read_params_share_a_key(cache, files):
+    omitted = _tracker_key(cache, files.video, files.model, stride=3)
+    explicit = _tracker_key(cache, files.video, files.model, stride=3, max_frames=None,
+                            start_frame=None, size=(640, 360))
+    assert omitted == explicit
+    assert read_params(size=(640, 360)) == read_params()
+
+
+@pytest.mark.parametrize("change", [
+    {"stride": 2},
+    {"max_frames": 100},
+    {"size": (1280, 720)},
+    {"conf": 0.25},
+    {"backend": "onnx"},
+    {"sampler": AdaptiveSampler()},
+    {"roi": RoiSearch()},
+])
+def test_every_setting_is_part_of_the_key(cache, files, change):
+    base = _tracker_key(cache, files.video, files.model, stride=3)
+    assert _tracker_key(cache, files.video, files.model, **{"stride": 3, **change}) != base
+
+
+def test_key_version_invalidates_old_entries(cache, files, monkeypatch):
+    key = cache.make_key(files.video, files.model, stride=3)
+    monkeypatch.setattr(dc, "KEY_VERSION", dc.KEY_VERSION + 1)
+    assert cache.make_key(files.video, files.model, stride=3) != key
+
+
+def test_rewritten_file_gets_a_new_digest(cache, files):
+    before = cache.file_digest(files.video)
+    _write(files.video, b"VIDEO BYTES")
+    stat = os.stat(files.video)
+    os.utime(files.video, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert cache.file_digest(files.video) != before
+
+
+def test_digest_memo_is_bounded(cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(dc, "DIGEST_MEMO_SIZE", 2)
+    paths = [_write(tmp_path / f"clip{i}.mp4", bytes([i])) for i in range(4)]
+    for path in paths:
+        cache.file_digest(path)
+    assert len(cache._digests) == 2
+    assert [key[0] for key in cache._digests] == [os.path.abspath(p) for p in paths[2:]]
+
+
+def test_entry_round_trip(cache, files):
+    key = cache.make_key(files.video, files.model, stride=3)
+    assert cache.get(key) is None
+
+    boxes = np.array([[1, 2, 3, 4], [np.nan] * 4, [5, 6, 7, 8]], dtype=np.float64)
+    cache.put(key, Trajectory.from_boxes(boxes, frames=np.array([2, 5, 8])))
+    cached = cache.get(key)
+    assert np.array_equal(cached.frames, [2, 5, 8])
+    assert np.array_equal(cached.boxes, boxes.astype(cached.boxes.dtype), equal_nan=True)
@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from badminton_model.tracker.inference_backend import BACKENDS, check_parity, compare_backends
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+MODEL_PATH = os.path.join(REPO_DIR, "badminton_model", "train", "shuttle_output", "models", "weights", "best.pt")
+# 48 frames of match footage, so the backends have real shuttles to agree on
+CLIP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "rally_640x360_48f.mp4")
+
+
+def _stats(**overrides):
+    stats = {"fps": 10.0, "detections": 100, "agreement": 1.0, "count_diff": 0.0,
+             "mean_iou": 0.99, "max_conf_diff": 0.01, "max_center_error_px": 0.5}
+    stats.update(overrides)
+    return stats
+
+
+def test_check_parity_passes_within_tolerance():
+    report = {"torch": {"fps": 5.0, "detections": 100}, "onnx": _stats(), "openvino": _stats()}
+    assert check_parity(report) == []
+
+
+@pytest.mark.parametrize("field, value", [
+    ("agreement", 0.9),
+    ("count_diff", 0.1),
+    ("mean_iou", 0.5),
+    ("max_conf_diff", 0.2),
+])
+def test_check_parity_flags_divergence(field, value):
+    report = {"torch": {"fps": 5.0, "detections": 100}, "onnx": _stats(**{field: value})}
+    failures = check_parity(report)
+    assert len(failures) == 1 and failures[0].startswith("onnx:")
+
+
+def test_check_parity_skips_box_checks_without_common_detections():
+    report = {"torch": {"fps": 5.0, "detections": 0},
+              "onnx": _stats(detections=0, mean_iou=None, max_conf_diff=None)}
+    assert check_parity(report) == []
+
+
+@pytest.mark.skipif(not os.path.isfile(MODEL_PATH), reason="shuttle weights not available")
+@pytest.mark.skipif(not os.path.isfile(CLIP_PATH), reason="parity clip not available")
+@pytest.mark.parametrize("backend", [b for b in BACKENDS if b != "torch"])
+def test_backend_matches_torch(backend):
+    pytest.importorskip("ultralytics")
+    pytest.importorskip("onnxruntime" if backend == "onnx" else "openvino")
+    from badminton_model.utils import read_video
+
+    frames = read_video(CLIP_PATH, stride=1, max_frames=None)
+    report = compare_backends(MODEL_PATH, frames, backends=(backend,))
+    # check_parity skips the box checks when there is nothing to compare
+    assert report["torch"]["detections"] > 0
+    assert check_parity(report) == []
@@ -1 +1,8 @@
-from .video_utils import read_video, save_video
\ No newline at end of file
+from .video_utils import (
+    read_video, iter_video, iter_video_frames, first_sample, iter_live_video, is_stream_source, iter_batches, save_video,
+    get_video_info, VideoReader, FRAME_SIZE
+)
+from .bbox_utils import detections_to_boxes, boxes_to_detections, interpolate_boxes, StreamingInterpolator
+from .trajectory import Trajectory, TRAJECTORY_DTYPE
+from .pipeline import Pipeline
+from .profiler import SamplingProfiler, carry_profiler
@@ -0,0 +1,182 @@
+import numpy as np
+
+
+def detections_to_boxes(detections, track_id=0):
+    """
+    Convert [{track_id: [x1, y1, x2, y2]}, ...] into an (N, 4) float array,
+    with NaN rows for frames where `track_id` was not detected.
+    """
+    boxes = np.full((len(detections), 4), np.nan)
+    for i, det in enumerate(detections):
+        if track_id in det:
+            boxes[i] = det[track_id]
+    return boxes
+
+
+def boxes_to_detections(boxes, track_id=0):
+    """Inverse of detections_to_boxes: NaN rows become empty dicts"""
+    valid = ~np.isnan(boxes).any(axis=1)
+    return [{track_id: box} if ok else {} for ok, box in zip(valid.tolist(), boxes.tolist())]
+
+
+def missing_runs(valid):
+    """(start, length) arrays of the runs of False in a boolean mask"""
+    edges = np.diff(np.concatenate(([0], (~valid).astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    return starts, np.flatnonzero(edges == -1) - starts
+
+
+def gap_spans(positions, starts, lengths):
+    """
+    Length of each missing run measured in `positions` units: the distance
+    between the known samples around it (minus one), or to the first / last
+    sample for a leading / trailing run. Equals the run length for 0..N-1.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    n = len(positions)
+    ends = starts + lengths
+    before = positions[np.maximum(starts - 1, 0)]
+    after = positions[np.minimum(ends, n - 1)]
+    return np.where(
+        starts == 0, after - positions[0],
+        np.where(ends == n, positions[n - 1] - before, after - before - 1)
+    )
+
+
+def interpolate_boxes(boxes, max_gap=None, positions=None):
+    """
+    Fill missing rows of an (N, 4) box array by linear interpolation.
+
+    Args:
+        boxes: (N, 4) array, NaN rows = missed detections
+        max_gap: Only fill runs of at most this many missing frames; longer
+            runs stay NaN so they remain true misses. None fills everything.
+        positions: Optional (N,) increasing sample positions (e.g. frame
+            indices of an unevenly sampled video) to interpolate over;
+            defaults to 0..N-1. max_gap is then measured in position units
+            (see gap_spans), i.e. in time rather than in rows.
+
+    Returns:
+        New (N, 4) array. Gaps between detections are linearly interpolated,
+        gaps before the first / after the last detection hold that box.
+    """
+    boxes = np.array(boxes, dtype=np.float64)
+    valid = ~np.isnan(boxes).any(axis=1)
+    if valid.all() or not valid.any():
+        return boxes
+
+    fill = ~valid
+    if max_gap is not None:
+        # every missing frame learns the length of the run it belongs to
+        starts, lengths = missing_runs(valid)
+        spans = lengths if positions is None else gap_spans(positions, starts, lengths)
+        fill[fill] = np.repeat(spans <= max_gap, lengths)
+
+    if fill.any():
+        known = np.flatnonzero(valid)
+        targets = np.flatnonzero(fill)
+        xp, x = known, targets
+        if positions is not None:
+            positions = np.asarray(positions)
+            xp, x = positions[known], positions[targets]
+        for col in range(4):
+            boxes[targets, col] = np.interp(x, xp, boxes[known, col])
+
+    return boxes
+
+
+class StreamingInterpolator:
+    """
+    Incremental version of interpolate_boxes(boxes, max_gap) for pipelines.
+
+    Items are pushed in frame order with their box (NaN = miss) and, for
+    unevenly sampled input, their position; they come out in the same order
+    with the box interpolate_boxes would have produced.
+    Items are only held back while their gap could still be short enough to
+    fill (at most max_gap position units), so memory stays bounded.
+    """
+
+    def __init__(self, max_gap):
+        self.max_gap = max_gap
+        self._last = None      # last real box
+        self._last_pos = None  # its position
+        self._pending = []     # items held inside the current gap
+        self._positions = []   # their positions
+        self._first_pos = None  # position of the first item
+        self._count = 0        # default position of the next item
+
+    def push(self, item, box, position=None):
+        """Feed one item; returns the list of (item, box) pairs now final"""
+        box = np.asarray(box, dtype=np.float64)
+        if position is None:
+            position = self._count
+        self._count += 1
+        if self._first_pos is None:
+            self._first_pos = position
+
+        if np.isnan(box).any():
+            if self.max_gap is not None and self._too_long(position):
+                # gap is too long to ever be filled: release everything as misses
+                out = [(held, _nan_box()) for held in self._pending] + [(item, _nan_box())]
+                self._pending = []
+                self._positions = []
+                return out
+            self._pending.append(item)
+            self._positions.append(position)
+            return []
+
+        out = []
+        if self._pending and self.max_gap is not None and self._span(position) > self.max_gap:
+            out = [(held, _nan_box()) for held in self._pending]
+        elif self._pending:
+            if self._last is None:
+                # leading gap: held at the first box, like a backward fill
+                out = [(held, box.copy()) for held in self._pending]
+            else:
+                # interior gap: same arithmetic as np.interp
+                slope = (box - self._last) / (position - self._last_pos)
+                out = [(held, slope * (pos - self._last_pos) + self._last)
+                       for held, pos in zip(self._pending, self._positions)]
+        out.append((item, box))
+
+        self._pending = []
+        self._positions = []
+        self._last = box
+        self._last_pos = position
+        return out
+
+    def finish(self):
+        """Flush the trailing gap (held at the last box, like a forward fill)"""
+        fill = self._last if self._last is not None else _nan_box()
+        if (self._pending and self._last is not None and self.max_gap is not None
+                and self._positions[-1] - self._last_pos > self.max_gap):
+            fill = _nan_box()
+        out = [(held, fill.copy()) for held in self._pending]
+        self._pending = []
+        self._positions = []
+        return out
+
+    def _span(self, position):
+        """gap_spans of the pending gap if a box arrives at `position`"""
+        if self._last is None:
+            return position - self._first_pos
+        return position - self._last_pos - 1
+
+    def _too_long(self, position):
+        """True once a miss at `position` proves the current gap can't be filled"""
+        if self._last is None:
+            return position - self._first_pos >= self.max_gap
+        return position - self._last_pos - 1 >= self.max_gap
+
+    def feed(self, items):
+        """
+        Generator form: iterate (item, box) or (item, box, position) tuples,
+        yield final (item, box) pairs
+        """
+        for item, box, *position in items:
+            yield from self.push(item, box, *position)
+        yield from self.finish()
+
+
+def _nan_box():
+    return np.full(4, np.nan)
@@ -0,0 +1,176 @@
+"""
+Threaded stage pipeline with bounded queues.
+
+Each stage runs in its own thread and talks to its neighbours through a
+bounded queue, so e.g. OpenCV decode/encode overlaps with YOLO inference and
+end-to-end time approaches the slowest stage instead of the sum of all
+stages. Memory stays bounded by the queue sizes.
+"""
+import queue
+import threading
+import time
+
+from .profiler import carry_profiler
+
+_DONE = object()
+_POLL = 0.1  # seconds between checks of the abort flag while blocked
+
+
+class PipelineAborted(Exception):
+    """Raised inside a stage when another stage failed"""
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.total_time = 0.0
+        self.starved_time = 0.0   # waiting for input
+        self.blocked_time = 0.0   # waiting for room downstream
+        self.depth_sum = 0
+        self.depth_max = 0
+        self.depth_samples = 0
+
+    @property
+    def busy_time(self):
+        return max(self.total_time - self.starved_time - self.blocked_time, 0.0)
+
+    def to_dict(self):
+        return {
+            "items": self.items,
+            "busy_sec": round(self.busy_time, 4),
+            "starved_sec": round(self.starved_time, 4),
+            "blocked_sec": round(self.blocked_time, 4),
+            "wall_sec": round(self.total_time, 4),
+            "input_queue_avg": round(self.depth_sum / self.depth_samples, 2) if self.depth_samples else 0,
+            "input_queue_max": self.depth_max,
+        }
+
+
+class _QueueReader:
+    """Iterates an input queue until the upstream stage signals completion"""
+
+    def __init__(self, q, stats, abort):
+        self.q = q
+        self.stats = stats
+        self.abort = abort
+
+    def __iter__(self):
+        while True:
+            depth = self.q.qsize()
+            self.stats.depth_sum += depth
+            self.stats.depth_max = max(self.stats.depth_max, depth)
+            self.stats.depth_samples += 1
+
+            start = time.perf_counter()
+            while True:
+                try:
+                    item = self.q.get(timeout=_POLL)
+                    break
+                except queue.Empty:
+                    if self.abort.is_set():
+                        raise PipelineAborted()
+            self.stats.starved_time += time.perf_counter() - start
+
+            if item is _DONE:
+                return
+            yield item
+
+
+class Pipeline:
+    """
+    Args:
+        source: Iterable feeding the first queue (runs in its own thread)
+        stages: List of (name, fn); fn receives an iterable of the previous
+            stage's items and returns an iterable of its own (a generator).
+            A sink stage can simply consume its input and return ().
+        queue_size: Capacity of every queue between stages
+        source_name: Stage name reported for the source thread
+    """
+
+    def __init__(self, source, stages, queue_size=8, source_name="decode"):
+        self.source = source
+        self.stages = stages
+        self.queue_size = queue_size
+        self.source_name = source_name
+        self.stats = {}
+
+    def run(self):
+        """
+        Run every stage to completion.
+
+        Returns:
+            list: Items produced by the last stage (empty for a sink)
+        """
+        abort = threading.Event()
+        errors = []
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        results = []
+
+        names = [self.source_name] + [name for name, _ in self.stages]
+        self.stats = {name: StageStats(name) for name in names}
+
+        def put(q, item, stats):
+            start = time.perf_counter()
+            while True:
+                try:
+                    q.put(item, timeout=_POLL)
+                    break
+                except queue.Full:
+                    if abort.is_set():
+                        raise PipelineAborted()
+            stats.blocked_time += time.perf_counter() - start
+
+        def worker(name, produce, out_q):
+            stats = self.stats[name]
+            start = time.perf_counter()
+            try:
+                for item in produce():
+                    stats.items += 1
+                    if out_q is None:
+                        results.append(item)
+                    else:
+                        put(out_q, item, stats)
+            except PipelineAborted:
+                pass
+            except BaseException as e:
+                errors.append(e)
+                abort.set()
+            finally:
+                stats.total_time = time.perf_counter() - start
+                if out_q is not None:
+                    try:
+                        put(out_q, _DONE, stats)
+                    except PipelineAborted:
+                        pass
+
+        # Stage threads are profiled along with the thread running the pipeline
+        worker = carry_profiler(worker)
+        threads = [threading.Thread(
+            target=worker,
+            args=(self.source_name, lambda: iter(self.source), queues[0] if queues else None),
+            name=f"pipeline-{self.source_name}",
+            daemon=True
+        )]
+        for i, (name, fn) in enumerate(self.stages):
+            reader = _QueueReader(queues[i], self.stats[name], abort)
+            out_q = queues[i + 1] if i + 1 < len(queues) else None
+            threads.append(threading.Thread(
+                target=worker,
+                args=(name, lambda fn=fn, reader=reader: iter(fn(reader)), out_q),
+                name=f"pipeline-{name}",
+                daemon=True
+            ))
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise errors[0]
+        return results
+
+    def report(self):
+        """Per-stage items, busy/starved/blocked time and input queue depth"""
+        return {name: stats.to_dict() for name, stats in self.stats.items()}
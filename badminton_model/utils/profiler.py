@@ -0,0 +1,180 @@
+"""
+Low-overhead sampling profiler for one analysis run.
+
+A background thread wakes every `interval` seconds and records the Python
+stack of the profiled threads from sys._current_frames(): the thread that
+started the profiler plus the threads registered with it. Pipeline stage
+threads register themselves with the profiler of the thread that runs the
+pipeline, and work handed to executor threads (the player-model helper) is
+wrapped with carry_profiler, so concurrent jobs and unrelated threads never
+end up in a job's profile. With profiling off there is no cost at all, and
+with it on the cost is one stack walk per profiled thread per interval.
+
+Stacks are written in the folded ("collapsed") format of flamegraph.pl,
+which speedscope, inferno and most flamegraph viewers read directly:
+
+    pipeline-detect;run (threading.py:982);detect_batch (shuttle_tracker.py:101) 42
+
+Samples whose innermost frame is a blocking wait in threading / queue are
+idle time and are dropped unless idle=True, so the profile shows where CPU
+time went rather than where threads slept.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Innermost frames in these files mean the thread is blocked, not running
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py")
+
+# Thread ident -> profiler sampling that thread
+_active = {}
+_active_lock = threading.Lock()
+
+
+def current_profiler():
+    """The SamplingProfiler sampling the calling thread, or None"""
+    return _active.get(threading.get_ident())
+
+
+def carry_profiler(fn):
+    """
+    Wrap `fn` so that whichever thread runs it is profiled, for the duration
+    of the call, by the profiler of the thread calling carry_profiler (for
+    tasks submitted to executors and helper threads).
+    """
+    profiler = current_profiler()
+    if profiler is None:
+        return fn
+
+    def run(*args, **kwargs):
+        profiler.register()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.unregister()
+    return run
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.005, idle: bool = False):
+        """
+        Args:
+            interval: Seconds between two samples
+            idle: Keep samples of threads blocked in a wait
+        """
+        self.interval = interval
+        self.idle = idle
+        self.stacks = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._threads = set()
+        self._threads_lock = threading.Lock()
+        self._start_time = None
+
+    def start(self):
+        if self._thread is not None:
+            raise RuntimeError("Profiler already started")
+        self.register()
+        self._stop.clear()
+        self._start_time = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is None:
+            return self
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.duration = time.perf_counter() - self._start_time
+        with self._threads_lock:
+            threads, self._threads = self._threads, set()
+        with _active_lock:
+            for ident in threads:
+                if _active.get(ident) is self:
+                    del _active[ident]
+        return self
+
+    def register(self, ident=None):
+        """Sample thread `ident` (default: the calling thread) from now on"""
+        ident = ident or threading.get_ident()
+        with self._threads_lock:
+            self._threads.add(ident)
+        with _active_lock:
+            _active[ident] = self
+
+    def unregister(self, ident=None):
+        """Stop sampling thread `ident` (default: the calling thread)"""
+        ident = ident or threading.get_ident()
+        with self._threads_lock:
+            self._threads.discard(ident)
+        with _active_lock:
+            if _active.get(ident) is self:
+                del _active[ident]
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        names = {}
+        alive = set()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if frames.keys() != alive:
+                # Threads came or went; an exited thread's ident may be reused
+                # by a new thread, which must be sampled under its own name
+                alive = set(frames)
+                names.clear()
+            with self._threads_lock:
+                threads = list(self._threads)
+            for ident in threads:
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                if not self.idle and os.path.basename(frame.f_code.co_filename) in _IDLE_FILES:
+                    continue
+                name = names.get(ident)
+                if name is None:
+                    names.update((t.ident, t.name) for t in threading.enumerate())
+                    name = names.setdefault(ident, str(ident))
+                self.stacks[self._fold(name, frame)] += 1
+            self.samples += 1
+
+    @staticmethod
+    def _fold(thread_name, frame):
+        """Root-first `thread;func (file:line);...` key of one stack"""
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        parts.append(thread_name.replace(";", ":"))
+        return ";".join(reversed(parts))
+
+    def folded(self) -> str:
+        """Profile in the folded stack format, heaviest stacks first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def save(self, path):
+        """Write the folded profile to `path` (temporary file, then renamed)"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.folded())
+        os.replace(tmp_path, path)
+        return path
+
+    def summary(self) -> dict:
+        return {
+            "samples": self.samples,
+            "stacks": len(self.stacks),
+            "interval_ms": round(self.interval * 1000, 3),
+            "duration_sec": round(self.duration, 3),
+        }
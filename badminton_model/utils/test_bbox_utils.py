@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from badminton_model.utils.bbox_utils import StreamingInterpolator, interpolate_boxes
+
+
+def _random_track(rng, n=120, miss_rate=0.3):
+    """Smooth boxes with runs of misses of random length"""
+    x = np.cumsum(rng.normal(0, 8, n)) + 400
+    y = np.cumsum(rng.normal(0, 5, n)) + 200
+    boxes = np.stack([x, y, x + 12, y + 12], axis=1)
+    i = 0
+    while i < n:
+        if rng.random() < miss_rate:
+            run = int(rng.integers(1, 15))
+            boxes[i:i + run] = np.nan
+            i += run
+        i += 1
+    return boxes
+
+
+def _stream(boxes, max_gap, positions=None):
+    interpolator = StreamingInterpolator(max_gap)
+    out, held = [], 0
+    for i, box in enumerate(boxes):
+        position = None if positions is None else positions[i]
+        out += interpolator.push(i, box, position=position)
+        held = max(held, len(interpolator._pending))
+    out += interpolator.finish()
+    assert [item for item, _ in out] == list(range(len(boxes)))
+    return np.array([box for _, box in out]), held
+
+
+@pytest.mark.parametrize("max_gap", [None, 0, 1, 3, 10])
+@pytest.mark.parametrize("seed", range(10))
+def test_streaming_matches_batch_interpolation(seed, max_gap):
+    boxes = _random_track(np.random.default_rng(seed))
+    streamed, held = _stream(boxes, max_gap)
+
+    np.testing.assert_allclose(streamed, interpolate_boxes(boxes, max_gap=max_gap), rtol=1e-12, equal_nan=True)
+    if max_gap is not None:
+        assert held <= max_gap
+
+
+@pytest.mark.parametrize("max_gap", [None, 2, 10])
+@pytest.mark.parametrize("seed", range(10))
+def test_streaming_matches_batch_on_uneven_positions(seed, max_gap):
+    rng = np.random.default_rng(seed)
+    boxes = _random_track(rng)
+    # Adaptive sampling: strides of 1, 3 or 12 source frames, in stride-3 units
+    positions = np.cumsum(rng.choice([1, 3, 12], size=len(boxes))) / 3
+    streamed, _ = _stream(boxes, max_gap, positions=positions)
+
+    expected = interpolate_boxes(boxes, max_gap=max_gap, positions=positions)
+    np.testing.assert_allclose(streamed, expected, rtol=1e-12, equal_nan=True)
+
+
+def test_feed_accepts_positions():
+    boxes = [[0, 0, 10, 10], [np.nan] * 4, [6, 6, 16, 16]]
+    out = list(StreamingInterpolator(None).feed(zip("abc", boxes, [0, 1, 3])))
+    assert [item for item, _ in out] == ["a", "b", "c"]
+    np.testing.assert_allclose(out[1][1], [2, 2, 12, 12])
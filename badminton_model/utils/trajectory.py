@@ -0,0 +1,184 @@
+import numpy as np
+
+from .bbox_utils import interpolate_boxes
+
+# One packed record per frame (35 bytes) instead of a dict + list + floats
+TRAJECTORY_DTYPE = np.dtype([
+    ("frame", np.int32),           # source frame index
+    ("bbox", np.float32, (4,)),    # x1, y1, x2, y2 (NaN = no position)
+    ("center", np.float32, (2,)),  # cx, cy
+    ("conf", np.float32),          # detector confidence (NaN if not detected)
+    ("detected", np.bool_),        # True = model detection, False = miss / interpolated
+    ("track_id", np.int16),
+])
+
+
+class Trajectory:
+    """
+    Columnar per-frame track of a single object (the shuttle), backed by a
+    structured NumPy array.
+
+    Slicing returns a Trajectory that is a view on the same memory. Integer
+    indexing and iteration yield the legacy {track_id: [x1, y1, x2, y2]}
+    dicts, so code written for List[Dict] detections keeps working.
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+    @classmethod
+    def empty(cls, n, frames=None, track_id=0):
+        data = np.zeros(n, dtype=TRAJECTORY_DTYPE)
+        data["frame"] = np.arange(n) if frames is None else frames
+        data["bbox"] = np.nan
+        data["center"] = np.nan
+        data["conf"] = np.nan
+        data["track_id"] = track_id
+        return cls(data)
+
+    @classmethod
+    def from_boxes(cls, boxes, detected=None, conf=None, frames=None, track_id=0):
+        """
+        Args:
+            boxes: (N, 4) array, NaN rows = no position
+            detected: Optional (N,) bool, defaults to "has a box"
+            conf: Optional (N,) confidences
+            frames: Optional (N,) source frame indices, defaults to 0..N-1
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        traj = cls.empty(len(boxes), frames=frames, track_id=track_id)
+        data = traj.data
+        data["bbox"] = boxes
+        data["center"][:, 0] = (boxes[:, 0] + boxes[:, 2]) / 2
+        data["center"][:, 1] = (boxes[:, 1] + boxes[:, 3]) / 2
+        data["detected"] = ~np.isnan(boxes[:, 0]) if detected is None else detected
+        if conf is not None:
+            data["conf"] = conf
+        return traj
+
+    @classmethod
+    def from_detections(cls, detections, frames=None, track_id=0):
+        """Build from the legacy [{track_id: [x1, y1, x2, y2]}, ...] format"""
+        if isinstance(detections, Trajectory):
+            return detections
+        boxes = np.full((len(detections), 4), np.nan)
+        for i, det in enumerate(detections):
+            if track_id in det:
+                boxes[i] = det[track_id]
+        return cls.from_boxes(boxes, frames=frames, track_id=track_id)
+
+    @classmethod
+    def concatenate(cls, trajectories):
+        trajectories = list(trajectories)
+        if not trajectories:
+            return cls.empty(0)
+        return cls(np.concatenate([t.data for t in trajectories]))
+
+    # ------------------------------------------------------------------
+    # Column views (no copies)
+    # ------------------------------------------------------------------
+    @property
+    def frames(self):
+        return self.data["frame"]
+
+    @property
+    def boxes(self):
+        return self.data["bbox"]
+
+    @property
+    def centers(self):
+        return self.data["center"]
+
+    @property
+    def conf(self):
+        return self.data["conf"]
+
+    @property
+    def detected(self):
+        return self.data["detected"]
+
+    @property
+    def track_ids(self):
+        return self.data["track_id"]
+
+    @property
+    def valid(self):
+        """Frames that have a position (detected or interpolated)"""
+        return ~np.isnan(self.data["center"][:, 0])
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    # ------------------------------------------------------------------
+    # Operations
+    # ------------------------------------------------------------------
+    def sample_positions(self):
+        """
+        Frame indices in units of the finest sampling step (0, 1, 2... for a
+        fixed stride), so unevenly sampled tracks interpolate over real time
+        """
+        frames = self.frames.astype(np.int64)
+        if len(frames) < 2:
+            return np.arange(len(frames))
+        step = np.gcd.reduce(np.diff(frames))
+        return (frames - frames[0]) // step if step > 0 else np.arange(len(frames))
+
+    def interpolate(self, max_gap=None, frame_step=None):
+        """
+        New Trajectory with missing boxes filled (see interpolate_boxes).
+
+        Gaps are measured along the sampled frames, so an unevenly sampled
+        track is filled over real time. max_gap counts steps of `frame_step`
+        source frames (default: the finest stride in the track).
+        """
+        positions = self.sample_positions()
+        if frame_step is not None and len(self):
+            positions = (self.frames.astype(np.float64) - self.frames[0]) / frame_step
+        boxes = interpolate_boxes(self.boxes.astype(np.float64), max_gap=max_gap,
+                                  positions=positions)
+        traj = Trajectory.from_boxes(boxes, detected=self.detected, conf=self.conf,
+                                     frames=self.frames)
+        traj.data["track_id"] = self.track_ids
+        return traj
+
+    def detections_only(self):
+        """New Trajectory keeping only model detections (interpolated boxes become NaN)"""
+        traj = Trajectory(self.data.copy())
+        missed = ~traj.data["detected"]
+        traj.data["bbox"][missed] = np.nan
+        traj.data["center"][missed] = np.nan
+        return traj
+
+    def to_detections(self):
+        """Legacy List[Dict] form"""
+        return list(self)
+
+    # ------------------------------------------------------------------
+    # Sequence protocol (legacy dict adapter)
+    # ------------------------------------------------------------------
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            row = self.data[key]
+            if np.isnan(row["bbox"][0]):
+                return {}
+            return {int(row["track_id"]): row["bbox"].astype(np.float64).tolist()}
+        return Trajectory(self.data[key])
+
+    def __iter__(self):
+        valid = self.valid.tolist()
+        ids = self.track_ids.tolist()
+        boxes = self.boxes.astype(np.float64).tolist()
+        for ok, track_id, box in zip(valid, ids, boxes):
+            yield {track_id: box} if ok else {}
+
+    def __repr__(self):
+        return f"Trajectory(frames={len(self)}, detected={int(self.detected.sum())})"
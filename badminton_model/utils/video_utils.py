@@ -1,51 +1,288 @@
+import time
+
 import cv2
 
-def read_video(video_path):
+FRAME_SIZE = (640, 360)   # (width, height) every stage works in
+
+
+def get_video_info(video_path):
+    """Return fps, frame count and native size of a video without decoding it."""
+    cap = cv2.VideoCapture(video_path)
+    info = {
+        "fps": cap.get(cv2.CAP_PROP_FPS) or 30.0,
+        "frame_count": int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+    }
+    cap.release()
+    return info
+
+
+def first_sample(stride=1, start=0):
+    """
+    Source frame of the first sample iter_video yields when reading from
+    `start`. As in the original reader, the last frame of every group of
+    `stride` is kept: frames 2, 5, 8... at stride 3.
+    """
+    return (start or 0) + stride - 1
+
+
+def iter_video(video_path, stride=1, max_frames=None, start_sec=None, end_sec=None, size=FRAME_SIZE,
+               start_frame=None, end_frame=None):
+    """
+    Lazily decode a video one frame at a time.
+
+    Args:
+        video_path: Path to the source video
+        stride: Keep every `stride`-th frame, the last of each group (see
+            first_sample); skipped frames are grabbed, not decoded
+        max_frames: Stop after yielding this many frames (None = no limit)
+        start_sec / end_sec: Only yield frames inside this time window
+        size: (width, height) to resize to, or None to keep the native size
+        start_frame / end_frame: Frame-accurate alternative to start_sec / end_sec
+
+    Yields:
+        BGR frames as numpy arrays, so peak memory is one frame regardless of length
+    """
     cap = cv2.VideoCapture(video_path)
-    frames = []
-    FRAME_SKIP = 3        # analyze every 3rd frame
-    MAX_FRAMES = 900      # hard limit (30 sec @ 30fps)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+    first, last = start_frame or 0, end_frame
+    if start_frame is None and start_sec:
+        first = int(round(start_sec * fps))
+    if end_frame is None and end_sec is not None:
+        last = int(round(end_sec * fps))
+    if first > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
 
-    frame_count = 0
+    frame_idx = first
+    yielded = 0
 
-    while cap.isOpened():
-        ret, frame = cap.read()
+    try:
+        while cap.isOpened():
+            if last is not None and frame_idx >= last:
+                break
+            if max_frames is not None and yielded >= max_frames:
+                break
+
+            if (frame_idx - first) % stride != stride - 1:
+                # grab() advances without the colour conversion / copy of read()
+                if not cap.grab():
+                    break
+                frame_idx += 1
+                continue
+
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frame_idx += 1
+
+            if size is not None and (frame.shape[1], frame.shape[0]) != tuple(size):
+                frame = cv2.resize(frame, size)
+
+            yielded += 1
+            yield frame
+    finally:
+        cap.release()
+
+
+class VideoReader:
+    """
+    Sequential reader that can jump forward to any frame index, for callers
+    that choose the next frame on the fly (adaptive sampling). Frames in
+    between are grabbed, not decoded into BGR arrays.
+    """
+
+    def __init__(self, video_path, size=FRAME_SIZE, start_frame=0):
+        self.cap = cv2.VideoCapture(video_path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.size = size
+        self.position = start_frame or 0   # index of the next frame the capture returns
+        if self.position > 0:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.position)
+
+    def read(self, frame_idx):
+        """
+        Return frame `frame_idx` (>= every index read before), or None at the
+        end of the video.
+        """
+        if frame_idx < self.position:
+            raise ValueError(f"VideoReader only moves forward ({frame_idx} < {self.position})")
+
+        while self.position < frame_idx:
+            if not self.cap.grab():
+                return None
+            self.position += 1
+
+        ret, frame = self.cap.read()
         if not ret:
-            break
+            return None
+        self.position += 1
+
+        if self.size is not None and (frame.shape[1], frame.shape[0]) != tuple(self.size):
+            frame = cv2.resize(frame, self.size)
+        return frame
 
-        frame_count += 1
-        if frame_count > MAX_FRAMES:
-            break
+    def release(self):
+        self.cap.release()
 
-        if frame_count % FRAME_SKIP != 0:
-            continue
+    def __enter__(self):
+        return self
 
-        # resize BEFORE detection
-        frame = cv2.resize(frame, (640, 360))
+    def __exit__(self, *exc):
+        self.release()
 
-        frames.append(frame)
 
-    cap.release()  # ✅ FIXED: Moved outside the loop
-    return frames  # ✅ FIXED: Moved outside the loop
+def iter_video_frames(video_path, frame_indices, size=FRAME_SIZE):
+    """Lazily decode the given (increasing) frame indices of a video"""
+    with VideoReader(video_path, size=size) as reader:
+        for frame_idx in frame_indices:
+            frame = reader.read(int(frame_idx))
+            if frame is None:
+                return
+            yield frame
 
 
-def save_video(frames, ori_video_path, output_video_path):
+def is_stream_source(source):
+    """True for camera indices and network URLs (rtsp://, http://...), False for files"""
+    return isinstance(source, int) or "://" in str(source)
+
+
+def iter_live_video(source, stride=1, size=FRAME_SIZE, poll_interval=0.2, idle_timeout=10.0, stop=None,
+                    on_open=None):
+    """
+    Decode a source that is still being produced: a file that is being
+    appended to, or a live stream.
+
+    At the end of a growing file the capture is reopened every
+    `poll_interval` seconds and resumes at the next frame. The newest frame
+    of a file may be cut off mid-write, so it is only handed out once the
+    frame after it decodes (or once the file stopped growing). Streams are
+    reconnected when they drop.
+
+    Note: mp4 files keep their index at the end and only become readable
+    once complete; growing files need an append-friendly container (AVI /
+    MJPEG, MPEG-TS, Matroska, fragmented mp4).
+
+    Args:
+        source: File path, stream URL or camera index
+        stride: Keep every `stride`-th frame, as iter_video (others are grabbed, not decoded)
+        size: (width, height) to resize to, or None
+        poll_interval: Seconds between checks for new data
+        idle_timeout: Stop after this long without a new frame
+        stop: Optional threading.Event that ends the iteration
+        on_open: Optional callable(fps) called whenever the capture opens,
+            with the frame rate the source reports (0 when unknown)
+
+    Yields:
+        (frame_idx, frame) with frame_idx counted from the start of the source
+    """
+    stream = is_stream_source(source)
+    cap = None
+    pos = 0          # index of the next frame the capture returns
+    frontier = 0     # frames read at least once; re-reads are not new data
+    held = None      # a file's newest frame, until the next one proves it complete
+    last_data = time.monotonic()
+
+    def wait():
+        if stop is not None:
+            stop.wait(poll_interval)
+        else:
+            time.sleep(poll_interval)
+
+    try:
+        while stop is None or not stop.is_set():
+            if cap is None:
+                cap = cv2.VideoCapture(source)
+                if cap.isOpened() and not stream and pos > 0:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, pos)
+                    if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != pos:
+                        # Seeking past the data written so far; try again later
+                        cap.release()
+                if not cap.isOpened():
+                    cap = None
+                    if time.monotonic() - last_data > idle_timeout:
+                        break
+                    wait()
+                    continue
+                if on_open is not None:
+                    on_open(cap.get(cv2.CAP_PROP_FPS))
+
+            if pos % stride == stride - 1:
+                ok, frame = cap.read()
+            else:
+                ok, frame = cap.grab(), None
+
+            if ok:
+                if pos >= frontier:
+                    frontier = pos + 1
+                    last_data = time.monotonic()
+                if held is not None:
+                    yield held
+                    held = None
+                if frame is not None:
+                    if size is not None and (frame.shape[1], frame.shape[0]) != tuple(size):
+                        frame = cv2.resize(frame, size)
+                    if stream:
+                        yield pos, frame
+                    else:
+                        held = (pos, frame)
+                pos += 1
+                continue
+
+            # End of the data so far (or the stream dropped)
+            cap.release()
+            cap = None
+            if time.monotonic() - last_data > idle_timeout:
+                break
+            if held is not None:
+                # Re-read it after reopening, it may have been cut off
+                pos = held[0]
+                held = None
+            wait()
+
+        if held is not None:
+            yield held
+    finally:
+        if cap is not None:
+            cap.release()
+
+
+def iter_batches(frames, batch_size):
+    """Group any iterable of frames into lists of up to `batch_size` frames."""
+    batch = []
+    for frame in frames:
+        batch.append(frame)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def read_video(video_path, stride=3, max_frames=300, **kwargs):
+    """Eager wrapper around `iter_video` for callers that need a list of frames."""
+    return list(iter_video(video_path, stride=stride, max_frames=max_frames, **kwargs))
+
+
+def save_video(frames, ori_video_path, output_video_path, size=FRAME_SIZE):
+    """
+    Encode frames to mp4. `frames` may be any iterable (list or generator),
+    frames are written as they arrive so nothing is buffered here.
+    """
     cap = cv2.VideoCapture(ori_video_path)
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    
-    # ✅ Use resized dimensions (640x360) to match processed frames
-    out = cv2.VideoWriter(output_video_path, fourcc, fps, (640, 360))
+
+    out = cv2.VideoWriter(output_video_path, fourcc, fps, size)
 
     # Writing frames onto output video
     for frame in frames:
         out.write(frame)
-    
-    cap.release()
+
     out.release()
 
 
 def convert_meters_to_pixels(frames):
-    pass
\ No newline at end of file
+    pass
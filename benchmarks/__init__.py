@@ -0,0 +1,7 @@
+"""
+End-to-end benchmarks of the analysis pipeline on synthetic clips.
+
+    python -m benchmarks.run                      # blob stand-in model, CPU, offline
+    python -m benchmarks.run --model path/to/best.pt --backend onnx
+    python -m benchmarks.compare before.json after.json
+"""
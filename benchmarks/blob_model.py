@@ -0,0 +1,49 @@
+"""
+Tiny stand-in for the shuttle model.
+
+Finds the synthetic shuttle (the brightest small blob) with a threshold and
+connected components. It has the detect_batch interface of ShuttleTracker,
+so the rest of the pipeline runs unchanged, needs no weights, torch or
+Ultralytics, and returns real detections for interpolation and analysis.
+Its cost is far below a YOLO forward pass; benchmark with --model to
+measure detection itself.
+"""
+import cv2
+import numpy as np
+
+from badminton_model.utils import FRAME_SIZE
+
+
+class BlobDetector:
+    def __init__(self, batch_size: int = 8, threshold: int = 240, max_area: int = 2500):
+        """
+        Args:
+            batch_size: Frames per detect_batch call, as ShuttleTracker
+            threshold: Grey level a shuttle pixel must exceed
+            max_area: Larger bright regions are not a shuttle
+        """
+        self.batch_size = batch_size
+        self.threshold = threshold
+        self.max_area = max_area
+
+    def warmup(self, size=FRAME_SIZE):
+        width, height = size
+        self.detect_batch([np.zeros((height, width, 3), dtype=np.uint8)])
+
+    def detect_batch(self, frames, roi=None, frame_indices=None):
+        """(boxes, conf) as ShuttleTracker.detect_batch; `roi` is ignored"""
+        boxes = np.full((len(frames), 4), np.nan)
+        conf = np.full(len(frames), np.nan)
+        for i, frame in enumerate(frames):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            _, mask = cv2.threshold(gray, self.threshold, 255, cv2.THRESH_BINARY)
+            n, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+            # Label 0 is the background
+            areas = stats[1:, cv2.CC_STAT_AREA]
+            candidates = np.flatnonzero(areas <= self.max_area)
+            if n < 2 or len(candidates) == 0:
+                continue
+            x, y, w, h, _ = stats[1 + candidates[np.argmax(areas[candidates])]]
+            boxes[i] = (x, y, x + w, y + h)
+            conf[i] = 1.0
+        return boxes, conf
@@ -0,0 +1,94 @@
+"""
+Diff two benchmark result files.
+
+    python -m benchmarks.compare results/before.json results/after.json --threshold 10
+
+Prints the change in frames/sec and p95 latency of every stage of every
+case both runs have. Exits with status 1 if a stage got slower than the
+threshold (percent), so it can gate CI.
+"""
+import argparse
+import json
+import sys
+
+
+def _change(before, after):
+    """Relative change in percent, None if either side is missing"""
+    if not before or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def compare(before, after, threshold=10.0):
+    """
+    Args:
+        before / after: Parsed result files of benchmarks.run
+        threshold: Percent drop in frames/sec (or rise in p95) counted as a regression
+
+    Returns:
+        (rows, regressions): one dict per case and stage, and the regressed ones
+    """
+    after_cases = {case["name"]: case for case in after["cases"]}
+    rows, regressions = [], []
+    for case in before["cases"]:
+        other = after_cases.get(case["name"])
+        if other is None:
+            continue
+        for stage, stats in case["stages"].items():
+            new = other["stages"].get(stage)
+            if new is None:
+                continue
+            row = {
+                "case": case["name"],
+                "stage": stage,
+                "fps_before": stats["fps"],
+                "fps_after": new["fps"],
+                "fps_change": _change(stats["fps"], new["fps"]),
+                "p95_change": _change(stats["p95_ms"], new["p95_ms"]),
+            }
+            rows.append(row)
+            if ((row["fps_change"] is not None and row["fps_change"] < -threshold)
+                    or (row["p95_change"] is not None and row["p95_change"] > threshold)):
+                regressions.append(row)
+    return rows, regressions
+
+
+def _fmt(value):
+    return "    n/a" if value is None else f"{value:+6.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="percent slowdown reported as a regression")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    for side, data in (("before", before), ("after", after)):
+        env = data["environment"]
+        print(f"{side:>6}: {(env['git_commit'] or 'nogit')[:8]}{' (dirty)' if env['git_dirty'] else ''} "
+              f"{env['created_at']} model={data['config']['model']}")
+    if before["environment"]["platform"] != after["environment"]["platform"]:
+        print("⚠️ Runs are from different machines, numbers are not comparable")
+
+    rows, regressions = compare(before, after, threshold=args.threshold)
+    for row in rows:
+        marker = "  ❌" if row in regressions else ""
+        print(f"{row['case']:>16} {row['stage']:>11}: {row['fps_before'] or 0:>10.1f} -> "
+              f"{row['fps_after'] or 0:>10.1f} frames/sec ({_fmt(row['fps_change'])}), "
+              f"p95 {_fmt(row['p95_change'])}{marker}")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} stage(s) slower by more than {args.threshold}%")
+        sys.exit(1)
+    print("\n✅ No regressions")
+
+
+if __name__ == '__main__':
+    main()
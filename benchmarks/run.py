@@ -0,0 +1,317 @@
+"""
+Per-stage benchmark of the analysis pipeline on synthetic clips.
+
+Every clip (length x resolution) is run through the stages of an upload,
+each timed on its own:
+
+    decode       iter_video at the production stride
+    detect       detect_batch, batch by batch
+    interpolate  Trajectory.interpolate
+    analyze      analyze_footwork (speeds, rallies, StrokeClassifier)
+    draw         ShuttleTracker.annotate_frame
+    encode       save_video
+
+Frames are re-decoded (untimed) for draw / encode, so memory stays at one
+batch like in production. Latency percentiles are per frame, except for
+interpolate and analyze, which are one call over the whole track. Each
+case runs in a fresh process, so peak RSS is that of the case alone; a
+stage's peak_rss_mb is the process high-water mark when the stage ended.
+
+    python -m benchmarks.run --lengths 300 900 --sizes 640x360 1280x720
+    python -m benchmarks.run --model yolov8n.yaml     # untrained YOLO, offline
+
+Results are written as JSON (see benchmarks.compare to diff two runs).
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.abspath(os.path.join(BENCH_DIR, ".."))
+BACKEND_DIR = os.path.join(PROJECT_DIR, "backend")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+for path in (PROJECT_DIR, BACKEND_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from badminton_model.utils import iter_video, iter_batches, first_sample, save_video, Trajectory
+from badminton_model.tracker.shuttle_tracker import ShuttleTracker
+from analysis.footwork import analyze_footwork
+from analyze import FRAME_STRIDE, MAX_INTERPOLATION_GAP
+
+from .synthetic import ensure_clip, CLIP_DIR
+from .blob_model import BlobDetector
+
+STAGES = ("decode", "detect", "interpolate", "analyze", "draw", "encode")
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class StageTimer:
+    """Per-item latencies of one stage, accumulated over repeats"""
+
+    def __init__(self):
+        self.latencies = []
+        self.items = 0
+        self.peak_rss_mb = None
+
+    def add(self, seconds, items=1, split=False):
+        """
+        One measurement covering `items` frames. With split, the time is
+        spread over the frames (a batch); otherwise it is one latency sample
+        (a whole-track call such as interpolate).
+        """
+        self.latencies.extend([seconds / items] * items if split else [seconds])
+        self.items += items
+
+    def timed(self, iterable):
+        """Pass items through, timing how long each takes to produce"""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.add(time.perf_counter() - start)
+            yield item
+
+    def consumed(self, iterable):
+        """Pass items through, timing how long the consumer holds each"""
+        for item in iterable:
+            start = time.perf_counter()
+            yield item
+            self.add(time.perf_counter() - start)
+
+    def done(self):
+        self.peak_rss_mb = _peak_rss_mb()
+
+    def to_dict(self):
+        latencies = np.array(self.latencies)
+        total = float(latencies.sum())
+        return {
+            "items": self.items,
+            "total_sec": round(total, 4),
+            "fps": round(self.items / total, 2) if total > 0 else None,
+            "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3) if len(latencies) else None,
+            "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3) if len(latencies) else None,
+            "peak_rss_mb": self.peak_rss_mb,
+        }
+
+
+def load_detector(model="blob", batch_size=8, backend="torch", int8=False):
+    """
+    Detector for the benchmark.
+
+    Args:
+        model: "blob" for the BlobDetector stand-in, otherwise a path handed
+            to ShuttleTracker (.pt weights, or an Ultralytics model yaml
+            for an untrained network of that size)
+    """
+    if model == "blob":
+        return BlobDetector(batch_size=batch_size)
+    return ShuttleTracker(model, batch_size=batch_size, backend=backend, int8=int8)
+
+
+def run_case(clip, model="blob", batch_size=8, backend="torch", int8=False, repeat=1):
+    """
+    Benchmark one synthetic clip.
+
+    Args:
+        clip: ensure_clip kwargs (width, height, frames, fps, seed)
+        repeat: Runs of the whole clip; latencies of every run are pooled
+
+    Returns:
+        dict: clip parameters, per-stage stats and case totals
+    """
+    video_path = ensure_clip(**clip)
+    detector = load_detector(model, batch_size=batch_size, backend=backend, int8=int8)
+    detector.warmup()
+
+    timers = {name: StageTimer() for name in STAGES}
+    wall_start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for _ in range(repeat):
+            # DECODE -> DETECT
+            raw_boxes, raw_conf = [], []
+            frames = timers["decode"].timed(iter_video(video_path, stride=FRAME_STRIDE))
+            for batch in iter_batches(frames, batch_size):
+                start = time.perf_counter()
+                boxes, conf = detector.detect_batch(batch)
+                timers["detect"].add(time.perf_counter() - start, len(batch), split=True)
+                raw_boxes.append(boxes)
+                raw_conf.append(conf)
+            timers["decode"].done()
+            timers["detect"].done()
+
+            n = sum(len(b) for b in raw_boxes)
+            detections = Trajectory.from_boxes(
+                np.concatenate(raw_boxes) if raw_boxes else np.empty((0, 4)),
+                conf=np.concatenate(raw_conf) if raw_conf else None,
+                frames=first_sample(FRAME_STRIDE) + np.arange(n) * FRAME_STRIDE
+            )
+
+            # INTERPOLATE
+            start = time.perf_counter()
+            trajectory = detections.interpolate(max_gap=MAX_INTERPOLATION_GAP, frame_step=FRAME_STRIDE)
+            timers["interpolate"].add(time.perf_counter() - start, n)
+            timers["interpolate"].done()
+
+            # ANALYZE
+            start = time.perf_counter()
+            metrics = analyze_footwork(trajectory, fps=clip.get("fps", 30), frame_step=FRAME_STRIDE)
+            timers["analyze"].add(time.perf_counter() - start, n)
+            timers["analyze"].done()
+
+            # DRAW -> ENCODE (frames decoded again, untimed)
+            boxes = trajectory.boxes
+            valid = trajectory.valid
+
+            def drawn(frames):
+                prev_center = None
+                for i, frame in enumerate(frames):
+                    start = time.perf_counter()
+                    det = {0: boxes[i].tolist()} if valid[i] else {}
+                    prev_center = ShuttleTracker.annotate_frame(frame, i, det, prev_center)
+                    timers["draw"].add(time.perf_counter() - start)
+                    yield frame
+
+            output_path = os.path.join(tmp_dir, "annotated.mp4")
+            save_video(timers["encode"].consumed(drawn(iter_video(video_path, stride=FRAME_STRIDE))),
+                       video_path, output_path)
+            timers["draw"].done()
+            timers["encode"].done()
+    wall_sec = time.perf_counter() - wall_start
+
+    return {
+        "name": f"{clip['width']}x{clip['height']}_{clip['frames']}f",
+        "clip": clip,
+        "frames_sampled": n,
+        "detections": int(detections.detected.sum()),
+        "strokes": int(sum(metrics.get("stroke_counts", {}).values())),
+        "wall_sec": round(wall_sec, 3),
+        "frames_per_sec": round(n * repeat / wall_sec, 2) if wall_sec > 0 else None,
+        "peak_rss_mb": _peak_rss_mb(),
+        "stages": {name: timer.to_dict() for name, timer in timers.items()},
+    }
+
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=PROJECT_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """What the numbers were measured on, so runs can be compared fairly"""
+    import cv2
+
+    return {
+        "created_at": datetime.now().isoformat(),
+        "git_commit": _git("rev-parse", "HEAD"),
+        "git_dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+
+
+def _parse_size(text):
+    width, _, height = text.lower().partition("x")
+    return int(width), int(height)
+
+
+def _print_case(case):
+    print(f"\n{case['name']}: {case['frames_sampled']} frames sampled, {case['detections']} detections, "
+          f"{case['frames_per_sec']} frames/sec end to end, peak RSS {case['peak_rss_mb']} MB")
+    for name, stats in case["stages"].items():
+        print(f"  {name:>11}: {stats['fps'] or 0:>10.1f} frames/sec  "
+              f"p50 {stats['p50_ms'] or 0:>8.3f} ms  p95 {stats['p95_ms'] or 0:>8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline on synthetic clips")
+    parser.add_argument("--lengths", nargs="+", type=int, default=[300, 900],
+                        help="clip lengths in source frames")
+    parser.add_argument("--sizes", nargs="+", default=["640x360", "1280x720"],
+                        help="clip resolutions, WIDTHxHEIGHT")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model", default="blob",
+                        help="'blob' (stand-in, no weights), .pt weights or an Ultralytics model yaml")
+    parser.add_argument("--backend", default="torch", choices=("torch", "onnx", "openvino"))
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=1, help="runs per clip, latencies pooled")
+    parser.add_argument("--in-process", action="store_true",
+                        help="run every case in this process (peak RSS is then cumulative)")
+    parser.add_argument("--clip-dir", default=CLIP_DIR)
+    parser.add_argument("--output", help="result JSON (default: benchmarks/results/<time>_<commit>.json)")
+    args = parser.parse_args()
+
+    env = environment()
+    config = {
+        "model": args.model,
+        "backend": args.backend,
+        "int8": args.int8,
+        "batch_size": args.batch_size,
+        "repeat": args.repeat,
+        "frame_stride": FRAME_STRIDE,
+        "max_interpolation_gap": MAX_INTERPOLATION_GAP,
+    }
+    run_kwargs = {k: config[k] for k in ("model", "batch_size", "backend", "int8", "repeat")}
+
+    # Generate clips up front so case timings never include it
+    clips = []
+    for width, height in map(_parse_size, args.sizes):
+        for frames in args.lengths:
+            clip = {"width": width, "height": height, "frames": frames, "fps": args.fps, "seed": args.seed}
+            if args.clip_dir != CLIP_DIR:
+                clip["clip_dir"] = args.clip_dir
+            ensure_clip(**clip)
+            clips.append(clip)
+
+    cases = []
+    for clip in clips:
+        if args.in_process:
+            case = run_case(clip, **run_kwargs)
+        else:
+            with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as executor:
+                case = executor.submit(run_case, clip, **run_kwargs).result()
+        case["clip"].pop("clip_dir", None)
+        _print_case(case)
+        cases.append(case)
+
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}_{(env['git_commit'] or 'nogit')[:8]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"environment": env, "config": config, "cases": cases}, f, indent=2)
+    print(f"\n💾 Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Deterministic synthetic badminton clips.
+
+A static court (green floor with light lines and a little texture noise)
+with a white shuttle blob flying parabolic shots between the two ends of
+the court, rallies separated by dead time without a shuttle. The same
+(size, length, fps, seed) always produces the same frames, so results of
+different commits are measured on identical input.
+"""
+import os
+
+import cv2
+import numpy as np
+
+CLIP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "clips")
+
+FLOOR_BGR = (60, 110, 50)
+LINE_BGR = (205, 205, 205)      # below BlobDetector's threshold, unlike the shuttle
+SHUTTLE_BGR = (255, 255, 255)
+
+
+def clip_path(width, height, frames, fps=30, seed=0, clip_dir=CLIP_DIR):
+    return os.path.join(clip_dir, f"clip_{width}x{height}_{frames}f_{fps}fps_s{seed}.mp4")
+
+
+def _court(width, height, rng):
+    """Background frame: floor, texture noise and court lines"""
+    court = np.empty((height, width, 3), dtype=np.uint8)
+    court[:] = FLOOR_BGR
+    noise = rng.integers(-12, 13, size=(height, width, 1), dtype=np.int16)
+    court = np.clip(court.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+    thickness = max(1, height // 180)
+    x0, x1 = int(width * 0.2), int(width * 0.8)
+    y0, y1 = int(height * 0.1), int(height * 0.9)
+    cv2.rectangle(court, (x0, y0), (x1, y1), LINE_BGR, thickness)
+    net_y = (y0 + y1) // 2
+    cv2.line(court, (x0, net_y), (x1, net_y), LINE_BGR, thickness * 2)
+    for y in (y0 + (y1 - y0) // 6, y1 - (y1 - y0) // 6):
+        cv2.line(court, (x0, y), (x1, y), LINE_BGR, thickness)
+    cv2.line(court, ((x0 + x1) // 2, y0), ((x0 + x1) // 2, y1), LINE_BGR, thickness)
+    return court
+
+
+def shuttle_positions(frames, width, height, fps=30, seed=0):
+    """
+    Shuttle center per frame, NaN while no shuttle is in play.
+
+    Returns:
+        (frames, 2) float array of (x, y) pixel positions
+    """
+    rng = np.random.default_rng(seed)
+    positions = np.full((frames, 2), np.nan)
+    near, far = height * 0.82, height * 0.18
+
+    t = int(rng.integers(0, fps))
+    toward_far = True
+    while t < frames:
+        shots = int(rng.integers(3, 9))
+        x = rng.uniform(0.3, 0.7) * width
+        for _ in range(shots):
+            duration = int(rng.integers(int(fps * 0.6), int(fps * 1.4)))
+            x_end = rng.uniform(0.25, 0.75) * width
+            # Apparent lift of the shot: high clears, flat drives
+            lift = rng.uniform(0.05, 0.35) * height
+            start_y, end_y = (near, far) if toward_far else (far, near)
+
+            s = np.linspace(0, 1, duration, endpoint=False)
+            xs = x + (x_end - x) * s
+            ys = start_y + (end_y - start_y) * s - lift * 4 * s * (1 - s)
+            span = slice(t, min(t + duration, frames))
+            positions[span] = np.column_stack([xs, ys])[:span.stop - span.start]
+
+            t += duration
+            x = x_end
+            toward_far = not toward_far
+            if t >= frames:
+                break
+        # Dead time between rallies
+        t += int(rng.integers(fps, fps * 3))
+    return positions
+
+
+def make_clip(path, width=640, height=360, frames=300, fps=30, seed=0):
+    """
+    Write a synthetic clip to `path` (mp4v).
+
+    Returns:
+        (frames, 2) ground-truth shuttle centers (see shuttle_positions)
+    """
+    rng = np.random.default_rng(seed)
+    court = _court(width, height, rng)
+    positions = shuttle_positions(frames, width, height, fps=fps, seed=seed)
+    radius = max(3, height // 90)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.part.mp4"
+    out = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    try:
+        for x, y in positions:
+            frame = court.copy()
+            if not np.isnan(x):
+                cv2.circle(frame, (int(round(x)), int(round(y))), radius, SHUTTLE_BGR, -1)
+            out.write(frame)
+    finally:
+        out.release()
+    os.replace(tmp_path, path)
+    return positions
+
+
+def ensure_clip(width=640, height=360, frames=300, fps=30, seed=0, clip_dir=CLIP_DIR):
+    """Path of the clip, generated on first use"""
+    path = clip_path(width, height, frames, fps=fps, seed=seed, clip_dir=clip_dir)
+    if not os.path.exists(path):
+        print(f"🎬 Generating {os.path.basename(path)}...")
+        make_clip(path, width, height, frames, fps=fps, seed=seed)
+    return path
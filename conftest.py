@@ -0,0 +1,2 @@
+# Scripts that only look like tests: they open dataset images at import time
+collect_ignore = ["badminton_model/test_open_image.py"]
@@ -410,7 +410,30 @@ if (window.analysisComponentLoaded) {
   const formData = new FormData();
   formData.append('file', file);
 
-  const API_URL = 'http://127.0.0.1:8000/analyze';
+  const API_BASE = 'http://127.0.0.1:8000';
+  const API_URL = `${API_BASE}/analyze`;
+
+  // /analyze only queues the job; poll its result URL until it is finished
+  async function waitForAnalysis(job) {
+    if (!job.result_url) return job;
+
+    console.log(`⏳ Analysis queued as job ${job.job_id}`);
+    while (true) {
+      await new Promise(resolve => setTimeout(resolve, 1000));
+
+      const res = await fetch(`${API_BASE}${job.result_url}`);
+      const data = await res.json();
+
+      if (res.status === 202) {
+        console.log(`⏳ Job ${job.job_id}: ${data.stage} ${Math.round(data.progress * 100)}%`);
+        continue;
+      }
+      if (!res.ok) {
+        throw new Error(data.error || data.message || `Server error: ${res.status}`);
+      }
+      return data;
+    }
+  }
 
   try {
     console.log(`📤 Sending request to ${API_URL}...`);
@@ -466,7 +489,7 @@ if (window.analysisComponentLoaded) {
       throw new Error(errorMessage);
     }
 
-    const backendData = await response.json();
+    const backendData = await waitForAnalysis(await response.json());
     console.log('✅ Analysis complete!', backendData);
 
     // Clear progress intervals